@@ -0,0 +1,90 @@
+"""
+Benchmark del parseo de columnas de fecha.
+
+Compara, sobre columnas de un millón de valores (configurable), el parseo
+anterior de ``parse_date_column`` (``pd.to_datetime`` con ``dayfirst=True``
+y sin formato) con la detección de formato de ``services/common/dates.py``, tanto la
+primera vez (con detección) como con el formato ya cacheado para la
+disposición del archivo. Para cada caso se indica también cuántos valores
+quedaron sin convertir.
+
+Uso:
+    python benchmarks/bench_dates.py --rows 1000000 --repeat 3
+"""
+
+import argparse
+import sys
+import warnings
+from pathlib import Path
+from typing import List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "services"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+import pandas as pd
+
+from common import dates
+from benchutil import measure, write_report
+
+
+def date_columns(rows: int, seed: int) -> dict:
+    """Columnas de texto con los formatos que exportan los bancos"""
+    rng = np.random.default_rng(seed)
+    fechas = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 10 ** 9, rows), unit="s")
+    mixta = pd.Series(fechas.strftime("%d/%m/%Y %H:%M:%S"))
+    # 1 % de los valores en ISO, como al concatenar extractos de dos orígenes
+    mixta.iloc[::100] = fechas[::100].strftime("%Y-%m-%d")
+    return {
+        "dd/mm/yyyy hh:mm:ss": pd.Series(fechas.strftime("%d/%m/%Y %H:%M:%S")),
+        "dd/mm/yyyy": pd.Series(fechas.strftime("%d/%m/%Y")),
+        "yyyy-mm-dd": pd.Series(fechas.strftime("%Y-%m-%d")),
+        "mixed 99% dd/mm + 1% iso": mixta,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark del parseo de fechas")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Archivo JSON de resultados (por defecto benchmarks/results/dates-<fecha>.json)")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for nombre, columna in date_columns(args.rows, args.seed).items():
+        layout = (("fecha",), nombre)
+
+        def anterior():
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                return pd.to_datetime(columna, errors="coerce", dayfirst=True)
+
+        def con_deteccion():
+            dates.FORMAT_CACHE.pop(layout, None)
+            return dates.parse_dates(columna, layout)
+
+        def cacheado():
+            return dates.parse_dates(columna, layout)
+
+        for metodo, fn in (("pd.to_datetime dayfirst", anterior),
+                           ("parse_dates (detección)", con_deteccion),
+                           ("parse_dates (formato cacheado)", cacheado)):
+            tiempos = measure(fn, args.repeat)
+            resultados.append({
+                "column": nombre,
+                "method": metodo,
+                "rows": args.rows,
+                "seconds": tiempos,
+                "rows_per_second": round(args.rows / tiempos["median"]),
+                "unparsed": int(fn().isna().sum()),
+            })
+            print(f"  {nombre:<26} {metodo:<32} mediana {tiempos['median']:.3f}s")
+
+    return write_report("dates", {"repeat": args.repeat, "results": resultados}, args.output)
+
+
+if __name__ == "__main__":
+    main()
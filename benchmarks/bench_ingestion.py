@@ -0,0 +1,192 @@
+"""
+Benchmark de ingesta del servicio de recopilación de datos.
+
+Genera extractos sintéticos (ver ``synthetic.py``) y mide, dentro del mismo
+proceso y sin servicios levantados:
+
+- ``load_file`` por formato (suma de todos los archivos del formato)
+- ``load_data_from_environment``
+- ``save_state`` / ``load_state`` (y el tamaño del archivo de estado)
+- la memoria de los registros en el entorno tras la carga y tras
+  ``load_state`` (``store_bytes``)
+- ``POST /api/v1/data/load/pre`` y los endpoints de listado vía TestClient
+
+Los resultados se escriben en JSON para poder compararlos entre commits.
+
+Uso:
+    python benchmarks/bench_ingestion.py --sizes 10k,1m --repeat 3
+"""
+
+import argparse
+import copy
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "services" / "data-collection-service"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import jwt
+from fastapi.testclient import TestClient
+
+import app.main as collection
+from benchutil import measure, write_report
+from synthetic import generate_dataset
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Endpoints de listado a medir si el servicio los expone
+LISTING_ENDPOINTS = [
+    "/api/v1/data/account?environment=pre&page=1&page_size=2000",
+    "/api/v1/data/cards?environment=pre&page=1&page_size=2000",
+    "/api/v1/data/cards?environment=pre&from=2020-03-01&to=2020-03-31",
+    "/api/v1/data/cards?environment=pre&max_importe=-100&page=2&page_size=100",
+    "/api/v1/data/cards?environment=pre&text=mercadona",
+    "/api/v1/data/search?environment=pre&q=mercadona",
+]
+
+
+def store_bytes(records: List[dict]) -> int:
+    """
+    Memoria de los registros de un entorno: la lista, cada ``dict`` y cada
+    valor contado una sola vez aunque lo compartan varias filas.
+    """
+    vistos = set()
+    total = sys.getsizeof(records)
+    for record in records:
+        total += sys.getsizeof(record)
+        for valor in record.values():
+            if id(valor) not in vistos:
+                vistos.add(id(valor))
+                total += sys.getsizeof(valor)
+    return total
+
+
+def auth_header() -> Dict[str, str]:
+    token = jwt.encode(
+        {"sub": "benchmark", "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+        collection.JWT_SECRET_KEY, algorithm=collection.JWT_ALGORITHM
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def run_size(label: str, rows: int, workdir: Path, repeat: int, seed: int) -> List[dict]:
+    """Ejecutar todos los benchmarks para un tamaño de juego de datos"""
+    base = workdir / label
+    folder = base / "datos-pre"
+    print(f"📦 Generando {rows:,} filas por tipo en {folder}")
+    manifest = generate_dataset(folder, rows, seed=seed)
+
+    # Aislar el servicio: datos sintéticos, estado propio y sin publicar al análisis
+    collection.PROJECT_ROOT = base
+    collection.STATE_FILE = base / "estado-benchmark.json"
+    collection.publish_to_analysis = lambda *args, **kwargs: None
+    cache_excel = collection.ExcelCache(base / "cache-excel")
+    estado_inicial = copy.deepcopy(collection.ESTADO)
+    estado_inicial["data"]["pre"] = []
+
+    resultados = []
+
+    def registrar(nombre: str, tiempos: Dict[str, float], **extra):
+        resultado = {"size": label, "rows": rows, "benchmark": nombre, "seconds": tiempos, **extra}
+        if "rows_processed" in extra and tiempos["median"] > 0:
+            resultado["rows_per_second"] = round(extra["rows_processed"] / tiempos["median"])
+        resultados.append(resultado)
+        print(f"  {nombre:<40} mediana {tiempos['median']:.3f}s")
+
+    # load_file por formato
+    por_formato: Dict[str, List[Path]] = {}
+    for nombre in manifest["files"]:
+        por_formato.setdefault(Path(nombre).suffix.lstrip("."), []).append(folder / nombre)
+    for formato, archivos in sorted(por_formato.items()):
+        filas = {"n": 0}
+
+        def cargar_archivos():
+            filas["n"] = sum(len(collection.load_file(f)[0]) for f in archivos)
+
+        # Sin caché de Excel: mide el parseo real
+        collection.EXCEL_CACHE = None
+        tiempos = measure(cargar_archivos, repeat)
+        registrar(f"load_file[{formato}]", tiempos, files=len(archivos), rows_processed=filas["n"],
+                  bytes=sum(f.stat().st_size for f in archivos))
+
+        if formato in ("xls", "xlsx"):
+            collection.EXCEL_CACHE = cache_excel
+            cargar_archivos()
+            registrar(f"load_file[{formato}] cached", measure(cargar_archivos, repeat),
+                      files=len(archivos), rows_processed=filas["n"])
+
+    # Carga completa del entorno (incluye save_state)
+    def cargar_entorno():
+        collection.ESTADO = copy.deepcopy(estado_inicial)
+        return collection.load_data_from_environment("pre", clear_existing=True)
+
+    tiempos = measure(cargar_entorno, repeat)
+    registrar("load_data_from_environment", tiempos, rows_processed=len(collection.ESTADO["data"]["pre"]),
+              store_bytes=store_bytes(collection.ESTADO["data"]["pre"]))
+
+    # Persistencia del estado
+    registrar("save_state", measure(collection.save_state, repeat),
+              state_bytes=collection.STATE_FILE.stat().st_size)
+    registrar("load_state", measure(collection.load_state, repeat),
+              store_bytes=store_bytes(collection.ESTADO["data"]["pre"]))
+
+    # Endpoints en proceso
+    client = TestClient(collection.app)
+    headers = auth_header()
+
+    def post_load():
+        response = client.post("/api/v1/data/load/pre", json={"clear_existing": True}, headers=headers)
+        response.raise_for_status()
+
+    registrar("POST /api/v1/data/load/pre", measure(post_load, repeat))
+
+    rutas = {getattr(r, "path", None) for r in collection.app.routes}
+    for ruta in LISTING_ENDPOINTS:
+        if ruta.split("?")[0] not in rutas:
+            resultados.append({"size": label, "rows": rows, "benchmark": f"GET {ruta}", "skipped": "endpoint no disponible"})
+            continue
+
+        def get_listing(ruta=ruta):
+            response = client.get(ruta, headers=headers)
+            response.raise_for_status()
+
+        # La primera consulta tras la carga construye la vista ordenada del entorno
+        collection.LISTINGS.clear()
+        inicio = time.perf_counter()
+        get_listing()
+        primera = time.perf_counter() - inicio
+        registrar(f"GET {ruta}", measure(get_listing, repeat), first_request_seconds=round(primera, 4))
+
+    collection.ESTADO = copy.deepcopy(estado_inicial)
+    return resultados
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark de ingesta de data-collection-service")
+    parser.add_argument("--sizes", default="10k", help=f"Tamaños separados por comas ({', '.join(SIZES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medida")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", type=Path, default=Path(__file__).resolve().parent / ".data",
+                        help="Carpeta donde se generan (y reutilizan) los datos sintéticos")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Archivo JSON de resultados (por defecto benchmarks/results/ingestion-<fecha>.json)")
+    args = parser.parse_args(argv)
+
+    etiquetas = [s.strip().lower() for s in args.sizes.split(",") if s.strip()]
+    desconocidas = [s for s in etiquetas if s not in SIZES]
+    if desconocidas:
+        parser.error(f"Tamaños no soportados: {', '.join(desconocidas)}")
+
+    resultados = []
+    for etiqueta in etiquetas:
+        resultados.extend(run_size(etiqueta, SIZES[etiqueta], args.workdir, args.repeat, args.seed))
+
+    return write_report("ingestion", {"repeat": args.repeat, "results": resultados}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de la extracción de movimientos de extractos en PDF.
+
+Genera extractos de cuenta de ``--pages`` páginas (1000 por defecto) y mide
+``read_pdf_statement`` de data-extraction-service con distinto número de
+procesos. Para cada caso se guardan los tiempos, las páginas y movimientos
+por segundo y el pico de memoria residente (``ru_maxrss``) del proceso
+principal y de los procesos del pool: con un número acotado de bloques de
+páginas en vuelo no debe crecer con el tamaño del documento más allá de
+los propios movimientos. El pico es acumulado, así que los casos se
+ejecutan en orden creciente de procesos.
+
+Uso:
+    python benchmarks/bench_pdf.py --pages 1000 --workers 1 2 4 --repeat 3
+"""
+
+import argparse
+import os
+import sys
+import resource
+from pathlib import Path
+from typing import List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "services" / "data-extraction-service" / "app"))
+sys.path.insert(0, str(REPO_ROOT / "services"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pdf_statements import read_pdf_statement
+from benchutil import measure, write_report
+from synthetic import write_pdf_statement
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark de extractos en PDF")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--rows-per-page", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", type=Path, default=Path("/tmp/bench-pdf"))
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Archivo JSON de resultados (por defecto benchmarks/results/pdf-<fecha>.json)")
+    args = parser.parse_args(argv)
+
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    pdf = args.data_dir / f"extracto-{args.pages}p-{args.rows_per_page}r-{args.seed}.pdf"
+    if not pdf.exists():
+        print(f"📄 Generando {pdf.name}...")
+        write_pdf_statement(pdf, args.pages, args.rows_per_page, args.seed)
+    movimientos = args.pages * args.rows_per_page
+
+    resultados = []
+    for workers in sorted(args.workers):
+        def leer():
+            return read_pdf_statement(pdf, workers, args.pages_per_task)
+
+        df = leer()
+        if len(df) != movimientos:
+            raise SystemExit(f"❌ Se esperaban {movimientos} movimientos y se extrajeron {len(df)}")
+
+        tiempos = measure(leer, args.repeat)
+        # ru_maxrss en KB en Linux
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        pico_pool = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        resultados.append({
+            "workers": workers,
+            "pages": args.pages,
+            "movements": len(df),
+            "seconds": tiempos,
+            "pages_per_second": round(args.pages / tiempos["median"]),
+            "movements_per_second": round(movimientos / tiempos["median"]),
+            "max_rss_mb": round(pico, 1),
+            "max_rss_pool_mb": round(pico_pool, 1),
+        })
+        print(f"  {workers} proceso(s) mediana {tiempos['median']:.3f}s "
+              f"({args.pages / tiempos['median']:.0f} páginas/s, RSS {pico:.0f} MB, pool {pico_pool:.0f} MB)")
+
+    payload = {
+        "repeat": args.repeat,
+        "file_bytes": pdf.stat().st_size,
+        "pages_per_task": args.pages_per_task,
+        "cpu_count": os.cpu_count(),
+        "results": resultados,
+    }
+    return write_report("pdf", payload, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Utilidades comunes de los benchmarks: medida de tiempos e informes JSON.
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Ejecutar ``fn`` ``repeat`` veces y resumir los tiempos en segundos"""
+    tiempos = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - start)
+    return {
+        "min": round(min(tiempos), 6),
+        "median": round(statistics.median(tiempos), 6),
+        "max": round(max(tiempos), 6),
+    }
+
+
+def write_report(benchmark: str, payload: dict, output: Optional[Path] = None) -> Path:
+    """Guardar un informe con los datos del entorno en ``results/<benchmark>-<fecha>.json``"""
+    ahora = datetime.now(timezone.utc)
+    informe = {
+        "benchmark": benchmark,
+        "timestamp": ahora.isoformat().replace("+00:00", "Z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        **payload,
+    }
+    output = output or RESULTS_DIR / f"{benchmark}-{ahora:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(informe, indent=2, ensure_ascii=False))
+    print(f"✅ Resultados guardados en {output}")
+    return output
@@ -0,0 +1,319 @@
+"""
+Prueba de carga del login de auth-service.
+
+Levanta auth-service con uvicorn en un subproceso (con un archivo de
+usuarios sintético) y lo ataca con un cliente HTTP/1.1 mínimo sobre
+asyncio: ``--concurrency`` conexiones keep-alive que envían logins sin
+pausa durante ``--duration`` segundos, mezclando credenciales correctas,
+contraseñas erróneas y usuarios inexistentes.
+
+Informa de throughput y de las latencias p50/p95/p99, y guarda el
+resultado en JSON. En modo ``--smoke`` la prueba es corta y el proceso
+termina con código 1 si hay respuestas inesperadas o si empeora respecto
+a ``--baseline`` más allá de ``--tolerance``.
+
+Uso:
+    python benchmarks/load_login.py --concurrency 32 --duration 30
+    python benchmarks/load_login.py --smoke --baseline benchmarks/results/login-baseline.json
+    python benchmarks/load_login.py --url http://localhost:8001   # servicio ya levantado
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import bcrypt
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+AUTH_SERVICE_DIR = REPO_ROOT / "services" / "auth-service"
+LOGIN_PATH = "/api/v1/auth/login"
+PASSWORD = "Benchmark123!"
+
+# Tipos de petición y código HTTP esperado para cada uno
+EXPECTED_STATUS = {"ok": 200, "wrong_password": 401, "unknown_user": 401}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil por el método del rango más cercano"""
+    if not sorted_values:
+        return None
+    # pct * n antes de dividir para que 95 * 20 / 100 no quede en 19.000000000000004
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values) / 100) - 1))
+    return sorted_values[index]
+
+
+def write_users_file(path: Path, users: int, rounds: int) -> List[str]:
+    """Crear un users.json sintético; todos comparten contraseña y hash"""
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    emails = [f"usuario{i}@example.com" for i in range(users)]
+    path.write_text(json.dumps([
+        {"id": str(i), "email": email, "name": f"Usuario {i}", "password_hash": password_hash,
+         "roles": ["user"], "active": True}
+        for i, email in enumerate(emails)
+    ]))
+    return emails
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class HttpConnection:
+    """Conexión HTTP/1.1 keep-alive mínima sobre asyncio streams"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        self.writer.write(head.encode("ascii") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Conexión cerrada por el servidor")
+        status_code = int(status_line.split()[1])
+        length = 0
+        close = False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                close = True
+        payload = await self.reader.readexactly(length)
+        if close:
+            await self.close()
+        return status_code, payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+
+async def wait_until_ready(host: str, port: int, timeout: float = 30.0):
+    """Esperar a que /api/v1/health responda 200"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = HttpConnection(host, port)
+        try:
+            status_code, _ = await conn.request("GET", "/api/v1/health")
+            if status_code == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            await conn.close()
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"auth-service no respondió en {timeout}s")
+
+
+async def worker(host: str, port: int, emails: List[str], mix: List[Tuple[str, float]],
+                 stop_at: float, measure_from: float, rng: random.Random,
+                 samples: List[Tuple[str, int, float]], errors: Dict[str, int]):
+    conn = HttpConnection(host, port)
+    kinds = [k for k, _ in mix]
+    weights = [w for _, w in mix]
+    try:
+        while time.perf_counter() < stop_at:
+            kind = rng.choices(kinds, weights)[0]
+            email = rng.choice(emails)
+            if kind == "unknown_user":
+                email = f"nadie{rng.randrange(10**6)}@example.com"
+            password = PASSWORD if kind == "ok" else PASSWORD + "x"
+            body = json.dumps({"email": email, "password": password}).encode("utf-8")
+
+            start = time.perf_counter()
+            try:
+                status_code, _ = await conn.request("POST", LOGIN_PATH, body)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                await conn.close()
+                continue
+            if start >= measure_from:
+                samples.append((kind, status_code, time.perf_counter() - start))
+    finally:
+        await conn.close()
+
+
+async def run_load(host: str, port: int, emails: List[str], concurrency: int, duration: float,
+                   warmup: float, failure_ratio: float, unknown_ratio: float, seed: int) -> dict:
+    mix = [("ok", 1.0 - failure_ratio - unknown_ratio), ("wrong_password", failure_ratio),
+           ("unknown_user", unknown_ratio)]
+    samples: List[Tuple[str, int, float]] = []
+    errors: Dict[str, int] = {}
+    now = time.perf_counter()
+    measure_from = now + warmup
+    stop_at = measure_from + duration
+    await asyncio.gather(*(
+        worker(host, port, emails, mix, stop_at, measure_from, random.Random(seed + i), samples, errors)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - measure_from
+
+    latencias = sorted(lat for _, _, lat in samples)
+    por_tipo: Dict[str, Dict[str, int]] = {}
+    inesperadas = 0
+    for kind, status_code, _ in samples:
+        counts = por_tipo.setdefault(kind, {})
+        counts[str(status_code)] = counts.get(str(status_code), 0) + 1
+        if status_code != EXPECTED_STATUS[kind]:
+            inesperadas += 1
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": len(samples),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(latencias, 50)),
+            "p95": ms(percentile(latencias, 95)),
+            "p99": ms(percentile(latencias, 99)),
+            "max": ms(latencias[-1] if latencias else None),
+        },
+        "status_by_kind": por_tipo,
+        "unexpected_status": inesperadas,
+        "connection_errors": errors,
+    }
+
+
+def check_regression(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Comparar con una ejecución de referencia; devuelve los problemas encontrados"""
+    problemas = []
+    base_rps = baseline["result"]["throughput_rps"]
+    if result["throughput_rps"] < base_rps * (1 - tolerance):
+        problemas.append(f"throughput {result['throughput_rps']} rps < {base_rps} rps de referencia (-{tolerance:.0%})")
+    base_p95 = baseline["result"]["latency_ms"]["p95"]
+    p95 = result["latency_ms"]["p95"]
+    if base_p95 is not None and p95 is not None and p95 > base_p95 * (1 + tolerance):
+        problemas.append(f"p95 {p95} ms > {base_p95} ms de referencia (+{tolerance:.0%})")
+    return problemas
+
+
+def start_server(port: int, users_file: Path, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, USERS_FILE=str(users_file))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=AUTH_SERVICE_DIR, env=env
+    )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de /api/v1/auth/login")
+    parser.add_argument("--url", default=None, help="Atacar un servicio ya levantado en lugar de arrancar uno")
+    parser.add_argument("--concurrency", type=int, default=16, help="Conexiones simultáneas")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos de medida")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos iniciales sin medir")
+    parser.add_argument("--failure-ratio", type=float, default=0.2, help="Proporción de contraseñas erróneas")
+    parser.add_argument("--unknown-ratio", type=float, default=0.05, help="Proporción de usuarios inexistentes")
+    parser.add_argument("--users", type=int, default=100, help="Usuarios del archivo sintético")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Coste de bcrypt de los usuarios sintéticos")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--smoke", action="store_true", help="Ejecución corta para CI")
+    parser.add_argument("--baseline", type=Path, default=None, help="Resultado JSON de referencia")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Empeoramiento admitido respecto a la referencia")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Archivo JSON de resultados (por defecto benchmarks/results/login-<fecha>.json)")
+    args = parser.parse_args(argv)
+
+    if args.smoke:
+        args.concurrency = min(args.concurrency, 4)
+        args.duration = min(args.duration, 3.0)
+        args.warmup = min(args.warmup, 0.5)
+    if args.failure_ratio + args.unknown_ratio > 1:
+        parser.error("--failure-ratio + --unknown-ratio no puede superar 1")
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+            emails = [f"usuario{i}@example.com" for i in range(args.users)]
+        else:
+            users_file = Path(tmp) / "users.json"
+            emails = write_users_file(users_file, args.users, args.bcrypt_rounds)
+            host, port = "127.0.0.1", free_port()
+            server = start_server(port, users_file, args.workers)
+
+        try:
+            asyncio.run(wait_until_ready(host, port))
+            print(f"🚀 {args.concurrency} conexiones durante {args.duration}s contra {host}:{port}")
+            result = asyncio.run(run_load(host, port, emails, args.concurrency, args.duration, args.warmup,
+                                          args.failure_ratio, args.unknown_ratio, args.seed))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+    lat = result["latency_ms"]
+    print(f"  {result['requests']} peticiones, {result['throughput_rps']} req/s, "
+          f"p50 {lat['p50']} ms, p95 {lat['p95']} ms, p99 {lat['p99']} ms")
+
+    problemas = []
+    if result["requests"] == 0:
+        problemas.append("no se completó ninguna petición")
+    if result["unexpected_status"]:
+        problemas.append(f"{result['unexpected_status']} respuestas con código inesperado: {result['status_by_kind']}")
+    if result["connection_errors"]:
+        problemas.append(f"errores de conexión: {result['connection_errors']}")
+    if args.baseline:
+        problemas.extend(check_regression(result, json.loads(args.baseline.read_text()), args.tolerance))
+
+    ahora = datetime.now(timezone.utc)
+    informe = {
+        "benchmark": "login",
+        "timestamp": ahora.isoformat().replace("+00:00", "Z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "result": result,
+        "problems": problemas,
+    }
+    output = args.output or Path(__file__).resolve().parent / "results" / f"login-{ahora:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(informe, indent=2, ensure_ascii=False))
+    print(f"✅ Resultados guardados en {output}")
+
+    for problema in problemas:
+        print(f"❌ {problema}")
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Generador de extractos bancarios sintéticos para los benchmarks.
+
+Produce archivos con la misma forma que los exportados por el banco:
+
+- ``MOV*.csv``: movimientos de tarjeta separados por ``;``, con importes con
+  coma decimal y fechas ``DD/MM/YYYY HH:MM:SS``.
+- ``excelFile_*.xlsx``: movimientos de cuenta del más reciente al más
+  antiguo, con un saldo coherente con los importes.
+- Extractos de cuenta en PDF (``write_pdf_statement``): una tabla de
+  movimientos por página con texto Helvetica y flujos ``FlateDecode``.
+
+La generación es determinista para una semilla dada. Los archivos ``.xls``
+no se generan porque no hay escritor para ese formato en el entorno
+(``xlwt`` está abandonado); los ``.xlsx`` se parten en archivos de como
+mucho ``rows_per_file`` filas por el límite de 1.048.576 filas por hoja.
+"""
+
+import json
+import zlib
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Límite de filas de una hoja de Excel menos margen para la cabecera
+XLSX_MAX_ROWS = 1_048_575
+
+ESTABLECIMIENTOS = np.array([
+    "MERCADONA", "CARREFOUR EXPRESS", "LIDL", "REPSOL ESTACION", "CEPSA",
+    "AMAZON EU", "NETFLIX.COM", "SPOTIFY", "RENFE VIAJEROS", "UBER BV",
+    "FARMACIA CENTRAL", "EL CORTE INGLES", "ZARA", "IKEA", "GLOVO",
+    "BAR LA PLAZA", "RESTAURANTE EL PUERTO", "VODAFONE", "IBERDROLA", "CAJERO 0049",
+])
+TIPOS_TARJETA = np.array(["COMPRA EN ESTABLECIMIENTO", "COMPRA INTERNET", "DEVOLUCION", "REINTEGRO CAJERO"])
+CONCEPTOS_CUENTA = np.array([
+    "PAGO TARJETA CREDITO", "TRANSFERENCIA RECIBIDA", "NOMINA", "RECIBO LUZ",
+    "RECIBO AGUA", "RECIBO TELEFONO", "BIZUM ENVIADO", "BIZUM RECIBIDO",
+    "COMISION MANTENIMIENTO", "TRANSFERENCIA EMITIDA", "HIPOTECA", "SEGURO HOGAR",
+])
+
+
+def spanish_amounts(values: np.ndarray) -> pd.Series:
+    """Formatear importes con coma decimal (``-45,80``)"""
+    return pd.Series(np.round(values, 2)).map("{:.2f}".format).str.replace(".", ",", regex=False)
+
+
+def split_rows(rows: int, rows_per_file: int) -> List[int]:
+    """Repartir ``rows`` en archivos de como mucho ``rows_per_file`` filas"""
+    sizes = [rows_per_file] * (rows // rows_per_file)
+    if rows % rows_per_file:
+        sizes.append(rows % rows_per_file)
+    return sizes
+
+
+def card_frame(rows: int, rng: np.random.Generator, start: pd.Timestamp) -> pd.DataFrame:
+    """Movimientos de tarjeta ordenados por fecha y hora"""
+    segundos = np.sort(rng.integers(0, 365 * 24 * 3600, rows))
+    fechas = pd.to_datetime(start) + pd.to_timedelta(segundos, unit="s")
+    tipos = TIPOS_TARJETA[rng.choice(len(TIPOS_TARJETA), rows, p=[0.7, 0.2, 0.05, 0.05])]
+    importes = -np.round(rng.lognormal(3.0, 1.0, rows), 2)
+    importes[tipos == "DEVOLUCION"] *= -1
+    return pd.DataFrame({
+        "Operación": np.arange(rows) + 100000,
+        "Fecha y hora": fechas.strftime("%d/%m/%Y %H:%M:%S"),
+        "Tipo": tipos,
+        "Importe": spanish_amounts(importes),
+        "Comisión": "0,00",
+        "Establecimiento": ESTABLECIMIENTOS[rng.integers(0, len(ESTABLECIMIENTOS), rows)],
+    })
+
+
+def account_frame(rows: int, rng: np.random.Generator, start: pd.Timestamp,
+                  saldo_inicial: float) -> pd.DataFrame:
+    """Movimientos de cuenta del más reciente al más antiguo con saldo coherente"""
+    dias = np.sort(rng.integers(0, 365, rows))
+    fechas = pd.to_datetime(start) + pd.to_timedelta(dias, unit="D")
+    ingreso = rng.random(rows) < 0.15
+    importes = np.round(np.where(ingreso, rng.lognormal(6.5, 0.8, rows), -rng.lognormal(3.5, 1.2, rows)), 2)
+    saldos = np.round(saldo_inicial + np.cumsum(importes), 2)
+    df = pd.DataFrame({
+        "Fecha": fechas.date,
+        "F. Valor": fechas.date,
+        "Concepto": CONCEPTOS_CUENTA[rng.integers(0, len(CONCEPTOS_CUENTA), rows)],
+        "Importe": importes,
+        "Saldo": saldos,
+    })
+    return df.iloc[::-1]
+
+
+def write_xlsx(df: pd.DataFrame, path: Path):
+    """Escribir un DataFrame en .xlsx en modo streaming (openpyxl write_only)"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Movimientos")
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(path)
+
+
+def pdf_escape(text: str) -> bytes:
+    """Cadena literal PDF en WinAnsi"""
+    data = text.encode("cp1252")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def pdf_page_content(rows: List[tuple], page: int) -> bytes:
+    """Contenido de una página: cabecera, una línea por movimiento y pie"""
+    partes = [b"BT /F1 12 Tf 50 800 Td " + pdf_escape("EXTRACTO DE CUENTA") + b" Tj ET"]
+    columnas = (50, 120, 190, 420, 500)
+    y = 770
+    for row in rows:
+        for x, valor in zip(columnas, row):
+            partes.append(b"BT /F1 8 Tf %d %d Td %s Tj ET" % (x, y, pdf_escape(valor)))
+        y -= 14
+    partes.append(b"BT /F1 8 Tf 280 30 Td " + pdf_escape(f"Página {page}") + b" Tj ET")
+    return b"\n".join(partes)
+
+
+def write_pdf_statement(path: Path, pages: int, rows_per_page: int = 50, seed: int = 42) -> int:
+    """
+    Escribir un extracto de cuenta en PDF de ``pages`` páginas.
+
+    Devuelve el número de movimientos. Los objetos se escriben a medida que
+    se generan, así que la memoria no crece con el número de páginas.
+    """
+    rng = np.random.default_rng(seed)
+    cuenta = account_frame(pages * rows_per_page, rng, pd.Timestamp("2020-01-01"), 2500.0).iloc[::-1]
+    filas = list(zip(
+        pd.to_datetime(cuenta["Fecha"]).dt.strftime("%d/%m/%Y"),
+        pd.to_datetime(cuenta["F. Valor"]).dt.strftime("%d/%m/%Y"),
+        cuenta["Concepto"],
+        spanish_amounts(cuenta["Importe"].to_numpy()),
+        spanish_amounts(cuenta["Saldo"].to_numpy()),
+    ))
+
+    # 1: catálogo, 2: árbol de páginas, 3: fuente; luego página y contenido
+    offsets = {}
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+    with open(path, "wb") as f:
+        def objeto(num: int, cuerpo: bytes):
+            offsets[num] = f.tell()
+            f.write(b"%d 0 obj\n" % num + cuerpo + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        objeto(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        objeto(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        objeto(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        for i in range(pages):
+            pagina, contenido = 4 + 2 * i, 5 + 2 * i
+            objeto(pagina, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                           b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % contenido)
+            datos = zlib.compress(pdf_page_content(filas[i * rows_per_page:(i + 1) * rows_per_page], i + 1))
+            objeto(contenido, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(datos)
+                   + datos + b"\nendstream")
+        xref = f.tell()
+        total = 3 + 2 * pages
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (total + 1))
+        for num in range(1, total + 1):
+            f.write(b"%010d 00000 n \n" % offsets[num])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (total + 1, xref))
+    return len(filas)
+
+
+def generate_dataset(folder: Path, rows: int, seed: int = 42,
+                     rows_per_file: int = 1_000_000) -> Dict[str, object]:
+    """
+    Generar ``rows`` movimientos de tarjeta y ``rows`` de cuenta en ``folder``.
+
+    Si la carpeta ya contiene un juego generado con los mismos parámetros se
+    reutiliza. Devuelve el manifiesto con la lista de archivos.
+    """
+    rows_per_file = min(rows_per_file, XLSX_MAX_ROWS)
+    manifest_file = folder / "manifest.json"
+    params = {"rows": rows, "seed": seed, "rows_per_file": rows_per_file}
+    if manifest_file.exists():
+        manifest = json.loads(manifest_file.read_text())
+        if manifest["params"] == params and all((folder / f).exists() for f in manifest["files"]):
+            return manifest
+
+    folder.mkdir(parents=True, exist_ok=True)
+    for old in list(folder.glob("MOV*.csv")) + list(folder.glob("excelFile_*.xls*")):
+        old.unlink()
+
+    rng = np.random.default_rng(seed)
+    files = []
+    inicio = pd.Timestamp("2020-01-01")
+    saldo = 2500.0
+    for i, n in enumerate(split_rows(rows, rows_per_file)):
+        nombre = f"MOV{22698582 + i}-{seed:06d}.csv"
+        card_frame(n, rng, inicio).to_csv(folder / nombre, sep=";", index=False)
+        files.append(nombre)
+
+        cuenta = account_frame(n, rng, inicio, saldo)
+        saldo = float(cuenta["Saldo"].iloc[0])
+        nombre = f"excelFile_{1739266641274 + i}.xlsx"
+        write_xlsx(cuenta, folder / nombre)
+        files.append(nombre)
+
+        inicio += pd.Timedelta(days=365)
+
+    manifest = {"params": params, "files": files}
+    manifest_file.write_text(json.dumps(manifest, indent=2))
+    return manifest
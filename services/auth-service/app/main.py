@@ -13,9 +13,16 @@ from typing import List, Optional
 import time
 import json
 import os
+import sys
+from pathlib import Path
 import bcrypt
 import jwt
 
+# Código compartido entre microservicios (services/common)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from common.health import HealthProbes, filesystem_probe
+from common.metrics import REGISTRY, setup_metrics
+
 app = FastAPI(
     title="Auth Service - Análisis de Gastos",
     description="Microservicio de autenticación y gestión de usuarios",
@@ -31,15 +38,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas Prometheus en /metrics
+setup_metrics(app, service="auth")
+
 # Variables globales
 START_TIME = time.time()
 USERS_DB = []
 
+USERS_FILE = Path(os.getenv("USERS_FILE", Path(__file__).parent.parent.parent.parent / "data" / "users.json"))
+
+# Verificación de dependencias en segundo plano
+HEALTH_PROBES = HealthProbes(
+    {"database": filesystem_probe(USERS_FILE)},
+    critical=["database"]
+)
+
 # Configuración JWT
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# bcrypt es deliberadamente lento: su coste domina la latencia del login
+BCRYPT_SECONDS = REGISTRY.histogram(
+    "auth_bcrypt_verify_seconds", "Tiempo de verificación de contraseñas con bcrypt",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+)
+
 
 # Modelos Pydantic
 class LoginRequest(BaseModel):
@@ -70,14 +94,12 @@ class ErrorResponse(BaseModel):
 def load_users():
     """Cargar usuarios desde el archivo JSON al iniciar el servicio"""
     global USERS_DB
-    users_file = os.path.join(os.path.dirname(__file__), "..", "..", "..", "data", "users.json")
-    
     try:
-        with open(users_file, "r", encoding="utf-8") as f:
+        with open(USERS_FILE, "r", encoding="utf-8") as f:
             USERS_DB = json.load(f)
         print(f"✅ {len(USERS_DB)} usuarios cargados en memoria")
     except FileNotFoundError:
-        print(f"⚠️  Archivo de usuarios no encontrado: {users_file}")
+        print(f"⚠️  Archivo de usuarios no encontrado: {USERS_FILE}")
         USERS_DB = []
     except json.JSONDecodeError as e:
         print(f"❌ Error al parsear JSON de usuarios: {e}")
@@ -86,7 +108,8 @@ def load_users():
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar contraseña usando bcrypt"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    with BCRYPT_SECONDS.time():
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -107,6 +130,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 async def startup_event():
     """Cargar datos al iniciar el servicio"""
     load_users()
+    await HEALTH_PROBES.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detener las tareas en segundo plano"""
+    await HEALTH_PROBES.stop()
 
 
 # Manejadores de excepciones
@@ -162,23 +192,25 @@ async def health_check():
     Verifica:
     - Estado general del servicio
     - Tiempo de actividad
-    - Estado de dependencias (database, etc.)
+    - Estado de dependencias (database: archivo de usuarios)
+    
+    Las dependencias se comprueban en segundo plano; aquí solo se devuelve
+    el último resultado.
     """
     uptime = int(time.time() - START_TIME)
+    estado, checks = HEALTH_PROBES.snapshot()
     
-    return {
-        "status": "healthy",
-        "service": "auth-service",
-        "version": "1.0.0",
-        "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-        "uptime": uptime,
-        "checks": {
-            "database": {
-                "status": "healthy",
-                "response_time_ms": 12
-            }
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if estado in ("healthy", "degraded") else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": estado,
+            "service": "auth-service",
+            "version": "1.0.0",
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "uptime": uptime,
+            "checks": checks
         }
-    }
+    )
 
 
 @app.post("/api/v1/auth/login", 
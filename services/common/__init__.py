@@ -0,0 +1 @@
+"""Código compartido por los microservicios de análisis de gastos."""
@@ -0,0 +1,74 @@
+"""
+Nombres de columna de los extractos bancarios.
+
+Cada banco usa sus propios nombres para las mismas columnas (``Fecha`` o
+``Fecha y hora``, ``Concepto`` o ``Descripción``...). ``column_key`` los
+lleva a minúsculas sin acentos ni símbolos y ``canonical_name`` además
+resuelve los alias; ``find_column`` y ``coalesce`` localizan las columnas
+por esos nombres normalizados, así que sirven tanto para registros con los
+nombres originales (data-collection-service) como para DataFrames ya
+normalizados (data-manipulation-service).
+"""
+
+import re
+import unicodedata
+from typing import Any, List, Optional
+
+import pandas as pd
+
+# Nombres alternativos que usan los bancos para las mismas columnas
+COLUMN_ALIASES = {
+    "fecha_y_hora": "fecha_hora",
+    "fecha_operacion": "fecha",
+    "fecha_valor": "f_valor",
+    "descripcion": "concepto",
+    "comercio": "establecimiento",
+}
+
+# Columnas que identifican la cuenta (nombres de column_key)
+ACCOUNT_COLUMNS = ["cuenta", "iban", "numero_de_cuenta", "account"]
+
+
+def column_key(name: Any) -> str:
+    """Nombre de columna en minúsculas, sin acentos ni símbolos (``Fecha y hora`` -> ``fecha_y_hora``)"""
+    texto = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    return re.sub(r"[^a-z0-9]+", "_", texto).strip("_")
+
+
+def canonical_name(name: Any) -> str:
+    """``column_key`` con los alias resueltos (``Descripción`` -> ``concepto``)"""
+    clave = column_key(name)
+    return COLUMN_ALIASES.get(clave, clave)
+
+
+def find_column(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
+    """Primera columna de ``df`` cuyo nombre normalizado está en ``candidates``"""
+    columnas = {}
+    for col in df.columns:
+        columnas.setdefault(column_key(col), col)
+    for candidato in candidates:
+        if candidato in columnas:
+            return columnas[candidato]
+    return None
+
+
+def coalesce(df: pd.DataFrame, candidates: List[str]) -> Optional[pd.Series]:
+    """
+    Primer valor no vacío de las columnas candidatas, fila a fila.
+
+    Sirve para registros de varios archivos juntos, donde la cuenta trae
+    ``Fecha``/``Concepto`` y las tarjetas ``Fecha y hora``/``Establecimiento``.
+    """
+    columnas = {}
+    for col in df.columns:
+        columnas.setdefault(column_key(col), col)
+    presentes = [columnas[c] for c in candidates if c in columnas]
+    if not presentes:
+        return None
+    if len(presentes) == 1:
+        return df[presentes[0]]
+    # En object para que un tipo no convierta los valores del otro
+    serie = df[presentes[0]].astype(object)
+    for col in presentes[1:]:
+        serie = serie.where(serie.notna() & (serie != ""), df[col].astype(object))
+    return serie
@@ -0,0 +1,221 @@
+"""
+Lectura de archivos CSV con una sola pasada sobre el archivo.
+
+Antes se abría el archivo en modo texto para leer la primera línea y
+deducir el delimitador, y después ``pd.read_csv`` lo volvía a abrir y leer
+entero descartando los bytes que no eran UTF-8. Aquí el archivo se proyecta
+en memoria con ``mmap``; de una muestra de los primeros bytes proyectados
+se deducen la codificación (UTF-8, cp1252 o latin-1), el delimitador, el
+carácter de comillas y el separador decimal, y el parser de pandas lee del
+mismo mapeo con esos parámetros. No hay reintentos: el archivo se lee y se
+decodifica una sola vez.
+"""
+
+import codecs
+import csv
+import io
+import mmap
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bytes del principio del archivo que se analizan
+SNIFF_BYTES = 64 * 1024
+# Tramo que se examina a partir del primer byte no ASCII y bloques en que se busca
+ENCODING_WINDOW = 4096
+SCAN_CHUNK = 1 << 20
+
+# Delimitadores candidatos, en orden de preferencia
+DELIMITERS = [";", ",", "\t", "|"]
+
+# Bytes sin carácter asignado en cp1252
+CP1252_UNDEFINED = b"\x81\x8d\x8f\x90\x9d"
+
+COMMA_DECIMAL = re.compile(r"^[-+]?(\d{1,3}(\.\d{3})+|\d+),\d+$")
+DOT_DECIMAL = re.compile(r"^[-+]?(\d{1,3}(,\d{3})+|\d+)\.\d+$")
+# "1.000" o "-1.234": miles con coma decimal o decimales con punto
+AMBIGUOUS_DECIMAL = re.compile(r"^[-+]?[1-9]\d{0,2}\.\d{3}$")
+
+
+class MappedFile(io.RawIOBase):
+    """Archivo binario de solo lectura sobre un ``mmap`` (lo que espera pandas)"""
+
+    def __init__(self, mapped: mmap.mmap):
+        self.mapped = mapped
+        self.view = memoryview(mapped)
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), len(self.view) - self.pos)
+        buffer[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: len(self.view)}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+    def close(self):
+        self.view.release()
+        super().close()
+
+
+def encoding_sample(mapped: mmap.mmap) -> bytes:
+    """
+    Bytes con los que decidir la codificación.
+
+    Son los primeros ``SNIFF_BYTES``; si son todos ASCII (cabecera y primeras
+    filas sin acentos) se añade el tramo que empieza en el primer byte no
+    ASCII del resto del mapeo, que es lo que distingue UTF-8 de cp1252.
+    """
+    head = mapped[:SNIFF_BYTES]
+    if not head.isascii() or len(mapped) <= SNIFF_BYTES:
+        return head
+    datos = np.frombuffer(mapped, dtype=np.uint8)
+    try:
+        for inicio in range(SNIFF_BYTES, len(datos), SCAN_CHUNK):
+            altos = np.flatnonzero(datos[inicio:inicio + SCAN_CHUNK] >= 0x80)
+            if len(altos):
+                pos = inicio + int(altos[0])
+                return head + mapped[pos:pos + ENCODING_WINDOW]
+    finally:
+        # El array exporta el buffer del mmap: liberarlo antes de cerrarlo
+        del datos
+    return head
+
+
+def sniff_encoding(sample: bytes) -> str:
+    """Codificación: UTF-8 (con o sin BOM), cp1252 o latin-1"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: un carácter multibyte cortado al final no es un error
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    # Los bytes sin carácter en cp1252 solo pueden ser latin-1
+    return "latin-1" if any(b in sample for b in CP1252_UNDEFINED) else "cp1252"
+
+
+def sniff_quotechar(lines: List[str]) -> str:
+    """Carácter de comillas: ``'`` solo si abre o cierra campos y ``"`` no aparece"""
+    texto = "\n".join(lines)
+    if '"' not in texto and re.search(r"(^|[;,\t|])'|'([;,\t|]|$)", texto, re.MULTILINE):
+        return "'"
+    return '"'
+
+
+def sniff_delimiter(lines: List[str], quotechar: str) -> str:
+    """
+    Delimitador que da el mismo número de campos (más de uno) en la cabecera
+    y en el mayor número de filas; en caso de empate, el primero de
+    ``DELIMITERS``.
+    """
+    mejor, mejor_puntuacion = ",", 0.0
+    for delimiter in DELIMITERS:
+        anchos = [len(row) for row in csv.reader(lines, delimiter=delimiter, quotechar=quotechar) if row]
+        if not anchos or anchos[0] < 2:
+            continue
+        puntuacion = sum(ancho == anchos[0] for ancho in anchos) / len(anchos)
+        if puntuacion > mejor_puntuacion:
+            mejor, mejor_puntuacion = delimiter, puntuacion
+    return mejor
+
+
+def sniff_decimal(lines: List[str], delimiter: str, quotechar: str) -> str:
+    """
+    Separador decimal más frecuente entre los campos numéricos de las filas.
+
+    Los valores como ``1.000`` pueden ser de cualquiera de los dos formatos
+    y no cuentan.
+    """
+    coma = punto = 0
+    for row in csv.reader(lines[1:], delimiter=delimiter, quotechar=quotechar):
+        for campo in row:
+            campo = campo.strip()
+            if COMMA_DECIMAL.match(campo):
+                coma += 1
+            elif DOT_DECIMAL.match(campo) and not AMBIGUOUS_DECIMAL.match(campo):
+                punto += 1
+    return "," if coma > punto else "."
+
+
+def pandas_options(detected: Dict[str, str]) -> Dict[str, str]:
+    """
+    Parámetros de ``pd.read_csv`` para lo detectado por ``sniff``.
+
+    Con coma como delimitador la coma decimal solo cabe entre comillas y
+    pandas no admite el mismo carácter para ambas cosas: esos importes
+    quedan como texto y se convierten después con su separador.
+    """
+    if detected["decimal"] == detected["delimiter"]:
+        return {**detected, "decimal": "."}
+    return detected
+
+
+def sniff(mapped: mmap.mmap, partial: bool = False) -> Dict[str, str]:
+    """
+    Detectar codificación, delimitador, comillas y separador decimal en una pasada.
+
+    ``mapped`` también puede ser ``bytes``; ``partial`` indica que son solo
+    el principio de un flujo (una subida) y la última línea puede estar cortada.
+    """
+    sample = encoding_sample(mapped)
+    encoding = sniff_encoding(sample)
+    texto = sample[:SNIFF_BYTES].decode(encoding, errors="replace")
+    lines = re.split(r"\r?\n", texto)
+    if (partial or len(mapped) > SNIFF_BYTES) and len(lines) > 1:
+        lines.pop()  # Última línea cortada por el límite de la muestra
+    quotechar = sniff_quotechar(lines)
+    delimiter = sniff_delimiter(lines, quotechar)
+    return {
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "quotechar": quotechar,
+        "decimal": sniff_decimal(lines, delimiter, quotechar),
+    }
+
+
+def read_csv(path: Path, timings: Optional[dict] = None) -> Tuple[pd.DataFrame, dict]:
+    """
+    Leer un CSV proyectado en memoria.
+
+    Devuelve el DataFrame y lo detectado (``encoding``, ``delimiter``,
+    ``quotechar``, ``decimal``). Si se pasa ``timings`` se anotan los
+    milisegundos de ``sniff`` y ``read``.
+
+    Los bytes que no encajan con la codificación detectada (solo posibles
+    más allá de la muestra) se sustituyen por U+FFFD en lugar de
+    descartarse, así que el archivo se decodifica una sola vez.
+    """
+    if timings is None:
+        timings = {}
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            # mmap no admite archivos vacíos; pandas da el error habitual
+            return pd.read_csv(f), {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            detectado = sniff(mapped)
+            timings["sniff"] = round((time.perf_counter() - start) * 1000, 3)
+            start = time.perf_counter()
+            with MappedFile(mapped) as handle:
+                df = pd.read_csv(handle, encoding_errors="replace", **pandas_options(detectado))
+            timings["read"] = round((time.perf_counter() - start) * 1000, 3)
+    return df, detectado
@@ -0,0 +1,147 @@
+"""
+Parseo vectorizado de columnas de fecha con detección explícita del formato.
+
+``pd.to_datetime(..., dayfirst=True)`` sin formato deduce el formato del
+primer valor: en columnas mixtas convierte en NaT todo lo que no coincide
+y con formatos no ISO acaba usando ``strptime`` valor a valor.
+
+Aquí el formato se detecta sobre una muestra de la columna entre los
+formatos que usan los bancos (``DD/MM/YYYY``, ``YYYY-MM-DD``, con o sin hora
+y fracción de segundo) y la columna completa se convierte de una vez con
+``pd.to_datetime(values, format=fmt, errors="coerce")``. Lo que no encaja
+con el formato detectado se intenta con los demás formatos de la muestra
+y, como último recurso, con el parseo genérico de pandas (solo sobre esos
+valores): primero ISO 8601 y después con el día primero.
+
+Los formatos detectados se recuerdan por disposición de archivo (columnas
+del archivo y columna de fecha), de modo que los extractos siguientes con
+la misma forma no repiten la detección.
+
+``parse_dates`` es el único parseo de fechas de los servicios: la carga de
+archivos, los listados de data-collection-service y los movimientos de
+data-manipulation-service lo importan de aquí. Devuelve siempre fechas sin
+zona horaria.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Formatos candidatos, en orden de preferencia (día antes que mes)
+DATE_FORMATS = [
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d-%m-%Y %H:%M:%S",
+    "%d-%m-%Y",
+    "%d.%m.%Y",
+    "%Y/%m/%d",
+    "%d/%m/%y",
+]
+
+SAMPLE_SIZE = 1000
+MIN_MATCH_RATIO = 0.9
+
+# Disposición de archivo -> formatos detectados, del más al menos frecuente
+FORMAT_CACHE: Dict[Tuple, List[str]] = {}
+MAX_CACHE_ENTRIES = 1024
+
+
+def parse_with_format(values: np.ndarray, fmt: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convertir valores (array de objetos) con un formato explícito.
+
+    Devuelve las fechas (``datetime64[ns]``, NaT donde no encaja) y la
+    máscara de valores convertidos.
+    """
+    fechas = pd.to_datetime(pd.Series(values, dtype=object), format=fmt, errors="coerce")
+    if fechas.dt.tz is not None:
+        fechas = fechas.dt.tz_localize(None)
+    fechas = fechas.to_numpy(dtype="datetime64[ns]")
+    return fechas, ~np.isnat(fechas)
+
+
+def rank_formats(values: np.ndarray, sample_size: int = SAMPLE_SIZE) -> List[Tuple[str, int]]:
+    """Formatos que encajan con una muestra de la columna, del que más al que menos"""
+    if len(values) > sample_size:
+        # Muestra repartida por todo el archivo, no solo las primeras filas
+        values = values[np.linspace(0, len(values) - 1, sample_size).astype(int)]
+    puntuaciones = [(fmt, int(parse_with_format(values, fmt)[1].sum())) for fmt in DATE_FORMATS]
+    # sorted es estable: en caso de empate gana el orden de DATE_FORMATS
+    return [(fmt, n) for fmt, n in sorted(puntuaciones, key=lambda x: -x[1]) if n > 0]
+
+
+def parse_with_formats(values: np.ndarray, no_nulos: np.ndarray, formats: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Aplicar los formatos en orden, cada uno solo a los valores aún sin convertir"""
+    fechas = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+    convertidos = np.zeros(len(values), dtype=bool)
+    for fmt in formats:
+        pendientes = np.flatnonzero(no_nulos & ~convertidos)
+        if not len(pendientes):
+            break
+        parcial, ok = parse_with_format(values[pendientes], fmt)
+        fechas[pendientes[ok]] = parcial[ok]
+        convertidos[pendientes[ok]] = True
+    return fechas, convertidos
+
+
+def parse_fallback(values: pd.Series) -> pd.Series:
+    """
+    Parseo genérico de los valores con formatos no previstos.
+
+    ISO 8601 antes que día primero para no intercambiar día y mes.
+    """
+    textos = values.astype(str)
+    fechas = pd.to_datetime(textos, errors="coerce", format="ISO8601")
+    if not pd.api.types.is_datetime64_any_dtype(fechas):
+        # Desfases horarios distintos en la misma columna: se pasan a UTC
+        fechas = pd.to_datetime(textos, errors="coerce", format="ISO8601", utc=True)
+    if fechas.dt.tz is not None:
+        fechas = fechas.dt.tz_localize(None)
+    sin_iso = fechas.isna()
+    if sin_iso.any():
+        fechas[sin_iso] = pd.to_datetime(textos[sin_iso], errors="coerce", dayfirst=True, format="mixed")
+    return fechas
+
+
+def parse_dates(values: pd.Series, layout: Optional[Tuple] = None) -> pd.Series:
+    """
+    Convertir una columna a datetime sin zona horaria detectando el formato.
+
+    ``layout`` identifica la disposición del archivo para reutilizar los
+    formatos detectados en archivos con la misma forma.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.tz_localize(None) if values.dt.tz is not None else values
+
+    no_nulos = values.notna().to_numpy()
+    objetos = values.to_numpy(dtype=object)
+    formatos = FORMAT_CACHE.get(layout) if layout is not None else None
+    convertidos = None
+
+    if formatos is not None:
+        fechas, convertidos = parse_with_formats(objetos, no_nulos, formatos)
+        if convertidos.sum() < MIN_MATCH_RATIO * no_nulos.sum():
+            # El archivo ya no tiene la forma recordada: volver a detectar
+            convertidos = None
+
+    if convertidos is None:
+        formatos = [fmt for fmt, _ in rank_formats(objetos[no_nulos])]
+        fechas, convertidos = parse_with_formats(objetos, no_nulos, formatos)
+        if layout is not None:
+            if len(FORMAT_CACHE) >= MAX_CACHE_ENTRIES:
+                FORMAT_CACHE.clear()
+            FORMAT_CACHE[layout] = formatos
+
+    resultado = pd.Series(fechas, index=values.index, name=values.name)
+    pendientes = no_nulos & ~convertidos
+    if pendientes.any():
+        resultado[pendientes] = parse_fallback(values[pendientes])
+    return resultado
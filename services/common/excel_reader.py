@@ -0,0 +1,305 @@
+"""
+Lectura rápida de archivos Excel (.xls/.xlsx) con caché de conversiones.
+
+``pd.read_excel`` convierte cada celda en Python y vuelve a parsear el libro
+completo en cada carga. Aquí se usa el lector más rápido disponible:
+
+1. ``python-calamine`` (Rust) si está instalado, para .xls y .xlsx.
+2. openpyxl en modo ``read_only`` leyendo solo valores (.xlsx).
+3. xlrd columna a columna con conversión vectorizada de fechas (.xls).
+
+El libro se abre una sola vez y se recorre entero de forma secuencial. Los
+extractos de los bancos suelen traer filas de título encima de la cabecera
+y varias hojas: la cabecera se localiza en las primeras filas de cada hoja
+y se concatenan las hojas con la misma cabecera que la primera hoja de
+datos. Las filas se convierten a DataFrame con el mismo ``TextParser`` que
+usa pandas, así que un libro con una hoja y la cabecera en la primera fila
+da el mismo resultado que ``pd.read_excel``.
+
+``ExcelCache`` guarda el DataFrame ya convertido con el hash del contenido
+como clave: un libro que ya se leyó una vez no se vuelve a parsear aunque
+cambie de nombre o de carpeta.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # Dependencia opcional
+    CalamineWorkbook = None
+
+try:
+    import pyarrow  # noqa: F401  (solo para saber si hay soporte de parquet)
+    CACHE_FORMAT = "parquet"
+except ImportError:
+    CACHE_FORMAT = "pickle"
+
+# Cambiar al modificar la conversión para invalidar las entradas antiguas
+CACHE_VERSION = 2
+
+# Filas del principio de cada hoja donde se busca la cabecera
+HEADER_SCAN_ROWS = 30
+
+
+def available_engine(extension: str) -> str:
+    """Motor que se usará para una extensión (.xls o .xlsx)"""
+    if CalamineWorkbook is not None:
+        return "calamine"
+    return "openpyxl" if extension == ".xlsx" else "xlrd"
+
+
+def is_empty(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def find_header_row(rows: List[list], scan_rows: int = HEADER_SCAN_ROWS) -> Optional[int]:
+    """
+    Índice de la fila de cabecera entre las primeras ``scan_rows`` filas.
+
+    Es la primera fila con al menos dos celdas, todas de texto, y al menos
+    tan ancha como la siguiente fila no vacía (la primera de datos); así se
+    saltan títulos y líneas como ``Cuenta: ES12...`` encima de la tabla.
+    """
+    anchos = [sum(not is_empty(v) for v in row) for row in rows[:scan_rows + 1]]
+    for i, ancho in enumerate(anchos[:scan_rows]):
+        if ancho < 2 or not all(isinstance(v, str) for v in rows[i] if not is_empty(v)):
+            continue
+        siguiente = next((a for a in anchos[i + 1:] if a), None)
+        if siguiente is not None and ancho >= siguiente:
+            return i
+    return None
+
+
+def header_key(row: list) -> Tuple[str, ...]:
+    """Cabecera normalizada para comparar hojas"""
+    return tuple(str(v).strip().lower() for v in row if not is_empty(v))
+
+
+def rows_to_frame(rows: List[list]) -> pd.DataFrame:
+    """Convertir filas (la primera es la cabecera) a DataFrame como pd.read_excel"""
+    # Las filas vacías al final del rango usado no son datos
+    while rows and all(is_empty(v) for v in rows[-1]):
+        rows.pop()
+    if not rows:
+        return pd.DataFrame()
+
+    # Columnas sin cabecera ni datos (títulos más anchos que la tabla)
+    ancho = len(rows[0])
+    sin_cabecera = [c for c in range(ancho) if is_empty(rows[0][c])]
+    vacias = {c for c in sin_cabecera if all(c >= len(r) or is_empty(r[c]) for r in rows)}
+    if vacias:
+        conservar = [c for c in range(ancho) if c not in vacias]
+        rows = [[r[c] if c < len(r) else None for c in conservar] for r in rows]
+    return TextParser(rows, header=0).read()
+
+
+def _read_calamine(path: Path) -> Iterator[Tuple[str, List[list]]]:
+    wb = CalamineWorkbook.from_path(str(path))
+    for name in wb.sheet_names:
+        yield name, [
+            [int(v) if isinstance(v, float) and v.is_integer() else v for v in row]
+            for row in wb.get_sheet_by_name(name).to_python(skip_empty_area=False)
+        ]
+
+
+def _read_openpyxl(path: Path) -> Iterator[Tuple[str, List[list]]]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield ws.title, [list(row) for row in ws.iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+
+def _xlrd_column(values: list, types: list, datemode: int) -> list:
+    """Convertir una columna de xlrd a valores Python sin recorrer celda a celda"""
+    import xlrd
+
+    tipos = np.asarray(types)
+    columna = np.asarray(values, dtype=object)
+    columna[(tipos == xlrd.XL_CELL_EMPTY) | (tipos == xlrd.XL_CELL_BLANK) | (tipos == xlrd.XL_CELL_ERROR)] = None
+
+    numeros = tipos == xlrd.XL_CELL_NUMBER
+    if numeros.any():
+        valores = columna[numeros].astype(float)
+        enteros = valores == np.floor(valores)
+        convertidos = valores.astype(object)
+        convertidos[enteros] = valores[enteros].astype(np.int64).tolist()
+        columna[numeros] = convertidos
+
+    fechas = tipos == xlrd.XL_CELL_DATE
+    if fechas.any():
+        origen = "1904-01-01" if datemode else "1899-12-30"
+        convertidas = pd.to_datetime(columna[fechas].astype(float), unit="D", origin=origen).round("ms")
+        columna[fechas] = convertidas.to_numpy(dtype=object)
+
+    booleanos = tipos == xlrd.XL_CELL_BOOLEAN
+    if booleanos.any():
+        columna[booleanos] = columna[booleanos].astype(bool)
+    return list(columna)
+
+
+def _read_xlrd(path: Path) -> Iterator[Tuple[str, List[list]]]:
+    import xlrd
+
+    book = xlrd.open_workbook(str(path), on_demand=True)
+    try:
+        for i in range(book.nsheets):
+            sheet = book.sheet_by_index(i)
+            columnas = [
+                _xlrd_column(sheet.col_values(c), sheet.col_types(c), book.datemode)
+                for c in range(sheet.ncols)
+            ]
+            yield sheet.name, [list(row) for row in zip(*columnas)]
+            book.unload_sheet(i)
+    finally:
+        book.release_resources()
+
+
+READERS = {"calamine": _read_calamine, "openpyxl": _read_openpyxl, "xlrd": _read_xlrd}
+
+
+def read_excel(path: Path) -> Tuple[pd.DataFrame, str]:
+    """
+    Leer las hojas de datos de un libro; devuelve el DataFrame y el motor usado.
+
+    Se concatenan, en orden, las hojas cuya cabecera coincide con la de la
+    primera hoja con datos. Si ninguna hoja tiene una cabecera reconocible se
+    usa la primera hoja no vacía con la primera fila como cabecera.
+    """
+    engine = available_engine(path.suffix.lower())
+    frames = []
+    cabecera = None
+    primera_no_vacia = None
+    for _, rows in READERS[engine](path):
+        if primera_no_vacia is None and rows:
+            primera_no_vacia = rows
+        inicio = find_header_row(rows)
+        if inicio is None or len(rows) <= inicio + 1:
+            continue
+        clave = header_key(rows[inicio])
+        if cabecera is None:
+            cabecera = clave
+        elif clave != cabecera:
+            continue
+        frames.append(rows_to_frame(rows[inicio:]))
+
+    if not frames:
+        return rows_to_frame(primera_no_vacia or []), engine
+    if len(frames) == 1:
+        return frames[0], engine
+    return pd.concat(frames, ignore_index=True), engine
+
+
+def content_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash del contenido del archivo (blake2b de 128 bits)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExcelCache:
+    """
+    Caché en disco de libros ya convertidos, indexada por hash del contenido.
+
+    Se guarda en parquet si pyarrow está disponible y si no en pickle; los
+    archivos solo los escribe el propio servicio. Al superar ``max_entries``
+    se borran las entradas menos usadas recientemente.
+    """
+
+    def __init__(self, directory: Path, max_entries: int = 256):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+
+    def _path(self, key: str, fmt: str) -> Path:
+        suffix = "parquet" if fmt == "parquet" else "pkl"
+        return self.directory / f"{key}-v{CACHE_VERSION}.{suffix}"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        for fmt in ("parquet", "pickle"):
+            path = self._path(key, fmt)
+            if not path.exists():
+                continue
+            try:
+                df = pd.read_parquet(path) if fmt == "parquet" else pd.read_pickle(path)
+            except Exception:
+                path.unlink(missing_ok=True)
+                continue
+            os.utime(path)
+            return df
+        return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            self._write(df, CACHE_FORMAT, self._path(key, CACHE_FORMAT))
+        except Exception:
+            if CACHE_FORMAT == "pickle":
+                raise
+            # Columnas con tipos mezclados que parquet no admite
+            self._write(df, "pickle", self._path(key, "pickle"))
+        self._evict()
+
+    def _write(self, df: pd.DataFrame, fmt: str, path: Path):
+        """
+        Escribir en un temporal propio y sustituir la entrada de una vez.
+
+        El directorio lo comparten data-collection-service y los procesos de
+        parseo de data-extraction-service: con un nombre de temporal fijo dos
+        escritores del mismo libro se pisarían antes del ``os.replace``.
+        """
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f"{path.name}.",
+                                         suffix=".tmp", delete=False) as f:
+            tmp = f.name
+            try:
+                if fmt == "parquet":
+                    df.to_parquet(f, index=False)
+                else:
+                    df.to_pickle(f)
+            except BaseException:
+                f.close()
+                os.unlink(tmp)
+                raise
+        os.replace(tmp, path)
+
+    def _evict(self):
+        entradas = [p for p in self.directory.glob(f"*-v{CACHE_VERSION}.*") if not p.name.endswith(".tmp")]
+        if len(entradas) <= self.max_entries:
+            return
+        entradas.sort(key=lambda p: p.stat().st_mtime)
+        for path in entradas[:len(entradas) - self.max_entries]:
+            path.unlink(missing_ok=True)
+
+
+def read_excel_cached(path: Path, cache: Optional[ExcelCache] = None) -> Tuple[pd.DataFrame, str]:
+    """
+    Leer un libro usando la caché si se indica.
+
+    Devuelve el DataFrame y el origen: el motor usado o ``"cache"``.
+    """
+    if cache is None:
+        return read_excel(path)
+
+    key = content_hash(path)
+    df = cache.get(key)
+    if df is not None:
+        return df, "cache"
+
+    df, engine = read_excel(path)
+    try:
+        cache.put(key, df)
+    except OSError as e:
+        print(f"⚠️  No se pudo guardar {path.name} en la caché de Excel: {e}")
+    return df, engine
@@ -0,0 +1,122 @@
+"""
+Verificación periódica de dependencias para los endpoints de salud.
+
+Las sondas se ejecutan en segundo plano cada ``interval`` segundos y el
+resultado se guarda en memoria. ``/api/v1/health`` solo lee ese resultado,
+así que responde en tiempo constante y nunca lanza peticiones a otros
+servicios por cada consulta.
+"""
+
+import asyncio
+import os
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Estados que admite la especificación de los health checks
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+UNHEALTHY = "unhealthy"
+STARTING = "starting"
+CONNECTING = "connecting"
+
+
+def http_probe(url: str, timeout: float = 2.0) -> Callable[[], None]:
+    """Sonda que hace GET a ``url`` y falla si no responde 2xx"""
+    def probe():
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            if not 200 <= response.status < 300:
+                raise RuntimeError(f"HTTP {response.status}")
+    return probe
+
+
+def filesystem_probe(path: Path, writable: bool = False) -> Callable[[], None]:
+    """Sonda que comprueba que ``path`` existe y es legible (y escribible si se pide)"""
+    def probe():
+        os.stat(path)
+        mode = os.R_OK | (os.W_OK if writable else 0)
+        if not os.access(path, mode):
+            raise PermissionError(f"Sin permisos sobre {path}")
+    return probe
+
+
+class HealthProbes:
+    """
+    Conjunto de sondas con resultados cacheados.
+
+    ``critical`` indica las dependencias cuyo fallo deja el servicio
+    ``unhealthy``; el fallo de las demás solo lo degrada. Una sonda que tarda
+    más de ``slow_ms`` se marca como ``degraded``.
+    """
+
+    def __init__(self, probes: Dict[str, Callable[[], None]], critical: Iterable[str] = (),
+                 interval: float = 15.0, timeout: float = 2.0, slow_ms: float = 1000.0):
+        self.probes = probes
+        self.critical = set(critical)
+        self.interval = interval
+        self.timeout = timeout
+        self.slow_ms = slow_ms
+        self.checks: Dict[str, Dict[str, Any]] = {
+            name: {"status": CONNECTING, "response_time_ms": None} for name in probes
+        }
+        self.status = STARTING
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_probe(self, name: str, probe: Callable[[], None]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(probe), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return {"status": UNHEALTHY, "response_time_ms": None, "error": "Timeout"}
+        except Exception as e:
+            return {"status": UNHEALTHY, "response_time_ms": None, "error": str(e) or type(e).__name__}
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        if elapsed_ms > self.slow_ms:
+            return {"status": DEGRADED, "response_time_ms": elapsed_ms, "error": "High response time"}
+        return {"status": HEALTHY, "response_time_ms": elapsed_ms}
+
+    async def run_once(self):
+        """Ejecutar todas las sondas en paralelo y actualizar el resultado cacheado"""
+        names = list(self.probes)
+        results = await asyncio.gather(*(self._run_probe(n, self.probes[n]) for n in names))
+        checked_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        for name, result in zip(names, results):
+            result["checked_at"] = checked_at
+        self.checks = dict(zip(names, results))
+        self.status = self._overall_status()
+
+    def _overall_status(self) -> str:
+        status = HEALTHY
+        for name, check in self.checks.items():
+            if check["status"] == HEALTHY:
+                continue
+            if name in self.critical and check["status"] == UNHEALTHY:
+                return UNHEALTHY
+            status = DEGRADED
+        return status
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"⚠️  Error al ejecutar las sondas de salud: {e}")
+
+    async def start(self):
+        """Ejecutar una primera ronda y programar las siguientes en segundo plano"""
+        await self.run_once()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Detener la tarea en segundo plano"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> Tuple[str, Dict[str, Any]]:
+        """Estado global y checks de la última ronda (sin ejecutar sondas)"""
+        return self.status, self.checks
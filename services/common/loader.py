@@ -0,0 +1,139 @@
+"""
+Lectura de extractos bancarios (CSV y Excel) a DataFrame.
+
+Lo usan el servicio de recopilación (cargas completas de una carpeta) y el
+de extracción (archivos nuevos detectados al vuelo), así que ambos parsean
+igual: mismo lector de CSV, misma caché de Excel y misma detección de
+fechas.
+"""
+
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from common.csv_reader import read_csv
+from common.dates import parse_dates
+from common.excel_reader import ExcelCache, read_excel_cached
+from common.metrics import REGISTRY
+
+# Extensiones que se saben leer
+SUPPORTED_EXTENSIONS = (".csv", ".xls", ".xlsx")
+
+PARSE_SECONDS = REGISTRY.histogram(
+    "load_file_parse_seconds", "Tiempo de lectura y parseo de un archivo por formato", ["format"]
+)
+EXCEL_READS = REGISTRY.counter(
+    "excel_reads_total", "Lecturas de libros Excel por origen (motor o caché)", ["source"]
+)
+
+
+def elapsed_ms(start: float) -> float:
+    """Milisegundos transcurridos desde ``start`` (time.perf_counter)"""
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def detect_date_column(df: pd.DataFrame) -> Optional[str]:
+    """Detectar automáticamente la columna de fecha"""
+    date_keywords = ['fecha', 'date', 'Fecha', 'Date', 'FECHA', 'DATE', 'Fecha y hora', 'fecha_hora']
+
+    # Buscar coincidencia exacta
+    for keyword in date_keywords:
+        if keyword in df.columns:
+            return keyword
+
+    # Buscar coincidencia parcial (contiene la palabra)
+    for col in df.columns:
+        col_lower = col.lower()
+        if 'fecha' in col_lower or 'date' in col_lower:
+            return col
+
+    return None
+
+
+def parse_date_column(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """
+    Parsear columna de fecha a datetime.
+
+    El formato se detecta sobre una muestra y se recuerda para los archivos
+    con las mismas columnas (ver common/dates.py).
+    """
+    try:
+        layout = (tuple(str(c) for c in df.columns), date_col)
+        df[date_col] = parse_dates(df[date_col], layout)
+        return df
+    except Exception:
+        return df
+
+
+def load_file(filepath: Path, timings: Optional[dict] = None,
+              excel_cache: Optional[ExcelCache] = None,
+              readers: Optional[Dict[str, Callable[[Path], pd.DataFrame]]] = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Cargar un archivo CSV o Excel.
+
+    Si se pasa ``timings``, se rellena con los milisegundos de cada etapa
+    (``sniff``, ``read``, ``parse_dates``). Los libros Excel se buscan
+    antes en ``excel_cache`` si se indica. ``readers`` añade lectores por
+    extensión (p. ej. ``{".pdf": ...}`` en data-extraction-service).
+    """
+    if timings is None:
+        timings = {}
+    file_extension = filepath.suffix.lower()
+    decimal = None
+    file_size = filepath.stat().st_size
+    start = time.perf_counter()
+
+    try:
+        # Leer archivo según extensión
+        if file_extension == '.csv':
+            # Delimitador y codificación se detectan sobre el mismo mapeo que lee el parser
+            df, detectado = read_csv(filepath, timings)
+            decimal = detectado.get("decimal")
+            file_format = 'csv'
+        elif file_extension in ['.xls', '.xlsx']:
+            df, origen = read_excel_cached(filepath, excel_cache)
+            EXCEL_READS.inc(source=origen)
+            timings["read"] = elapsed_ms(start)
+            file_format = 'xlsx' if file_extension == '.xlsx' else 'xls'
+        elif readers and file_extension in readers:
+            df = readers[file_extension](filepath)
+            timings["read"] = elapsed_ms(start)
+            file_format = file_extension.lstrip('.')
+        else:
+            raise ValueError(f"Formato no soportado: {file_extension}")
+
+        # Detectar columna de fecha
+        stage = time.perf_counter()
+        date_col = detect_date_column(df)
+        fecha_inicio = None
+        fecha_fin = None
+
+        if date_col:
+            df = parse_date_column(df, date_col)
+            # Filtrar valores no nulos
+            valid_dates = df[date_col].dropna()
+            if len(valid_dates) > 0:
+                fecha_inicio = valid_dates.min().strftime('%Y-%m-%d')
+                fecha_fin = valid_dates.max().strftime('%Y-%m-%d')
+        timings["parse_dates"] = elapsed_ms(stage)
+
+        PARSE_SECONDS.observe(time.perf_counter() - start, format=file_format)
+
+        # Metadata del archivo
+        file_info = {
+            "filename": filepath.name,
+            "format": file_format,
+            "records": len(df),
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+            "size_bytes": file_size,
+            # Separador decimal de los importes que quedan como texto (ver common/money.py)
+            "decimal": decimal
+        }
+
+        return df, file_info
+
+    except Exception as e:
+        raise ValueError(f"Error al leer {filepath.name}: {str(e)}")
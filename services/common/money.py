@@ -0,0 +1,174 @@
+"""
+Importes como céntimos enteros (int64).
+
+Los importes se guardan y se suman en céntimos: las sumas son exactas y no
+acumulan el error de redondeo de float64. Solo se pasan a euros (float) al
+responder o al alimentar cálculos que son de coma flotante por naturaleza
+(logaritmos, medias, modelos de previsión).
+
+``parse_cents`` convierte una columna de importes en euros sin pasar por
+float cuando llegan como texto: se recorre una vez la matriz de bytes de
+las cadenas (``to_byte_matrix``) acumulando la parte entera y los dos
+primeros decimales. Se admiten:
+
+- coma decimal con punto de miles (``-1.234,56``), el formato de los bancos
+- punto decimal (``12.5``) si no hay coma y hay un único punto; con varios
+  puntos y sin coma, son de miles (``1.234.567``)
+- signo delante o detrás y espacios
+
+Si se conoce el separador decimal del archivo (``decimal``, el que detecta
+``common.csv_reader.sniff``), el otro carácter es siempre de miles y no
+hay que adivinarlo valor a valor.
+
+El tercer decimal redondea el céntimo (mitad lejos de cero). Las columnas
+ya numéricas (Excel, CSV leídos con su separador decimal) y los números
+sueltos de las columnas mixtas (lotes JSON) se redondean a céntimo desde
+float, lo que es exacto para importes con dos decimales.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CENTS_PER_EURO = 100
+
+# Longitud máxima de un importe en texto
+MAX_AMOUNT_WIDTH = 32
+# Dígitos de la parte entera admitidos sin desbordar int64 en céntimos
+MAX_INTEGER_DIGITS = 15
+
+COMMA, DOT, MINUS, PLUS, SPACE = (ord(c) for c in ",.-+ ")
+# Valores que ya son números en columnas de objetos (``bool`` es subclase de ``int``)
+NUMBER_TYPES = (int, float, np.number)
+BOOL_TYPES = (bool, np.bool_)
+ALLOWED_BYTES = np.array([0, COMMA, DOT, MINUS, PLUS, SPACE], dtype=np.uint8)
+
+
+def to_byte_matrix(values: np.ndarray, width: int) -> np.ndarray:
+    """
+    Matriz ``uint8`` de ``width + 1`` columnas con los bytes de cada valor.
+
+    La columna extra permite distinguir los valores más largos que ``width``.
+    Los valores no ASCII quedan como filas de ceros.
+    """
+    try:
+        bytes_ = values.astype(f"S{width + 1}")
+    except UnicodeEncodeError:
+        ascii_ = np.fromiter((isinstance(v, str) and v.isascii() for v in values), dtype=bool, count=len(values))
+        bytes_ = np.zeros(len(values), dtype=f"S{width + 1}")
+        bytes_[ascii_] = values[ascii_].astype(f"S{width + 1}")
+    return bytes_.view(np.uint8).reshape(-1, width + 1)
+
+
+def parse_text_cents(values: np.ndarray, decimal: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Céntimos de un array de cadenas y máscara de los valores convertidos.
+
+    Todo el trabajo son operaciones de numpy sobre la matriz de bytes,
+    columna a columna; los valores no ASCII no se convierten. ``decimal``
+    (``","`` o ``"."``) fija el separador decimal; sin él se deduce de cada
+    valor.
+    """
+    matriz = to_byte_matrix(values, MAX_AMOUNT_WIDTH)
+    valido = matriz[:, MAX_AMOUNT_WIDTH] == 0
+    ocupadas = np.flatnonzero(matriz.any(axis=0))
+    ancho = int(ocupadas[-1]) + 1 if len(ocupadas) else 0
+
+    comas = (matriz == COMMA).sum(axis=1)
+    puntos = (matriz == DOT).sum(axis=1)
+    menos = (matriz == MINUS).sum(axis=1)
+    valido &= menos + (matriz == PLUS).sum(axis=1) <= 1
+    if decimal == ".":
+        valido &= puntos <= 1
+        separador = np.where(puntos == 1, DOT, -1)
+    elif decimal == ",":
+        valido &= comas <= 1
+        separador = np.where(comas == 1, COMMA, -1)
+    else:
+        valido &= comas <= 1
+        separador = np.where(comas == 1, COMMA, np.where(puntos == 1, DOT, -1))
+    # El carácter que no es el decimal separa miles
+    miles = np.where(separador == DOT, COMMA, DOT)
+
+    n = len(matriz)
+    entero = np.zeros(n, dtype=np.int64)
+    centimos = np.zeros(n, dtype=np.int64)
+    digitos_enteros = np.zeros(n, dtype=np.int64)
+    decimales = np.zeros(n, dtype=np.int64)
+    redondeo = np.zeros(n, dtype=bool)
+    tras_separador = np.zeros(n, dtype=bool)
+    con_digitos = np.zeros(n, dtype=bool)
+    signo_al_final = np.zeros(n, dtype=bool)
+    for k in range(ancho):
+        byte = matriz[:, k]
+        # En uint8 los bytes menores que '0' dan la vuelta y superan 9
+        digito = byte - np.uint8(48)
+        es_digito = digito <= 9
+        es_signo = (byte == MINUS) | (byte == PLUS)
+        valido &= es_digito | np.isin(byte, ALLOWED_BYTES)
+        # El signo va delante o detrás de las cifras, no entre ellas
+        valido &= ~(signo_al_final & es_digito)
+        signo_al_final |= es_signo & con_digitos
+        # No puede haber separadores de miles después del decimal
+        valido &= ~(tras_separador & (byte == miles))
+        tras_separador |= byte == separador
+
+        d = digito.astype(np.int64)
+        en_entero = es_digito & ~tras_separador
+        entero = np.where(en_entero, entero * 10 + d, entero)
+        digitos_enteros += en_entero
+        en_decimal = es_digito & tras_separador
+        decimales += en_decimal
+        centimos += np.where(en_decimal & (decimales == 1), d * 10, 0)
+        centimos += np.where(en_decimal & (decimales == 2), d, 0)
+        redondeo |= en_decimal & (decimales == 3) & (d >= 5)
+        con_digitos |= es_digito
+
+    valido &= con_digitos & (digitos_enteros <= MAX_INTEGER_DIGITS)
+    total = entero * CENTS_PER_EURO + centimos + redondeo
+    total = np.where(menos > 0, -total, total)
+    return np.where(valido, total, 0), valido
+
+
+def float_cents(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Céntimos de importes en float y máscara de los finitos y representables"""
+    validos = np.isfinite(values) & (np.abs(values) < 10 ** MAX_INTEGER_DIGITS)
+    centimos = np.zeros(len(values), dtype=np.int64)
+    centimos[validos] = np.rint(values[validos] * CENTS_PER_EURO).astype(np.int64)
+    return centimos, validos
+
+
+def parse_cents(series: pd.Series, decimal: Optional[str] = None) -> pd.Series:
+    """
+    Importes en euros a céntimos (``Int64``, ``<NA>`` donde no hay importe válido).
+
+    ``decimal`` es el separador decimal del archivo, si se conoce, y solo se
+    aplica a los valores de texto: los que ya son números (columnas leídas
+    por pandas, lotes JSON) se convierten desde float.
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        centimos, validos = float_cents(series.to_numpy(dtype=float, na_value=np.nan))
+    else:
+        valores = series.to_numpy(dtype=object)
+        numeros = np.array([isinstance(v, NUMBER_TYPES) and not isinstance(v, BOOL_TYPES) for v in valores],
+                           dtype=bool)
+        no_nulos = series.notna().to_numpy() & ~numeros
+        centimos, validos = parse_text_cents(np.where(numeros, None, valores), decimal)
+        if numeros.any():
+            centimos[numeros], validos[numeros] = float_cents(valores[numeros].astype(float))
+        pendientes = np.flatnonzero(no_nulos & ~validos)
+        if len(pendientes):
+            # Símbolo del euro, espacios no ASCII, notación científica...: solo esos valores
+            limpio = series.iloc[pendientes].astype(str).str.replace(r"[\s€]", "", regex=True)
+            parcial, ok = parse_text_cents(limpio.to_numpy(dtype=object), decimal)
+            if not ok.all():
+                numeros = pd.to_numeric(limpio[~ok], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+                parcial[~ok], ok[~ok] = float_cents(numeros)
+            centimos[pendientes], validos[pendientes] = parcial, ok
+    return pd.Series(pd.arrays.IntegerArray(centimos, ~validos), index=series.index, name=series.name)
+
+
+def cents_to_euros(cents):
+    """Céntimos (escalar, array o Series) a euros en float"""
+    return cents / CENTS_PER_EURO
@@ -0,0 +1,175 @@
+"""
+Índice de movimientos ya cargados para descartar los repetidos.
+
+Las exportaciones consecutivas de un banco se solapan días o semanas, así
+que el mismo movimiento llega en varios archivos. Cada fila se reduce a una
+clave normalizada (fecha, importe, concepto, saldo y cuenta) que se
+convierte en un hash de 64 bits, y el índice guarda cuántas veces aparece
+cada clave en el entorno.
+
+Un archivo puede traer legítimamente movimientos idénticos (dos cafés el
+mismo día por el mismo importe), de modo que una fila solo es repetida si
+su clave ya estaba en el índice tantas veces como lleva aparecida en el
+propio archivo. El índice es un ``dict`` (comprobación O(1) por fila) y se
+guarda en disco junto al estado como ``.npz``.
+
+Las filas sin fecha o sin importe no tienen clave y se cargan siempre.
+"""
+
+from itertools import compress
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.columns import ACCOUNT_COLUMNS, coalesce, find_column
+
+try:
+    from app.records import DATE_COLUMNS, DESCRIPTION_COLUMNS, date_values, stored_cents
+except ImportError:  # Ejecución directa: python app/main.py
+    from records import DATE_COLUMNS, DESCRIPTION_COLUMNS, date_values, stored_cents
+
+# Centinela de importe/saldo ausente en la clave
+MISSING_CENTS = np.iinfo(np.int64).min
+
+
+def normalize_cents(series: Optional[pd.Series], size: int) -> np.ndarray:
+    """Importes del almacén (céntimos) con ``MISSING_CENTS`` donde faltan"""
+    if series is None:
+        return np.full(size, MISSING_CENTS, dtype=np.int64)
+    return stored_cents(series).to_numpy(dtype=np.int64, na_value=MISSING_CENTS)
+
+
+def text_hashes(series: Optional[pd.Series], size: int) -> np.ndarray:
+    """
+    Hash del texto en mayúsculas con los espacios colapsados.
+
+    Se normaliza y se calcula el hash una vez por valor distinto.
+    """
+    if series is None:
+        return np.zeros(size, dtype=np.uint64)
+    codes, uniques = pd.factorize(series.fillna("").astype(str), sort=False)
+    normalizados = np.array([" ".join(u.upper().split()) for u in uniques], dtype=object)
+    if not len(normalizados):
+        return np.zeros(size, dtype=np.uint64)
+    return pd.util.hash_array(normalizados)[codes]
+
+
+def row_keys(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash de la clave normalizada de cada fila (``uint64``).
+
+    Devuelve también la máscara de las filas con fecha e importe, las
+    únicas que se deduplican.
+    """
+    fecha = coalesce(df, DATE_COLUMNS)
+    importe_col = find_column(df, ["importe"])
+    if fecha is None or importe_col is None or not len(df):
+        return np.zeros(len(df), dtype=np.uint64), np.zeros(len(df), dtype=bool)
+
+    fechas = date_values(fecha.reset_index(drop=True))
+    importes = normalize_cents(df[importe_col], len(df))
+    saldo_col = find_column(df, ["saldo"])
+    cuenta_col = find_column(df, ACCOUNT_COLUMNS)
+    clave = pd.DataFrame({
+        "fecha": fechas,
+        "importe": importes,
+        "concepto": text_hashes(coalesce(df, DESCRIPTION_COLUMNS), len(df)),
+        "saldo": normalize_cents(df[saldo_col] if saldo_col else None, len(df)),
+        "cuenta": text_hashes(df[cuenta_col] if cuenta_col else None, len(df)),
+    })
+    hashes = pd.util.hash_pandas_object(clave, index=False).to_numpy()
+    return hashes, (fechas != np.iinfo(np.int64).min) & (importes != MISSING_CENTS)
+
+
+class DedupIndex:
+    """Multiplicidad de cada clave de movimiento cargada en un entorno"""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def clear(self):
+        self.counts = {}
+
+    def add(self, df: pd.DataFrame) -> np.ndarray:
+        """Registrar las filas de un archivo y devolver la máscara de las nuevas"""
+        hashes, validas = row_keys(df)
+        nuevas = np.ones(len(hashes), dtype=bool)
+        if not validas.any():
+            return nuevas
+        claves = hashes[validas]
+        # Número de aparición de cada fila dentro del archivo (1, 2, ...)
+        veces = pd.Series(claves).groupby(claves, sort=False).cumcount().to_numpy() + 1
+        lista = claves.tolist()
+        previas = np.fromiter((self.counts.get(k, 0) for k in lista), dtype=np.int64, count=len(lista))
+        es_nueva = veces > previas
+        # Las apariciones crecen dentro de cada clave: gana la última (la mayor)
+        self.counts.update(zip(compress(lista, es_nueva), veces[es_nueva].tolist()))
+        nuevas[validas] = es_nueva
+        return nuevas
+
+    def rebuild(self, records: List[dict]):
+        """
+        Reconstruir el índice a partir de los registros del entorno.
+
+        La multiplicidad de una clave es la mayor que tiene en un mismo
+        archivo, igual que al cargarlos uno a uno.
+        """
+        self.counts = {}
+        if not records:
+            return
+        df = pd.DataFrame.from_records(records)
+        hashes, validas = row_keys(df)
+        archivos = df["source_file"] if "source_file" in df.columns else pd.Series("", index=df.index)
+        tabla = pd.DataFrame({"clave": hashes, "archivo": archivos.to_numpy()})[validas]
+        if tabla.empty:
+            return
+        maximos = tabla.groupby(["clave", "archivo"], sort=False).size().groupby(level=0).max()
+        self.counts = dict(zip(maximos.index.tolist(), maximos.tolist()))
+
+    def to_arrays(self):
+        claves = np.fromiter(self.counts.keys(), dtype=np.uint64, count=len(self.counts))
+        veces = np.fromiter(self.counts.values(), dtype=np.uint32, count=len(self.counts))
+        return claves, veces
+
+    def load_arrays(self, claves: np.ndarray, veces: np.ndarray):
+        self.counts = dict(zip(claves.tolist(), veces.tolist()))
+
+
+def save_indexes(path: Path, indexes: Dict[str, DedupIndex], records: Dict[str, int]):
+    """Guardar los índices de todos los entornos en un ``.npz``"""
+    arrays = {}
+    for entorno, indice in indexes.items():
+        arrays[f"{entorno}_keys"], arrays[f"{entorno}_counts"] = indice.to_arrays()
+        arrays[f"{entorno}_records"] = np.array([records.get(entorno, 0)])
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    tmp.replace(path)
+
+
+def load_indexes(path: Path, indexes: Dict[str, DedupIndex], data: Dict[str, List[dict]]):
+    """
+    Cargar los índices guardados con ``save_indexes``.
+
+    Si falta el archivo o no corresponde al número de registros del estado
+    (por ejemplo, un estado anterior a la deduplicación), se reconstruye.
+    """
+    guardado = {}
+    if path.exists():
+        try:
+            with np.load(path) as npz:
+                guardado = {k: npz[k] for k in npz.files}
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Índice de duplicados ilegible ({e}), se reconstruye")
+    for entorno, indice in indexes.items():
+        registros = data.get(entorno, [])
+        indice.clear()
+        if f"{entorno}_keys" in guardado and int(guardado[f"{entorno}_records"][0]) == len(registros):
+            indice.load_arrays(guardado[f"{entorno}_keys"], guardado[f"{entorno}_counts"])
+        else:
+            indice.rebuild(registros)
@@ -0,0 +1,230 @@
+"""
+Listados paginados y filtrados de movimientos de cuenta y de tarjeta.
+
+Los registros del entorno se convierten una vez a columnas de numpy
+ordenadas por fecha (``fecha`` en cuenta, ``fecha_hora`` en tarjetas) y la
+vista se reutiliza mientras no cambien los datos. Con esa vista:
+
+- ``from``/``to`` se resuelven con búsqueda binaria (``searchsorted``) y
+  dejan un tramo contiguo de filas.
+- importes (en céntimos), archivo de origen y texto son máscaras
+  vectorizadas sobre ese tramo. El texto y el archivo se guardan como
+  categorías y el texto se busca una vez por valor distinto, no fila a fila.
+- solo las filas de la página pedida se convierten a dicts.
+
+Los movimientos de cuenta son los de los extractos que no son CSV (Excel,
+PDF, OFX...); los de tarjeta, los de los ``.csv``.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from common.columns import canonical_name
+from common.dates import parse_dates
+from common.money import CENTS_PER_EURO, cents_to_euros
+
+try:
+    from app.records import stored_cents
+except ImportError:  # Ejecución directa: python app/main.py
+    from records import stored_cents
+
+MAX_PAGE_SIZE = 2000
+
+ACCOUNT = "account"
+CARDS = "cards"
+
+# Campos devueltos, columna de orden, importes y columnas de texto de cada listado
+LISTINGS = {
+    ACCOUNT: {
+        "fields": ["fecha", "f_valor", "concepto", "importe", "saldo", "source_file"],
+        "date": "fecha",
+        "amounts": ["importe", "saldo"],
+        "text": ["concepto"],
+        "date_format": "%Y-%m-%d",
+    },
+    CARDS: {
+        "fields": ["operacion", "fecha_hora", "tipo", "importe", "comision", "establecimiento", "source_file"],
+        "date": "fecha_hora",
+        "amounts": ["importe", "comision"],
+        "text": ["establecimiento", "tipo"],
+        "date_format": "%Y-%m-%d %H:%M:%S",
+    },
+}
+
+NAT = np.iinfo(np.int64).min
+
+
+@dataclass
+class Filters:
+    """Filtros de un listado; ``None`` es sin filtro"""
+    date_from: Optional[pd.Timestamp] = None
+    date_to: Optional[pd.Timestamp] = None
+    # ``to`` sin hora incluye todo ese día
+    date_to_inclusive_day: bool = False
+    min_importe: Optional[float] = None
+    max_importe: Optional[float] = None
+    source_file: Optional[str] = None
+    text: Optional[str] = None
+
+
+def is_card_file(filename: Any) -> bool:
+    return str(filename).lower().endswith(".csv")
+
+
+class ListingView:
+    """Movimientos de un tipo ordenados por fecha, en columnas"""
+
+    def __init__(self, kind: str, records: List[dict], sort: bool = True):
+        config = LISTINGS[kind]
+        self.kind = kind
+        self.config = config
+        df = pd.DataFrame.from_records(records) if records else pd.DataFrame()
+        if len(df.columns):
+            df.columns = [canonical_name(col) for col in df.columns]
+            df = df.loc[:, ~df.columns.duplicated()]
+        for campo in config["fields"]:
+            if campo not in df.columns:
+                df[campo] = None
+
+        fechas = parse_dates(df[config["date"]]) if len(df) else pd.Series([], dtype="datetime64[ns]")
+        valores = fechas.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        orden = np.argsort(valores, kind="stable") if sort else np.arange(len(valores))
+        # Las filas sin fecha (NaT, el mínimo de int64) van al final
+        valores = valores[orden]
+        sin_fecha = valores == NAT
+        if sort:
+            orden = np.concatenate([orden[~sin_fecha], orden[sin_fecha]])
+        self.dates = valores[~sin_fecha]
+
+        df = df.iloc[orden].reset_index(drop=True)
+        df[config["date"]] = fechas.iloc[orden].reset_index(drop=True)
+        for campo in ("fecha", "f_valor", "fecha_hora"):
+            if campo in config["fields"] and campo != config["date"]:
+                df[campo] = parse_dates(df[campo]) if len(df) else df[campo]
+        for campo in config["amounts"]:
+            df[campo] = stored_cents(df[campo]) if len(df) else df[campo]
+        # Texto y archivo de origen como categorías: un código por fila y cada valor una vez
+        for campo in config["text"] + ["source_file"]:
+            df[campo] = df[campo].astype("category")
+        self.frame = df[config["fields"]]
+        # Céntimos; las filas sin importe no pasan ningún filtro de importe
+        self.importes = df["importe"].to_numpy(dtype=np.int64, na_value=0)
+        self.con_importe = df["importe"].notna().to_numpy(dtype=bool)
+        self.source_codes = df["source_file"].cat.codes.to_numpy()
+        self.sources = df["source_file"].cat.categories
+        # Texto en mayúsculas por valor distinto, para buscar sin recorrer las filas.
+        # Los valores ausentes (código -1) toman el último elemento, vacío
+        self.texts = []
+        for campo in config["text"]:
+            categorias = list(df[campo].cat.categories.astype(str)) + [""]
+            self.texts.append((df[campo].cat.codes.to_numpy(), pd.Series(categorias, dtype=object).str.upper()))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def date_range(self, filters: Filters) -> tuple:
+        """Tramo ``[inicio, fin)`` de filas dentro de las fechas pedidas"""
+        if filters.date_from is None and filters.date_to is None:
+            return 0, len(self.frame)
+        inicio, fin = 0, len(self.dates)
+        if filters.date_from is not None:
+            inicio = int(np.searchsorted(self.dates, filters.date_from.value, side="left"))
+        if filters.date_to is not None:
+            if filters.date_to_inclusive_day:
+                fin = int(np.searchsorted(self.dates, (filters.date_to + pd.Timedelta(days=1)).value, side="left"))
+            else:
+                fin = int(np.searchsorted(self.dates, filters.date_to.value, side="right"))
+        return inicio, max(inicio, fin)
+
+    def select(self, filters: Filters) -> np.ndarray:
+        """Posiciones de las filas que cumplen los filtros, en orden de fecha"""
+        inicio, fin = self.date_range(filters)
+        mascara = None
+
+        def combinar(condicion):
+            nonlocal mascara
+            mascara = condicion if mascara is None else mascara & condicion
+
+        if filters.min_importe is not None or filters.max_importe is not None:
+            combinar(self.con_importe[inicio:fin])
+        # Los límites llegan en euros; redondeados para que 0.29 * 100 no quede en 28.999...
+        if filters.min_importe is not None:
+            combinar(self.importes[inicio:fin] >= round(filters.min_importe * CENTS_PER_EURO, 6))
+        if filters.max_importe is not None:
+            combinar(self.importes[inicio:fin] <= round(filters.max_importe * CENTS_PER_EURO, 6))
+        if filters.source_file is not None:
+            codigo = self.sources.get_indexer([filters.source_file])[0]
+            combinar(self.source_codes[inicio:fin] == codigo if codigo >= 0 else np.zeros(fin - inicio, dtype=bool))
+        if filters.text:
+            buscado = filters.text.upper()
+            encontrado = np.zeros(fin - inicio, dtype=bool)
+            for codes, uniques in self.texts:
+                coincide = uniques.str.contains(buscado, regex=False).to_numpy(dtype=bool)
+                encontrado |= coincide[codes[inicio:fin]]
+            combinar(encontrado)
+
+        if mascara is None:
+            return np.arange(inicio, fin)
+        return inicio + np.flatnonzero(mascara)
+
+    def page(self, positions: np.ndarray) -> List[Dict[str, Any]]:
+        """Registros de las posiciones dadas con fechas en texto y ``None`` en lo que falta"""
+        pagina = self.frame.iloc[positions].copy()
+        for campo in self.config["amounts"]:
+            pagina[campo] = cents_to_euros(pagina[campo])
+        formato = self.config["date_format"]
+        for campo in ("fecha", "f_valor", "fecha_hora"):
+            if campo in pagina.columns and pd.api.types.is_datetime64_any_dtype(pagina[campo]):
+                pagina[campo] = pagina[campo].dt.strftime(formato)
+        if "operacion" in pagina.columns:
+            pagina["operacion"] = pagina["operacion"].map(lambda v: None if pd.isna(v) else str(v))
+        pagina = pagina.astype(object).where(pagina.notna(), None)
+        return pagina.to_dict("records")
+
+
+def format_records(records: List[dict]) -> List[Dict[str, Any]]:
+    """
+    Registros sueltos con los campos del listado que les corresponde.
+
+    Se conserva el orden recibido; cada registro lleva ``kind`` (``account``
+    o ``cards``).
+    """
+    resultado: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    for kind in (ACCOUNT, CARDS):
+        posiciones = [i for i, r in enumerate(records)
+                      if is_card_file(r.get("source_file", "")) == (kind == CARDS)]
+        if not posiciones:
+            continue
+        vista = ListingView(kind, [records[i] for i in posiciones], sort=False)
+        for i, registro in zip(posiciones, vista.page(np.arange(len(vista)))):
+            resultado[i] = {"kind": kind, **registro}
+    return resultado
+
+
+class ListingCache:
+    """
+    Vistas por entorno y tipo, reconstruidas cuando cambian los registros.
+
+    Los datos de un entorno solo cambian añadiendo registros a la lista o
+    sustituyéndola por otra, así que basta comparar la lista y su longitud.
+    """
+
+    def __init__(self):
+        self.views: Dict[tuple, tuple] = {}
+
+    def clear(self):
+        self.views = {}
+
+    def get(self, environment: str, kind: str, records: List[dict]) -> ListingView:
+        clave = (environment, kind)
+        cacheada = self.views.get(clave)
+        if cacheada is not None and cacheada[0] is records and cacheada[1] == len(records):
+            return cacheada[2]
+        tarjetas = kind == CARDS
+        seleccion = [r for r in records if is_card_file(r.get("source_file", "")) == tarjetas]
+        vista = ListingView(kind, seleccion)
+        self.views[clave] = (records, len(records), vista)
+        return vista
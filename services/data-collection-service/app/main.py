@@ -3,7 +3,7 @@ Microservicio de Recopilación de Datos - Análisis de Gastos
 Puerto: 8002
 """
 
-from fastapi import FastAPI, HTTPException, status, Header, Request
+from fastapi import FastAPI, HTTPException, status, Header, Request, BackgroundTasks, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
@@ -12,13 +12,38 @@ from datetime import datetime, timezone
 from typing import List, Optional, Dict, Any
 import time
 import json
+import logging
+import tracemalloc
 import os
 import glob
 import pandas as pd
 from pathlib import Path
+import sys
 import jwt
 import requests
 
+# Código compartido entre microservicios (services/common)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from common.health import HealthProbes, http_probe, filesystem_probe
+from common.metrics import REGISTRY, setup_metrics
+from common.excel_reader import ExcelCache
+from common import loader
+# Reexportados: el parseo de archivos se comparte con data-extraction-service
+from common.loader import detect_date_column, parse_date_column, elapsed_ms
+
+try:
+    from app.dedup import DedupIndex, load_indexes, save_indexes
+    from app.interning import decode_records, encode_records, intern_frame, intern_records
+    from app.listings import ACCOUNT, CARDS, MAX_PAGE_SIZE, Filters, ListingCache, format_records
+    from app.records import amounts_to_cents, records_to_cents
+    from app.search import SearchIndex, normalize as normalize_query
+except ImportError:  # Ejecución directa: python app/main.py
+    from dedup import DedupIndex, load_indexes, save_indexes
+    from interning import decode_records, encode_records, intern_frame, intern_records
+    from listings import ACCOUNT, CARDS, MAX_PAGE_SIZE, Filters, ListingCache, format_records
+    from records import amounts_to_cents, records_to_cents
+    from search import SearchIndex, normalize as normalize_query
+
 app = FastAPI(
     title="Data Collection Service - Análisis de Gastos",
     description="Microservicio de recopilación y almacenamiento de datos",
@@ -34,6 +59,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas Prometheus en /metrics
+setup_metrics(app, service="data-collection")
+
 # Variables globales
 START_TIME = time.time()
 ESTADO = {
@@ -63,13 +91,59 @@ ESTADO = {
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 STATE_FILE = PROJECT_ROOT / "data" / "estado-ms-data-collection-service.json"
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8001")
+DATA_MANIPULATION_SERVICE_URL = os.getenv("DATA_MANIPULATION_SERVICE_URL", "http://localhost:8003")
+
+# Métricas de carga (las de parseo están en common/loader.py)
+ROWS_INGESTED = REGISTRY.counter(
+    "rows_ingested_total", "Registros cargados por entorno", ["environment"]
+)
+STATE_SNAPSHOT_BYTES = REGISTRY.gauge(
+    "state_snapshot_bytes", "Tamaño del último archivo de estado guardado en disco"
+)
+DUPLICATES_REMOVED = REGISTRY.counter(
+    "duplicate_rows_total", "Movimientos repetidos descartados al cargar", ["environment"]
+)
+
+# Claves de los movimientos cargados por entorno (ver dedup.py)
+DEDUP = {"pre": DedupIndex(), "pro": DedupIndex()}
+
+# Lotes recibidos de cada subida o trabajo hasta que llega su último lote (ver ingest_file_batch)
+STAGING: Dict[str, Dict[str, List[dict]]] = {"pre": {}, "pro": {}}
+
+# Vistas ordenadas por fecha para los listados de cuenta y tarjetas (ver listings.py)
+LISTINGS = ListingCache()
+
+# Índice de trigramas de las descripciones por entorno (ver search.py)
+SEARCH = {"pre": SearchIndex(), "pro": SearchIndex()}
+
+# Libros Excel ya convertidos, indexados por hash del contenido
+EXCEL_CACHE = ExcelCache(Path(os.getenv("EXCEL_CACHE_DIR", PROJECT_ROOT / "data" / "cache" / "excel")))
+
+# Log estructurado (una línea JSON por carga) con el desglose de tiempos
+INGEST_LOGGER = logging.getLogger("data-collection.ingest")
+if not INGEST_LOGGER.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    INGEST_LOGGER.addHandler(_handler)
+    INGEST_LOGGER.setLevel(logging.INFO)
+    INGEST_LOGGER.propagate = False
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 
+# Verificación de dependencias en segundo plano
+HEALTH_PROBES = HealthProbes(
+    {
+        "database": filesystem_probe(STATE_FILE.parent, writable=True),
+        "auth_service": http_probe(f"{AUTH_SERVICE_URL}/api/v1/health")
+    },
+    critical=["database"]
+)
+
 
 # Modelos Pydantic
 class LoadRequest(BaseModel):
     clear_existing: bool = Field(False, description="Limpiar datos existentes antes de cargar")
+    profile: bool = Field(False, description="Incluir tiempos por etapa y pico de memoria en la respuesta")
 
 
 class FileInfo(BaseModel):
@@ -79,6 +153,17 @@ class FileInfo(BaseModel):
     fecha_inicio: Optional[str] = None
     fecha_fin: Optional[str] = None
     size_bytes: int
+    decimal: Optional[str] = Field(None, description="Separador decimal de los importes en texto (CSV)")
+
+
+class IngestRequest(BaseModel):
+    file: FileInfo
+    records: List[Dict[str, Any]] = Field(default_factory=list, description="Registros del lote")
+    upload_id: Optional[str] = Field(
+        None, description="Subida o trabajo al que pertenece el lote (por defecto, el nombre del archivo)"
+    )
+    first: bool = Field(True, description="Primer lote: descarta los lotes acumulados del archivo")
+    last: bool = Field(True, description="Último lote: sustituye los registros del archivo, guarda estado y publica")
 
 
 class LoadResponse(BaseModel):
@@ -88,12 +173,35 @@ class LoadResponse(BaseModel):
 
 
 # Funciones auxiliares
+def index_rows(environment: str, df: pd.DataFrame, start: int):
+    """
+    Añadir al índice de búsqueda las filas recién agregadas en ``start...``.
+    
+    Si el índice no está al día (estado recargado, archivo reescrito) no se
+    toca: se reconstruye entero en la siguiente búsqueda.
+    """
+    indice = SEARCH[environment]
+    if indice.records is ESTADO["data"][environment] and indice.size == start:
+        indice.add(df, start)
+
+
+def dedup_file() -> Path:
+    """Índice de duplicados, junto al archivo de estado"""
+    return STATE_FILE.with_name(STATE_FILE.stem + "-dedup.npz")
+
+
 def save_state():
-    """Guardar estado en archivo JSON"""
+    """Guardar estado en archivo JSON, con las columnas de texto codificadas por diccionario"""
     try:
         STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        datos, diccionarios = {}, {}
+        for entorno, registros in ESTADO["data"].items():
+            datos[entorno], diccionarios[entorno] = encode_records(registros)
         with open(STATE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(ESTADO, f, indent=2, ensure_ascii=False, default=str)
+            json.dump({**ESTADO, "data": datos, "dictionaries": diccionarios, "amounts": "cents"},
+                      f, indent=2, ensure_ascii=False, default=str)
+        STATE_SNAPSHOT_BYTES.set(STATE_FILE.stat().st_size)
+        save_indexes(dedup_file(), DEDUP, {env: len(datos) for env, datos in ESTADO["data"].items()})
         print(f"✅ Estado guardado en {STATE_FILE}")
     except Exception as e:
         print(f"❌ Error al guardar estado: {e}")
@@ -106,9 +214,21 @@ def load_state():
         if STATE_FILE.exists():
             with open(STATE_FILE, 'r', encoding='utf-8') as f:
                 ESTADO = json.load(f)
+            # Los estados anteriores a la codificación no traen diccionarios,
+            # y los anteriores a los céntimos guardaban los importes en euros
+            diccionarios = ESTADO.pop("dictionaries", {})
+            en_euros = ESTADO.pop("amounts", None) != "cents"
+            for entorno, registros in ESTADO["data"].items():
+                if entorno in diccionarios:
+                    decode_records(registros, diccionarios[entorno])
+                else:
+                    intern_records(registros)
+                if en_euros:
+                    records_to_cents(registros)
             print(f"✅ Estado cargado desde {STATE_FILE}")
         else:
             print(f"ℹ️  No se encontró archivo de estado, usando estado inicial")
+        load_indexes(dedup_file(), DEDUP, ESTADO["data"])
     except Exception as e:
         print(f"⚠️  Error al cargar estado: {e}, usando estado inicial")
 
@@ -163,85 +283,26 @@ def verify_token(authorization: str) -> dict:
         )
 
 
-def detect_date_column(df: pd.DataFrame) -> Optional[str]:
-    """Detectar automáticamente la columna de fecha"""
-    date_keywords = ['fecha', 'date', 'Fecha', 'Date', 'FECHA', 'DATE', 'Fecha y hora', 'fecha_hora']
-    
-    # Buscar coincidencia exacta
-    for keyword in date_keywords:
-        if keyword in df.columns:
-            return keyword
-    
-    # Buscar coincidencia parcial (contiene la palabra)
-    for col in df.columns:
-        col_lower = col.lower()
-        if 'fecha' in col_lower or 'date' in col_lower:
-            return col
+def load_file(filepath: Path, timings: Optional[dict] = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Cargar un archivo CSV o Excel usando la caché de Excel del servicio.
     
-    return None
-
-
-def parse_date_column(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
-    """Parsear columna de fecha a datetime"""
-    try:
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce', dayfirst=True)
-        return df
-    except Exception:
-        return df
+    Si se pasa ``timings``, se rellena con los milisegundos de cada etapa
+    (``sniff``, ``read``, ``parse_dates``). Ver common/loader.py.
+    """
+    return loader.load_file(filepath, timings, EXCEL_CACHE)
 
 
-def load_file(filepath: Path) -> tuple[pd.DataFrame, dict]:
-    """Cargar un archivo CSV o Excel"""
-    file_extension = filepath.suffix.lower()
-    file_size = filepath.stat().st_size
+def load_data_from_environment(environment: str, clear_existing: bool = False, profile: bool = False) -> dict:
+    """
+    Cargar datos desde una carpeta (pre o pro).
     
-    try:
-        # Leer archivo según extensión
-        if file_extension == '.csv':
-            # Intentar detectar el delimitador automáticamente
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                first_line = f.readline()
-                delimiter = ';' if ';' in first_line else ','
-            df = pd.read_csv(filepath, delimiter=delimiter, encoding='utf-8', encoding_errors='ignore')
-            file_format = 'csv'
-        elif file_extension in ['.xls', '.xlsx']:
-            df = pd.read_excel(filepath)
-            file_format = 'xlsx' if file_extension == '.xlsx' else 'xls'
-        else:
-            raise ValueError(f"Formato no soportado: {file_extension}")
-        
-        # Detectar columna de fecha
-        date_col = detect_date_column(df)
-        fecha_inicio = None
-        fecha_fin = None
-        
-        if date_col:
-            df = parse_date_column(df, date_col)
-            # Filtrar valores no nulos
-            valid_dates = df[date_col].dropna()
-            if len(valid_dates) > 0:
-                fecha_inicio = valid_dates.min().strftime('%Y-%m-%d')
-                fecha_fin = valid_dates.max().strftime('%Y-%m-%d')
-        
-        # Metadata del archivo
-        file_info = {
-            "filename": filepath.name,
-            "format": file_format,
-            "records": len(df),
-            "fecha_inicio": fecha_inicio,
-            "fecha_fin": fecha_fin,
-            "size_bytes": file_size
-        }
-        
-        return df, file_info
-        
-    except Exception as e:
-        raise ValueError(f"Error al leer {filepath.name}: {str(e)}")
-
-
-def load_data_from_environment(environment: str, clear_existing: bool = False) -> dict:
-    """Cargar datos desde una carpeta (pre o pro)"""
+    Los tiempos por archivo y etapa se escriben siempre en el log
+    estructurado; con ``profile`` se mide además el pico de memoria
+    (tracemalloc, con coste apreciable) y se devuelven bajo ``profile``.
+    """
     global ESTADO
+    load_start = time.perf_counter()
     
     # Determinar carpeta
     folder_path = PROJECT_ROOT / f"datos-{environment}"
@@ -274,6 +335,8 @@ def load_data_from_environment(environment: str, clear_existing: bool = False) -
     # Limpiar datos existentes si se solicita
     if clear_existing:
         ESTADO["data"][environment] = []
+        DEDUP[environment].clear()
+        SEARCH[environment].reset(ESTADO["data"][environment])
         ESTADO["environments"][environment] = {
             "loaded": False,
             "loaded_at": None,
@@ -285,23 +348,56 @@ def load_data_from_environment(environment: str, clear_existing: bool = False) -
     # Cargar cada archivo
     loaded_files = []
     total_records = 0
+    total_duplicates = 0
     errors = {}
+    file_timings = []
+    trace_memory = profile and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
     
     for filepath in files_pattern:
+        timings = {}
+        file_start = time.perf_counter()
         try:
-            df, file_info = load_file(filepath)
+            df, file_info = load_file(filepath, timings)
+            stage = time.perf_counter()
+            df = amounts_to_cents(df, file_info["decimal"])
+            timings["amounts"] = elapsed_ms(stage)
+            
+            # Descartar los movimientos que ya trajo otro archivo (exportaciones solapadas)
+            stage = time.perf_counter()
+            nuevas = DEDUP[environment].add(df)
+            duplicados = int(len(df) - nuevas.sum())
+            if duplicados:
+                df = df[nuevas]
+                DUPLICATES_REMOVED.inc(duplicados, environment=environment)
+            file_info["duplicates"] = duplicados
+            timings["dedup"] = elapsed_ms(stage)
             loaded_files.append(file_info)
             total_records += len(df)
+            total_duplicates += duplicados
             
             # Agregar datos al estado (convertir a dict para serialización)
-            data_records = df.to_dict('records')
+            stage = time.perf_counter()
+            df["source_file"] = filepath.name
+            data_records = intern_frame(df).to_dict('records')
+            inicio = len(ESTADO["data"][environment])
             ESTADO["data"][environment].extend(data_records)
+            timings["to_records"] = elapsed_ms(stage)
+            stage = time.perf_counter()
+            index_rows(environment, df, inicio)
+            timings["search_index"] = elapsed_ms(stage)
+            ROWS_INGESTED.inc(len(data_records), environment=environment)
             
         except Exception as e:
             errors[filepath.name] = [str(e)]
+        timings["total"] = elapsed_ms(file_start)
+        file_timings.append({"filename": filepath.name, "stages_ms": timings})
     
     # Si hubo errores en todos los archivos
     if errors and not loaded_files:
+        if trace_memory:
+            tracemalloc.stop()
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail={
@@ -326,15 +422,233 @@ def load_data_from_environment(environment: str, clear_existing: bool = False) -
     }
     
     # Guardar estado en disco
+    stage = time.perf_counter()
     save_state()
     
-    return {
+    perfil = {
+        "files": file_timings,
+        "save_state_ms": elapsed_ms(stage),
+        "total_ms": elapsed_ms(load_start)
+    }
+    if trace_memory:
+        perfil["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    INGEST_LOGGER.info(json.dumps({
+        "event": "data_load",
+        "environment": environment,
+        "total_files": len(loaded_files),
+        "total_records": total_records,
+        "duplicates_removed": total_duplicates,
+        **perfil
+    }))
+    
+    data = {
         "environment": environment,
         "total_files": len(loaded_files),
         "total_records": total_records,
+        "duplicates_removed": total_duplicates,
         "files": loaded_files,
         "loaded_at": ESTADO["environments"][environment]["loaded_at"]
     }
+    if profile:
+        data["profile"] = perfil
+    return data
+
+
+def ingest_file_batch(environment: str, request: IngestRequest) -> dict:
+    """
+    Incorporar un lote de registros ya parseados de un archivo.
+    
+    Los lotes de cada subida o trabajo (``upload_id``) se acumulan aparte,
+    de modo que dos envíos del mismo archivo no se mezclan; el primero
+    descarta lo que hubiera acumulado y el último los incorpora todos de
+    una vez: sustituye
+    los registros que hubiera del mismo archivo (exportación reescrita),
+    descarta los movimientos que ya trajo otro archivo, actualiza los
+    metadatos del entorno y guarda el estado. Un archivo que no llega a su
+    último lote (subida o trabajo fallido) no toca los datos cargados.
+    
+    Un lote que no es el primero y no tiene lotes acumulados (el servicio
+    se reinició a mitad de envío o los lotes se descartaron) se rechaza con
+    409: incorporarlo sustituiría el archivo por sus últimas filas.
+    
+    Devuelve si el archivo ya estaba cargado, los registros acumulados y,
+    con el último lote, los duplicados y los registros incorporados.
+    """
+    filename = request.file.filename
+    envio = request.upload_id or filename
+    acumulados = STAGING[environment]
+    if request.first:
+        acumulados[envio] = []
+    elif envio not in acumulados:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "success": False,
+                "message": f"No hay lotes anteriores de {filename} ({envio}); hay que reenviar el archivo completo",
+                "error_code": "MISSING_BATCHES"
+            }
+        )
+    acumulados[envio].extend(records_to_cents(request.records, request.file.decimal))
+    if not request.last:
+        return {"replaced": False, "staged": len(acumulados[envio]), "duplicates": 0, "added": 0}
+    
+    records = acumulados.pop(envio)
+    datos = ESTADO["data"][environment]
+    indice = DEDUP[environment]
+    restantes = [r for r in datos if r.get("source_file") != filename]
+    reemplazado = len(restantes) != len(datos)
+    if reemplazado:
+        # El índice de búsqueda queda desfasado y se reconstruye en la próxima búsqueda
+        ESTADO["data"][environment] = datos = restantes
+        indice.rebuild(datos)
+    
+    df = pd.DataFrame.from_records(records)
+    nuevas = indice.add(df)
+    duplicados = int(len(records) - nuevas.sum())
+    if duplicados:
+        records = [r for r, nueva in zip(records, nuevas) if nueva]
+        df = df[nuevas]
+        DUPLICATES_REMOVED.inc(duplicados, environment=environment)
+    for record in records:
+        record["source_file"] = filename
+    intern_records(records)
+    inicio = len(datos)
+    datos.extend(records)
+    index_rows(environment, df, inicio)
+    ROWS_INGESTED.inc(len(records), environment=environment)
+    
+    entorno = ESTADO["environments"][environment]
+    files = [f for f in entorno["files"] if f["filename"] != filename]
+    reemplazado = reemplazado or len(files) != len(entorno["files"])
+    files.append({**request.file.model_dump(), "duplicates": duplicados})
+    ESTADO["environments"][environment] = {
+        "loaded": True,
+        "loaded_at": datetime.now(timezone.utc).isoformat(),
+        "files": files,
+        "total_records": len(datos),
+        "total_files": len(files)
+    }
+    save_state()
+    return {"replaced": reemplazado, "staged": 0, "duplicates": duplicados, "added": len(records)}
+
+
+def listing_error(code: str, message: str, status_code: int = status.HTTP_400_BAD_REQUEST) -> HTTPException:
+    """Error de los listados con el formato de casos-de-uso 04 y 05"""
+    return HTTPException(
+        status_code=status_code,
+        detail={"success": False, "error": {"code": code, "message": message}}
+    )
+
+
+def parse_date_filter(value: Optional[str], name: str) -> tuple:
+    """Fecha ISO de un filtro; devuelve la fecha y si es un día completo (sin hora)"""
+    if value is None:
+        return None, False
+    try:
+        fecha = pd.Timestamp(datetime.fromisoformat(value.strip()))
+    except ValueError:
+        raise listing_error("INVALID_PARAMETER", f"Fecha no válida en '{name}': {value} (formato YYYY-MM-DD)")
+    if fecha.tzinfo is not None:
+        fecha = fecha.tz_convert(None)
+    return fecha, len(value.strip()) <= 10
+
+
+def check_listing_params(environment: Optional[str], page: Optional[int], page_size: Optional[int]) -> tuple:
+    """Validar entorno y tamaño de página; devuelve ``page`` y ``page_size`` con sus valores por defecto"""
+    if environment is None:
+        raise listing_error("MISSING_PARAMETER", "El parámetro 'environment' es requerido")
+    if environment not in ("pre", "pro"):
+        raise listing_error("INVALID_ENVIRONMENT", "El entorno debe ser 'pre' o 'pro'")
+    page = 1 if page is None else page
+    page_size = MAX_PAGE_SIZE if page_size is None else page_size
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise listing_error("INVALID_PAGE_SIZE", f"El tamaño de página debe estar entre 1 y {MAX_PAGE_SIZE}")
+    return page, page_size
+
+
+def paginate(positions, page: int, page_size: int) -> tuple:
+    """Metadatos de paginación y posiciones de la página pedida"""
+    total_records = len(positions)
+    total_pages = -(-total_records // page_size)
+    if page < 1 or page > max(total_pages, 1):
+        raise listing_error("INVALID_PAGE", f"La página solicitada no existe. Total de páginas: {total_pages}")
+    inicio = (page - 1) * page_size
+    pagination = {
+        "current_page": page,
+        "page_size": page_size,
+        "total_records": total_records,
+        "total_pages": total_pages,
+        "has_next": page < total_pages,
+        "has_previous": page > 1
+    }
+    return pagination, positions[inicio:inicio + page_size]
+
+
+def list_movements(kind: str, environment: Optional[str], page: Optional[int], page_size: Optional[int],
+                   params: Dict[str, Any]) -> tuple:
+    """
+    Página de movimientos de cuenta o de tarjeta que cumplen los filtros.
+
+    La vista ordenada del entorno se construye en la primera consulta tras
+    cada carga; las siguientes solo hacen búsqueda binaria por fecha y
+    máscaras sobre columnas. Devuelve los datos de la respuesta y el total
+    de movimientos de ese tipo en el entorno.
+    """
+    page, page_size = check_listing_params(environment, page, page_size)
+    desde, _ = parse_date_filter(params["from"], "from")
+    hasta, dia_completo = parse_date_filter(params["to"], "to")
+    filters = Filters(date_from=desde, date_to=hasta, date_to_inclusive_day=dia_completo,
+                      min_importe=params["min_importe"], max_importe=params["max_importe"],
+                      source_file=params["source_file"], text=params["text"])
+
+    vista = LISTINGS.get(environment, kind, ESTADO["data"].get(environment, []))
+    pagination, pagina = paginate(vista.select(filters), page, page_size)
+    data = {
+        "environment": environment,
+        "pagination": pagination,
+        "records": vista.page(pagina),
+        "retrieved_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    }
+    return data, len(vista)
+
+
+def listing_filters(
+    date_from: Optional[str] = Query(None, alias="from", description="Fecha inicial incluida (YYYY-MM-DD o ISO 8601)"),
+    date_to: Optional[str] = Query(None, alias="to", description="Fecha final incluida (YYYY-MM-DD o ISO 8601)"),
+    min_importe: Optional[float] = Query(None, description="Importe mínimo"),
+    max_importe: Optional[float] = Query(None, description="Importe máximo"),
+    source_file: Optional[str] = Query(None, description="Solo los registros de este archivo"),
+    text: Optional[str] = Query(None, description="Texto contenido en el concepto o establecimiento (sin distinguir mayúsculas)")
+) -> Dict[str, Any]:
+    """Filtros comunes de los listados (se validan tras comprobar el token)"""
+    return {"from": date_from, "to": date_to, "min_importe": min_importe,
+            "max_importe": max_importe, "source_file": source_file, "text": text}
+
+
+def publish_to_analysis(environment: str, records: List[dict], reset: bool, authorization: str):
+    """Enviar los movimientos recién cargados al servicio de manipulación"""
+    if not records and not reset:
+        return
+
+    # to_json convierte NaN en null y las fechas a ISO 8601
+    payload = {
+        "environment": environment,
+        "reset": reset,
+        "amount_unit": "cents",
+        "records": json.loads(pd.DataFrame.from_records(records).to_json(orient="records", date_format="iso"))
+    }
+
+    try:
+        response = requests.post(
+            f"{DATA_MANIPULATION_SERVICE_URL}/api/v1/analysis/ingest",
+            json=payload,
+            headers={"Authorization": authorization},
+            timeout=30
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"⚠️  No se pudieron enviar los movimientos al servicio de manipulación: {e}")
 
 
 # Eventos de inicio/cierre
@@ -342,6 +656,14 @@ def load_data_from_environment(environment: str, clear_existing: bool = False) -
 async def startup_event():
     """Cargar estado al iniciar el servicio"""
     load_state()
+    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    await HEALTH_PROBES.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detener las tareas en segundo plano"""
+    await HEALTH_PROBES.stop()
 
 
 # Manejadores de excepciones
@@ -396,26 +718,24 @@ async def health_check():
     - Estado general del servicio
     - Tiempo de actividad
     - Estado de dependencias (database, auth_service)
+    
+    Las dependencias se comprueban en segundo plano; aquí solo se devuelve
+    el último resultado.
     """
     uptime = int(time.time() - START_TIME)
+    estado, checks = HEALTH_PROBES.snapshot()
     
-    return {
-        "status": "healthy",
-        "service": "data-collection-service",
-        "version": "1.0.0",
-        "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-        "uptime": uptime,
-        "checks": {
-            "database": {
-                "status": "healthy",
-                "response_time_ms": 10
-            },
-            "auth_service": {
-                "status": "healthy",
-                "response_time_ms": 25
-            }
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if estado in ("healthy", "degraded") else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": estado,
+            "service": "data-collection-service",
+            "version": "1.0.0",
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "uptime": uptime,
+            "checks": checks
         }
-    }
+    )
 
 
 @app.post("/api/v1/data/load/pre",
@@ -428,20 +748,29 @@ async def health_check():
           },
           tags=["Data Loading"])
 async def load_data_pre(
+    background_tasks: BackgroundTasks,
     request_body: Optional[LoadRequest] = None,
     authorization: Optional[str] = Header(None)
 ):
     """
     Cargar datos desde el entorno PRE (desarrollo/testing).
     
-    Requiere autenticación mediante token JWT.
+    Requiere autenticación mediante token JWT. Los registros nuevos se
+    envían en segundo plano al servicio de manipulación de datos.
     """
     # Verificar token
     verify_token(authorization)
     
     # Cargar datos
     clear_existing = request_body.clear_existing if request_body else False
-    data = load_data_from_environment("pre", clear_existing)
+    profile = request_body.profile if request_body else False
+    inicio = 0 if clear_existing else len(ESTADO["data"]["pre"])
+    data = load_data_from_environment("pre", clear_existing, profile)
+    
+    # Los análisis incrementales se alimentan solo con los registros nuevos
+    background_tasks.add_task(
+        publish_to_analysis, "pre", ESTADO["data"]["pre"][inicio:], clear_existing, authorization
+    )
     
     return {
         "success": True,
@@ -460,20 +789,29 @@ async def load_data_pre(
           },
           tags=["Data Loading"])
 async def load_data_pro(
+    background_tasks: BackgroundTasks,
     request_body: Optional[LoadRequest] = None,
     authorization: Optional[str] = Header(None)
 ):
     """
     Cargar datos desde el entorno PRO (producción).
     
-    Requiere autenticación mediante token JWT.
+    Requiere autenticación mediante token JWT. Los registros nuevos se
+    envían en segundo plano al servicio de manipulación de datos.
     """
     # Verificar token
     verify_token(authorization)
     
     # Cargar datos
     clear_existing = request_body.clear_existing if request_body else False
-    data = load_data_from_environment("pro", clear_existing)
+    profile = request_body.profile if request_body else False
+    inicio = 0 if clear_existing else len(ESTADO["data"]["pro"])
+    data = load_data_from_environment("pro", clear_existing, profile)
+    
+    # Los análisis incrementales se alimentan solo con los registros nuevos
+    background_tasks.add_task(
+        publish_to_analysis, "pro", ESTADO["data"]["pro"][inicio:], clear_existing, authorization
+    )
     
     return {
         "success": True,
@@ -482,6 +820,220 @@ async def load_data_pro(
     }
 
 
+@app.post("/api/v1/data/ingest/{environment}",
+          response_model=LoadResponse,
+          responses={
+              200: {"description": "Lote incorporado"},
+              401: {"description": "No autenticado"},
+              404: {"description": "Entorno no válido"},
+              409: {"description": "Lote intermedio sin lotes anteriores acumulados"}
+          },
+          tags=["Data Loading"])
+async def ingest_batch(
+    environment: str,
+    request_body: IngestRequest,
+    background_tasks: BackgroundTasks,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Incorporar registros ya parseados de un archivo nuevo o modificado.
+    
+    Lo usa data-extraction-service al detectar archivos en datos-pre o
+    datos-pro, de modo que los datos están al día sin recargar la carpeta.
+    Requiere autenticación mediante token JWT.
+    """
+    verify_token(authorization)
+    
+    if environment not in ESTADO["data"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "success": False,
+                "message": f"Entorno no válido: {environment}",
+                "error_code": "INVALID_ENVIRONMENT"
+            }
+        )
+    
+    resultado = ingest_file_batch(environment, request_body)
+    
+    if request_body.last:
+        # Un archivo reescrito obliga a reconstruir los análisis del entorno
+        if resultado["replaced"]:
+            nuevos, reset = ESTADO["data"][environment], True
+        else:
+            datos = ESTADO["data"][environment]
+            nuevos, reset = datos[len(datos) - resultado["added"]:], False
+        background_tasks.add_task(publish_to_analysis, environment, nuevos, reset, authorization)
+    
+    return {
+        "success": True,
+        "message": f"Lote de {request_body.file.filename} incorporado en {environment.upper()}",
+        "data": {
+            "environment": environment,
+            "filename": request_body.file.filename,
+            "records": len(request_body.records),
+            "total_records": len(ESTADO["data"][environment]),
+            **resultado
+        }
+    }
+
+
+@app.delete("/api/v1/data/ingest/{environment}",
+            response_model=LoadResponse,
+            responses={
+                200: {"description": "Lotes descartados"},
+                401: {"description": "No autenticado"},
+                404: {"description": "Entorno no válido"}
+            },
+            tags=["Data Loading"])
+async def abort_ingest(
+    environment: str,
+    upload_id: str = Query(..., description="Subida o trabajo cuyos lotes se descartan "
+                                            "(el nombre del archivo si se enviaron sin upload_id)"),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Descartar los lotes acumulados de una subida que no llegará a su último lote.
+
+    Lo usa data-extraction-service cuando una subida o un trabajo de parseo
+    falla a medias. Los registros ya cargados del archivo no se tocan.
+    Requiere autenticación mediante token JWT.
+    """
+    verify_token(authorization)
+
+    if environment not in ESTADO["data"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "success": False,
+                "message": f"Entorno no válido: {environment}",
+                "error_code": "INVALID_ENVIRONMENT"
+            }
+        )
+
+    descartados = STAGING[environment].pop(upload_id, [])
+    return {
+        "success": True,
+        "message": f"Lotes de {upload_id} descartados en {environment.upper()}",
+        "data": {
+            "environment": environment,
+            "upload_id": upload_id,
+            "discarded": len(descartados)
+        }
+    }
+
+
+@app.get("/api/v1/data/search",
+         responses={
+             200: {"description": "Búsqueda realizada"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Búsqueda"])
+async def search_movements(
+    environment: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Texto a buscar dentro del concepto o establecimiento"),
+    page: Optional[int] = None,
+    page_size: Optional[int] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Movimientos de cuenta y tarjeta cuya descripción contiene ``q``.
+    
+    Sin distinguir mayúsculas ni acentos, ordenados por fecha y paginados
+    como los listados. Cada registro lleva ``kind`` (``account`` o
+    ``cards``) y los campos de su listado. Requiere autenticación mediante
+    token JWT.
+    """
+    verify_token(authorization)
+    page, page_size = check_listing_params(environment, page, page_size)
+    # Una consulta que se queda vacía al normalizar (``€``) coincidiría con todo
+    consulta = normalize_query(q or "")
+    if not consulta:
+        raise listing_error("MISSING_PARAMETER", "El parámetro 'q' es requerido y no puede quedar vacío sin acentos ni caracteres no ASCII")
+    
+    inicio = time.perf_counter()
+    datos = ESTADO["data"][environment]
+    indice = SEARCH[environment]
+    if not indice.in_sync(datos):
+        indice.rebuild(datos)
+    posiciones = indice.search(consulta)
+    pagination, pagina = paginate(posiciones, page, page_size)
+    records = format_records([datos[i] for i in pagina.tolist()])
+    return {
+        "success": True,
+        "message": f"{len(posiciones)} movimientos encontrados",
+        "data": {
+            "environment": environment,
+            "query": q,
+            "pagination": pagination,
+            "records": records,
+            "search_ms": elapsed_ms(inicio),
+            "retrieved_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        }
+    }
+
+
+@app.get("/api/v1/data/account",
+         responses={
+             200: {"description": "Datos obtenidos exitosamente"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Datos de Cuenta"])
+async def get_account_data(
+    environment: Optional[str] = None,
+    page: Optional[int] = None,
+    page_size: Optional[int] = None,
+    filters: Dict[str, Any] = Depends(listing_filters),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Movimientos de cuenta (extractos que no son CSV) ordenados por fecha.
+    
+    Admite los filtros ``from``, ``to``, ``min_importe``, ``max_importe``,
+    ``source_file`` y ``text`` (contenido en el concepto). Requiere
+    autenticación mediante token JWT.
+    """
+    verify_token(authorization)
+    data, total = list_movements(ACCOUNT, environment, page, page_size, filters)
+    return {
+        "success": True,
+        "message": "Datos de cuenta obtenidos exitosamente" if total else "No hay datos disponibles en el entorno especificado",
+        "data": data
+    }
+
+
+@app.get("/api/v1/data/cards",
+         responses={
+             200: {"description": "Datos obtenidos exitosamente"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Datos de Tarjetas"])
+async def get_card_data(
+    environment: Optional[str] = None,
+    page: Optional[int] = None,
+    page_size: Optional[int] = None,
+    filters: Dict[str, Any] = Depends(listing_filters),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Movimientos de tarjeta (archivos CSV) ordenados por fecha y hora.
+    
+    Admite los filtros ``from``, ``to``, ``min_importe``, ``max_importe``,
+    ``source_file`` y ``text`` (contenido en el establecimiento o el tipo).
+    Requiere autenticación mediante token JWT.
+    """
+    verify_token(authorization)
+    data, total = list_movements(CARDS, environment, page, page_size, filters)
+    return {
+        "success": True,
+        "message": "Datos de tarjetas obtenidos exitosamente" if total else "No hay datos disponibles en el entorno especificado",
+        "data": data
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
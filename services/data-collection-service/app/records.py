@@ -0,0 +1,63 @@
+"""
+Normalización de los registros guardados en ``ESTADO["data"]``.
+
+Los registros conservan los nombres de columna de cada banco (``Fecha``,
+``Fecha y hora``, ``Comisión``...) y, según por dónde llegaron, fechas como
+``Timestamp`` (carga de carpeta) o texto ISO 8601 (endpoint de ingesta o
+estado restaurado de disco). Estas funciones los llevan a columnas
+canónicas con tipos de numpy; los nombres, con ``common.columns``, y las
+fechas, con ``common.dates.parse_dates``.
+
+Los importes (``Importe``, ``Saldo``, ``Comisión``) se guardan en céntimos
+enteros (``int`` o ``None``) desde que entran en el almacén; ver
+``common/money.py``.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from common.columns import column_key
+from common.dates import parse_dates
+from common.money import parse_cents
+
+# Columnas de fecha y de descripción por orden de preferencia (nombres de column_key)
+DATE_COLUMNS = ["fecha", "fecha_y_hora", "fecha_hora", "fecha_operacion"]
+DESCRIPTION_COLUMNS = ["concepto", "descripcion", "establecimiento", "comercio"]
+AMOUNT_COLUMNS = {"importe", "saldo", "comision"}
+
+
+def amounts_to_cents(df: pd.DataFrame, decimal: Optional[str] = None) -> pd.DataFrame:
+    """
+    Pasar las columnas de importe (en euros) a céntimos con el formato del almacén.
+
+    ``decimal`` es el separador decimal detectado en el archivo, si se conoce.
+    """
+    for col in df.columns:
+        if column_key(col) in AMOUNT_COLUMNS:
+            centimos = parse_cents(df[col], decimal)
+            df[col] = centimos.astype(object).where(centimos.notna(), None).to_numpy()
+    return df
+
+
+def records_to_cents(records: List[dict], decimal: Optional[str] = None) -> List[dict]:
+    """``amounts_to_cents`` en el sitio para registros sueltos (lotes de ingesta, estados antiguos)"""
+    for clave in set().union(*records):
+        if column_key(clave) not in AMOUNT_COLUMNS:
+            continue
+        valores = parse_cents(pd.Series([r.get(clave) for r in records], dtype=object), decimal)
+        for record, valor in zip(records, valores.tolist()):
+            if clave in record:
+                record[clave] = None if valor is pd.NA else valor
+    return records
+
+
+def stored_cents(series: pd.Series) -> pd.Series:
+    """Columna de importe del almacén (céntimos) como ``Int64``"""
+    return pd.to_numeric(series, errors="coerce").round().astype("Int64")
+
+
+def date_values(series: pd.Series) -> np.ndarray:
+    """Fechas como enteros (ns); ``NaT`` es el mínimo de int64"""
+    return parse_dates(series).to_numpy(dtype="datetime64[ns]").astype(np.int64)
@@ -0,0 +1,156 @@
+"""
+Índice de trigramas para buscar texto dentro de las descripciones.
+
+Las descripciones (``concepto`` en cuenta, ``establecimiento`` en tarjetas)
+se repiten mucho, así que el índice trabaja con los textos distintos:
+
+- cada texto normalizado (mayúsculas, sin acentos, espacios colapsados)
+  recibe un identificador y sus trigramas apuntan a él.
+- las filas se guardan por tramos (uno por archivo o lote cargado) con el
+  identificador de texto y la fecha de cada fila, ordenadas por texto, de
+  modo que las filas de un texto son un rango contiguo (``searchsorted``).
+
+Una búsqueda intersecta las listas de los trigramas de la consulta, comprueba
+la subcadena solo en esos candidatos y reúne las filas de los textos que la
+contienen, ordenadas por fecha. Las consultas de menos de tres caracteres
+recorren los textos distintos, no las filas.
+
+El índice se actualiza al añadir cada archivo; si los registros del entorno
+se sustituyen (archivo reescrito, estado recargado) se reconstruye.
+"""
+
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from common.columns import coalesce
+
+try:
+    from app.records import DATE_COLUMNS, DESCRIPTION_COLUMNS, date_values
+except ImportError:  # Ejecución directa: python app/main.py
+    from records import DATE_COLUMNS, DESCRIPTION_COLUMNS, date_values
+
+# Las filas sin fecha se ordenan al final
+NO_DATE = np.iinfo(np.int64).max
+
+
+def normalize(text: str) -> str:
+    """Mayúsculas, sin acentos y con los espacios colapsados"""
+    texto = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").upper()
+    return " ".join(texto.split())
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class Segment:
+    """Filas ``[start, start + n)`` de los registros, ordenadas por texto"""
+
+    def __init__(self, start: int, text_ids: np.ndarray, dates: np.ndarray):
+        self.start = start
+        self.order = np.argsort(text_ids, kind="stable")
+        self.sorted_ids = text_ids[self.order]
+        self.dates = dates
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """Posiciones (relativas al tramo) de las filas con alguno de los textos ``ids``"""
+        inicio = np.searchsorted(self.sorted_ids, ids, side="left")
+        fin = np.searchsorted(self.sorted_ids, ids, side="right")
+        largo = fin - inicio
+        presentes = largo > 0
+        inicio, largo = inicio[presentes], largo[presentes]
+        if not len(largo):
+            return np.empty(0, dtype=np.int64)
+        # Concatenar los rangos [inicio, inicio + largo) sin bucle de Python
+        desplazamiento = np.repeat(inicio - np.concatenate(([0], np.cumsum(largo)[:-1])), largo)
+        return self.order[np.arange(largo.sum()) + desplazamiento]
+
+
+class SearchIndex:
+    """Índice de un entorno sobre la lista de registros ``records``"""
+
+    def __init__(self):
+        self.reset(None)
+
+    def reset(self, records: Optional[List[dict]]):
+        self.records = records
+        self.size = 0
+        self.texts: List[str] = []
+        self.text_ids: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.segments: List[Segment] = []
+
+    def in_sync(self, records: List[dict]) -> bool:
+        return self.records is records and self.size == len(records)
+
+    def rebuild(self, records: List[dict]):
+        self.reset(records)
+        if records:
+            self.add(pd.DataFrame.from_records(records), 0)
+
+    def _text_id(self, texto: str) -> int:
+        ident = self.text_ids.get(texto)
+        if ident is None:
+            ident = self.text_ids[texto] = len(self.texts)
+            self.texts.append(texto)
+            for trigrama in trigrams(texto):
+                self.postings[trigrama].append(ident)
+        return ident
+
+    def add(self, df: pd.DataFrame, start: int):
+        """Indexar las filas de ``df``, que ocupan las posiciones ``start...`` de los registros"""
+        if not len(df):
+            return
+        textos = coalesce(df, DESCRIPTION_COLUMNS)
+        if textos is None:
+            textos = pd.Series("", index=df.index)
+        codes, uniques = pd.factorize(textos.fillna("").astype(str), sort=False)
+        ids = np.array([self._text_id(normalize(u)) for u in uniques], dtype=np.int64)
+        text_ids = ids[codes] if len(ids) else np.zeros(len(df), dtype=np.int64)
+
+        fecha = coalesce(df, DATE_COLUMNS)
+        fechas = date_values(fecha.reset_index(drop=True)) if fecha is not None else np.full(len(df), NO_DATE)
+        fechas = np.where(fechas == np.iinfo(np.int64).min, NO_DATE, fechas)
+        self.segments.append(Segment(start, text_ids, fechas))
+        self.size = max(self.size, start + len(df))
+
+    def matching_texts(self, query: str) -> np.ndarray:
+        """Identificadores de los textos que contienen ``query`` (ya normalizada)"""
+        if len(query) < 3:
+            return np.array([i for i, t in enumerate(self.texts) if query in t], dtype=np.int64)
+        listas = []
+        for trigrama in trigrams(query):
+            lista = self.postings.get(trigrama)
+            if not lista:
+                return np.empty(0, dtype=np.int64)
+            listas.append(lista)
+        listas.sort(key=len)
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            candidatos.intersection_update(lista)
+            if not candidatos:
+                break
+        return np.array(sorted(i for i in candidatos if query in self.texts[i]), dtype=np.int64)
+
+    def search(self, query: str) -> np.ndarray:
+        """Posiciones de los registros cuya descripción contiene ``query``, por fecha"""
+        consulta = normalize(query)
+        if not consulta:
+            return np.empty(0, dtype=np.int64)
+        ids = self.matching_texts(consulta)
+        if not len(ids):
+            return np.empty(0, dtype=np.int64)
+        posiciones, fechas = [], []
+        for tramo in self.segments:
+            filas = tramo.rows(ids)
+            if len(filas):
+                posiciones.append(tramo.start + filas)
+                fechas.append(tramo.dates[filas])
+        if not posiciones:
+            return np.empty(0, dtype=np.int64)
+        posiciones, fechas = np.concatenate(posiciones), np.concatenate(fechas)
+        return posiciones[np.lexsort((posiciones, fechas))]
@@ -0,0 +1,270 @@
+"""
+Lectores de OFX, QIF y CAMT.053 (ISO 20022) a movimientos de cuenta.
+
+Producen el mismo esquema que los extractos de cuenta en Excel y PDF
+(``Fecha``, ``F. Valor``, ``Concepto``, ``Importe``, ``Saldo``) para que
+``load_file`` los trate igual que el resto de formatos.
+
+Los tres leen el archivo en streaming y solo acumulan los movimientos ya
+normalizados:
+
+- CAMT.053: ``iterparse`` procesando cada ``<Ntry>`` al cerrarse y
+  quitándolo del árbol, así que el XML nunca se carga entero. El saldo se
+  calcula desde el saldo de apertura (``OPBD``/``PRCD``) de cada
+  ``<Stmt>``.
+- OFX (1.x SGML y 2.x XML): tokenizador de etiquetas sobre bloques del
+  archivo. El saldo se reconstruye hacia atrás desde ``<LEDGERBAL>``,
+  que va después de la lista de movimientos.
+- QIF: línea a línea; el formato no trae saldo.
+"""
+
+import codecs
+import html
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.csv_reader import COMMA_DECIMAL, sniff_encoding
+
+try:
+    from app.pdf_statements import COLUMNS
+except ImportError:  # Ejecución directa: python app/main.py
+    from pdf_statements import COLUMNS
+
+CHUNK_SIZE = 1 << 20
+SNIFF_BYTES = 64 * 1024
+
+# Códigos de saldo CAMT que sirven de saldo inicial de un extracto
+OPENING_BALANCES = ("OPBD", "PRCD")
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+QIF_DATE = re.compile(r"^(\d{1,4})[/.\-'](\d{1,2})[/.\-'](\d{1,4})$")
+
+Movement = Tuple[str, str, str, float, Optional[float]]
+
+
+def parse_amount(text: str) -> float:
+    """Importe con punto o coma decimal (``-1,234.56`` o ``-1.234,56``)"""
+    texto = text.strip().replace(" ", "")
+    if COMMA_DECIMAL.match(texto):
+        return float(texto.replace(".", "").replace(",", "."))
+    return float(texto.replace(",", ""))
+
+
+def local_name(tag: str) -> str:
+    """Nombre de una etiqueta XML sin el espacio de nombres"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def child_text(elem: ET.Element, *path: str) -> Optional[str]:
+    """Texto del primer descendiente que sigue ``path`` (nombres locales)"""
+    actual = [elem]
+    for nombre in path:
+        actual = [hijo for padre in actual for hijo in padre if local_name(hijo.tag) == nombre]
+        if not actual:
+            return None
+    texto = actual[0].text
+    return texto.strip() if texto else None
+
+
+def camt_date(elem: ET.Element, name: str) -> Optional[str]:
+    """Fecha ISO de ``<BookgDt>``/``<ValDt>`` (``<Dt>`` o ``<DtTm>``)"""
+    valor = child_text(elem, name, "Dt") or child_text(elem, name, "DtTm")
+    return valor[:10] if valor else None
+
+
+def camt_concept(entry: ET.Element) -> str:
+    """Concepto de un apunte: texto de remesa, información adicional o contraparte"""
+    partes = []
+    for detalle in entry.iter():
+        if local_name(detalle.tag) == "Ustrd" and detalle.text:
+            partes.append(detalle.text.strip())
+    if not partes:
+        for ruta in (("AddtlNtryInf",), ("NtryDtls", "TxDtls", "AddtlTxInf"),
+                     ("NtryDtls", "TxDtls", "RltdPties", "Cdtr", "Nm"),
+                     ("NtryDtls", "TxDtls", "RltdPties", "Dbtr", "Nm")):
+            texto = child_text(entry, *ruta)
+            if texto:
+                partes.append(texto)
+                break
+    return " ".join(partes)
+
+
+def iter_camt053(path: Path) -> Iterator[Movement]:
+    """Movimientos de un CAMT.053, apunte a apunte"""
+    saldo = None
+    extracto = None
+    comprobado = False
+    for evento, elem in ET.iterparse(str(path), events=("start", "end")):
+        nombre = local_name(elem.tag)
+        if evento == "start":
+            if not comprobado:
+                if "camt.053" not in elem.tag:
+                    raise ValueError("No es un extracto CAMT.053")
+                comprobado = True
+            if nombre == "Stmt":
+                extracto = elem
+                saldo = None
+            continue
+
+        if nombre == "Bal" and extracto is not None:
+            if child_text(elem, "Tp", "CdOrPrtry", "Cd") in OPENING_BALANCES and saldo is None:
+                importe = parse_amount(child_text(elem, "Amt") or "0")
+                saldo = -importe if child_text(elem, "CdtDbtInd") == "DBIT" else importe
+            extracto.remove(elem)
+        elif nombre == "Ntry" and extracto is not None:
+            importe = parse_amount(child_text(elem, "Amt") or "0")
+            if child_text(elem, "CdtDbtInd") == "DBIT":
+                importe = -importe
+            if saldo is not None:
+                saldo = round(saldo + importe, 2)
+            fecha = camt_date(elem, "BookgDt") or camt_date(elem, "ValDt")
+            yield fecha, camt_date(elem, "ValDt") or fecha, camt_concept(elem), importe, saldo
+            # Liberar el apunte: el árbol solo conserva la cabecera del extracto
+            extracto.remove(elem)
+        elif nombre == "Stmt":
+            elem.clear()
+            extracto = None
+
+
+def detect_encoding(path: Path) -> str:
+    with open(path, "rb") as f:
+        muestra = f.read(SNIFF_BYTES)
+    return sniff_encoding(muestra)
+
+
+def iter_text_chunks(path: Path, encoding: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            bloque = f.read(CHUNK_SIZE)
+            if not bloque:
+                yield decoder.decode(b"", final=True)
+                return
+            yield decoder.decode(bloque)
+
+
+def ofx_date(value: str) -> Optional[str]:
+    """``YYYYMMDD[HHMMSS[.XXX]][zona]`` a fecha ISO"""
+    valor = value.strip()
+    if len(valor) < 8 or not valor[:8].isdigit():
+        return None
+    return f"{valor[:4]}-{valor[4:6]}-{valor[6:8]}"
+
+
+def iter_ofx_tags(path: Path) -> Iterator[Tuple[bool, str, str]]:
+    """Etiquetas ``(cierre, nombre, texto)`` de un OFX, por bloques"""
+    resto = ""
+    for bloque in iter_text_chunks(path, detect_encoding(path)):
+        texto = resto + bloque
+        # La última etiqueta puede estar cortada: se guarda para el siguiente bloque
+        corte = texto.rfind("<")
+        texto, resto = (texto[:corte], texto[corte:]) if corte >= 0 and bloque else (texto, "")
+        for m in OFX_TAG.finditer(texto):
+            yield m.group(1) == "/", m.group(2).upper(), html.unescape(m.group(3).strip())
+
+
+def iter_ofx(path: Path, balances: Optional[List[float]] = None) -> Iterator[Movement]:
+    """
+    Movimientos de un OFX (``<STMTTRN>``) sin saldo.
+
+    Los ``<LEDGERBAL><BALAMT>`` encontrados se añaden a ``balances``.
+    """
+    transaccion = None
+    en_saldo = False
+    for cierre, nombre, texto in iter_ofx_tags(path):
+        if nombre == "STMTTRN":
+            if cierre and transaccion is not None:
+                fecha = ofx_date(transaccion.get("DTPOSTED", ""))
+                valor = ofx_date(transaccion.get("DTUSER", "")) or fecha
+                concepto = " ".join(filter(None, (transaccion.get("NAME"), transaccion.get("MEMO"))))
+                yield fecha, valor, concepto, parse_amount(transaccion.get("TRNAMT", "0")), None
+                transaccion = None
+            elif not cierre:
+                transaccion = {}
+        elif transaccion is not None and not cierre and texto:
+            transaccion[nombre] = texto
+        elif nombre == "LEDGERBAL":
+            en_saldo = not cierre
+        elif en_saldo and nombre == "BALAMT" and texto and balances is not None:
+            balances.append(parse_amount(texto))
+
+
+def qif_date(value: str) -> Optional[str]:
+    """
+    Fecha QIF a ``DD/MM/YYYY``.
+
+    Se asume día primero (bancos españoles) salvo que el segundo campo no
+    pueda ser un mes; los años de dos cifras son del siglo XXI.
+    """
+    m = QIF_DATE.match(value.strip().replace(" ", ""))
+    if m is None:
+        return None
+    a, b, c = m.groups()
+    if len(a) == 4:
+        anio, mes, dia = a, b, c
+    else:
+        dia, mes, anio = (b, a, c) if int(b) > 12 else (a, b, c)
+    if len(anio) == 2:
+        anio = "20" + anio
+    return f"{int(dia):02d}/{int(mes):02d}/{anio}"
+
+
+def iter_qif(path: Path) -> Iterator[Movement]:
+    """Movimientos de un QIF (registros separados por ``^``)"""
+    registro = {}
+    with open(path, encoding=detect_encoding(path), errors="replace") as f:
+        for linea in f:
+            linea = linea.rstrip("\r\n")
+            if not linea or linea.startswith("!"):
+                continue
+            codigo, valor = linea[0], linea[1:].strip()
+            if codigo == "^":
+                if "T" in registro or "U" in registro:
+                    fecha = qif_date(registro.get("D", ""))
+                    concepto = " ".join(filter(None, (registro.get("P"), registro.get("M"))))
+                    importe = parse_amount(registro.get("T") or registro["U"])
+                    yield fecha, fecha, concepto, importe, None
+                registro = {}
+            elif codigo not in registro:
+                # Las divisiones (S, E, $) repiten códigos: vale el primero
+                registro[codigo] = valor
+
+
+def to_frame(movements) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(list(movements), columns=COLUMNS)
+    df["Saldo"] = df["Saldo"].astype(float)
+    return df
+
+
+def read_camt053(path: Path) -> pd.DataFrame:
+    return to_frame(iter_camt053(path))
+
+
+def read_ofx(path: Path) -> pd.DataFrame:
+    saldos = []
+    df = to_frame(iter_ofx(path, saldos))
+    if saldos and len(df):
+        saldo = saldos[-1]
+        # Saldo tras cada movimiento = saldo final - importes posteriores
+        importes = df["Importe"].to_numpy()
+        posteriores = importes[::-1].cumsum()[::-1] - importes
+        df["Saldo"] = np.round(saldo - posteriores, 2)
+    return df
+
+
+def read_qif(path: Path) -> pd.DataFrame:
+    return to_frame(iter_qif(path))
+
+
+# Lectores por extensión para load_file
+READERS = {
+    ".ofx": read_ofx,
+    ".qfx": read_ofx,
+    ".qif": read_qif,
+    ".xml": read_camt053,
+    ".053": read_camt053,
+}
@@ -0,0 +1,174 @@
+"""
+Lectura de un CSV que llega por trozos (subidas) en lotes de DataFrames.
+
+La codificación, el delimitador, las comillas y el separador decimal se
+detectan con ``common.csv_reader.sniff`` sobre los primeros 64 KB del
+flujo. A partir de ahí el texto se corta en lotes de unos ``batch_bytes``
+caracteres, siempre al final de una fila (un salto de línea fuera de
+comillas), y cada lote se parsea con ``pd.read_csv`` con la cabecera
+delante. Las fechas se convierten igual que en ``load_file``.
+"""
+
+import codecs
+import io
+from typing import List, Optional
+
+import pandas as pd
+
+from common.csv_reader import SNIFF_BYTES, pandas_options, sniff
+from common.loader import detect_date_column, parse_date_column
+
+DEFAULT_BATCH_BYTES = 8 * 1024 * 1024
+
+
+class StreamDecoder:
+    """
+    Decodificador incremental que corrige una detección hecha a ciegas.
+
+    Si la muestra era todo ASCII se detecta UTF-8; si más adelante aparece
+    un byte que no lo es, y hasta entonces todo era ASCII, se sigue en
+    cp1252 (como haría la detección sobre el archivo completo). Si ya había
+    UTF-8 válido, lo inválido se sustituye por U+FFFD.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        estricto = encoding in ("utf-8", "utf-8-sig")
+        self.decoder = codecs.getincrementaldecoder(encoding)("strict" if estricto else "replace")
+        self.ascii = True
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        try:
+            texto = self.decoder.decode(data, final)
+        except UnicodeDecodeError:
+            # Con BOM la codificación es explícita: no se cambia a cp1252
+            self.encoding = "cp1252" if self.ascii and self.encoding == "utf-8" else "utf-8"
+            self.decoder = codecs.getincrementaldecoder(self.encoding)("replace")
+            texto = self.decoder.decode(data, final)
+        self.ascii = self.ascii and texto.isascii()
+        return texto
+
+
+class CsvBatcher:
+    """``feed(trozo)`` y ``close()`` devuelven los lotes (DataFrames) que completan"""
+
+    def __init__(self, batch_bytes: int = DEFAULT_BATCH_BYTES):
+        self.batch_bytes = batch_bytes
+        self.muestra: Optional[bytearray] = bytearray()
+        self.detectado: Optional[dict] = None
+        self.decoder: Optional[StreamDecoder] = None
+        self.header: Optional[str] = None
+        # Texto pendiente de parsear, en trozos para no concatenar en cada llegada
+        self.partes: List[str] = []
+        self.pendiente = 0
+        self.size_bytes = 0
+        self.records = 0
+        self.date_col: Optional[str] = None
+        self.fecha_inicio = None
+        self.fecha_fin = None
+
+    def feed(self, chunk: bytes) -> List[pd.DataFrame]:
+        self.size_bytes += len(chunk)
+        if self.detectado is None:
+            self.muestra += chunk
+            if len(self.muestra) < SNIFF_BYTES:
+                return []
+            return self._start(partial=True)
+        return self._push(self.decoder.decode(chunk))
+
+    def close(self) -> List[pd.DataFrame]:
+        lotes = []
+        if self.detectado is None:
+            if not self.muestra:
+                return []
+            lotes = self._start(partial=False)
+        lotes += self._push(self.decoder.decode(b"", final=True))
+        texto = self._take()
+        if self.header is None:
+            self.header, texto = texto, ""
+        if texto.strip():
+            lotes.append(self._frame(texto))
+        return lotes
+
+    def file_info(self, filename: str) -> dict:
+        """Metadatos con el formato de ``load_file``"""
+        return {
+            "filename": filename,
+            "format": "csv",
+            "records": self.records,
+            "fecha_inicio": self.fecha_inicio.strftime("%Y-%m-%d") if self.fecha_inicio is not None else None,
+            "fecha_fin": self.fecha_fin.strftime("%Y-%m-%d") if self.fecha_fin is not None else None,
+            "size_bytes": self.size_bytes,
+            "decimal": self.detectado["decimal"] if self.detectado else None
+        }
+
+    def _start(self, partial: bool) -> List[pd.DataFrame]:
+        muestra, self.muestra = bytes(self.muestra), None
+        self.detectado = sniff(muestra, partial=partial)
+        self.decoder = StreamDecoder(self.detectado["encoding"])
+        return self._push(self.decoder.decode(muestra))
+
+    def _take(self) -> str:
+        texto = "".join(self.partes)
+        self.partes, self.pendiente = [], 0
+        return texto
+
+    def _keep(self, texto: str):
+        if texto:
+            self.partes.append(texto)
+            self.pendiente += len(texto)
+
+    def _push(self, texto: str) -> List[pd.DataFrame]:
+        self._keep(texto)
+        if self.header is None:
+            texto = self._take()
+            fin = texto.find("\n")
+            if fin < 0:
+                self._keep(texto)
+                return []
+            self.header = texto[:fin + 1]
+            self._keep(texto[fin + 1:])
+        lotes = []
+        if self.pendiente < self.batch_bytes:
+            return lotes
+        texto = self._take()
+        inicio = 0
+        while len(texto) - inicio >= self.batch_bytes:
+            corte = self._row_boundary(texto, inicio, inicio + self.batch_bytes)
+            if corte <= inicio:
+                # Una fila (o un campo entre comillas) más larga que el lote
+                corte = self._row_boundary(texto, inicio, len(texto))
+                if corte <= inicio:
+                    break
+            lotes.append(self._frame(texto[inicio:corte]))
+            inicio = corte
+        self._keep(texto[inicio:])
+        return lotes
+
+    def _row_boundary(self, texto: str, inicio: int, fin: int) -> int:
+        """Posición tras el último salto de línea de ``texto[inicio:fin]`` que no está entre comillas"""
+        comilla = self.detectado["quotechar"]
+        pos = texto.rfind("\n", inicio, fin)
+        while pos >= 0 and texto.count(comilla, inicio, pos) % 2:
+            pos = texto.rfind("\n", inicio, pos)
+        return pos + 1
+
+    def _frame(self, texto: str) -> pd.DataFrame:
+        opciones = pandas_options(self.detectado)
+        df = pd.read_csv(
+            io.StringIO(self.header + texto),
+            delimiter=opciones["delimiter"],
+            quotechar=opciones["quotechar"],
+            decimal=opciones["decimal"]
+        )
+        if self.date_col is None:
+            self.date_col = detect_date_column(df) or ""
+        if self.date_col:
+            df = parse_date_column(df, self.date_col)
+            fechas = df[self.date_col].dropna()
+            if len(fechas) and pd.api.types.is_datetime64_any_dtype(fechas):
+                inicio, fin = fechas.min(), fechas.max()
+                self.fecha_inicio = inicio if self.fecha_inicio is None else min(self.fecha_inicio, inicio)
+                self.fecha_fin = fin if self.fecha_fin is None else max(self.fecha_fin, fin)
+        self.records += len(df)
+        return df
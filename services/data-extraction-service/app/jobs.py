@@ -0,0 +1,257 @@
+"""
+Cola de trabajos de parseo con prioridades y procesos aislados.
+
+Un lote grande de extractos históricos no debe retrasar el archivo diario:
+los trabajos se ordenan por entorno (PRO antes que PRE) y, dentro de cada
+entorno, por tamaño (los pequeños primero). Como mucho ``workers``
+trabajos se ejecutan a la vez, cada uno en su propio proceso con un
+límite de memoria (``RLIMIT_AS``): un archivo que no cabe falla solo, sin
+tumbar el servicio, y un trabajo en curso se puede cancelar terminando su
+proceso.
+
+Los procesos salen de un ``forkserver`` y no de ``fork`` del servicio:
+cuando se lanza un trabajo ya hay otros hilos vivos (las esperas de
+``asyncio.to_thread``, las sondas de salud, el vigilante) y un hijo que
+heredara uno de sus cerrojos tomado (logging, resolución DNS, conexiones
+HTTP) se quedaría bloqueado. ``target`` debe ser una función de nivel de
+módulo, que el hijo importa.
+
+Los trabajos terminados se conservan (los ``history`` más recientes) con
+sus tiempos de espera y de ejecución para el endpoint de estado.
+"""
+
+import asyncio
+import heapq
+import itertools
+import multiprocessing
+import resource
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Menor valor, más prioridad
+ENVIRONMENT_PRIORITY = {"pro": 0, "pre": 1}
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _elapsed_ms(start: Optional[float], end: Optional[float]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return round((end - start) * 1000, 3)
+
+
+class ParseJob:
+    """Parseo de un archivo de un entorno"""
+
+    def __init__(self, environment: str, path: Path):
+        self.id = uuid.uuid4().hex[:12]
+        self.environment = environment
+        self.path = Path(path)
+        try:
+            self.size_bytes = self.path.stat().st_size
+        except OSError:
+            self.size_bytes = 0
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.process = None
+
+    @property
+    def priority(self) -> tuple:
+        return ENVIRONMENT_PRIORITY.get(self.environment, len(ENVIRONMENT_PRIORITY)), self.size_bytes
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "environment": self.environment,
+            "filename": self.path.name,
+            "size_bytes": self.size_bytes,
+            "status": self.status,
+            "submitted_at": _isoformat(self.submitted_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+            "wait_ms": _elapsed_ms(self.submitted_at, self.started_at or self.finished_at),
+            "run_ms": _elapsed_ms(self.started_at, self.finished_at),
+            "result": self.result,
+            "error": self.error
+        }
+
+
+def _run_in_child(target: Callable, args: tuple, memory_limit_bytes: Optional[int], conn):
+    """Punto de entrada del proceso hijo: aplica el límite y ejecuta el trabajo"""
+    if memory_limit_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    try:
+        conn.send(("ok", target(*args)))
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+class JobQueue:
+    """
+    Cola con prioridad que ejecuta ``target(entorno, ruta, id)`` en procesos hijo.
+
+    ``on_finish(job)`` se llama en el bucle de eventos al terminar cada
+    trabajo (correcto, fallido o cancelado). ``on_failure(job)`` (una
+    corrutina) se espera antes cuando un trabajo que llegó a arrancar falla
+    o se cancela, para deshacer lo que su proceso hubiera enviado.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[str, Path, str], Any],
+        workers: int = 2,
+        memory_limit_bytes: Optional[int] = None,
+        history: int = 200,
+        on_finish: Optional[Callable[[ParseJob], None]] = None,
+        on_failure: Optional[Callable[[ParseJob], Awaitable[None]]] = None
+    ):
+        self.target = target
+        self.workers = max(1, workers)
+        self.memory_limit_bytes = memory_limit_bytes
+        self.on_finish = on_finish
+        self.on_failure = on_failure
+        self.jobs: Dict[str, ParseJob] = {}
+        self.finished: Deque[ParseJob] = deque(maxlen=history)
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._ready = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._context = multiprocessing.get_context("forkserver")
+
+    def submit(self, environment: str, path: Path) -> ParseJob:
+        """Encolar un archivo; si ya estaba en cola se devuelve ese trabajo"""
+        path = Path(path)
+        for job in self.queued():
+            if job.path == path:
+                return job
+        job = ParseJob(environment, path)
+        self.jobs[job.id] = job
+        heapq.heappush(self._heap, (job.priority, next(self._counter), job))
+        self._ready.set()
+        return job
+
+    def queued(self) -> List[ParseJob]:
+        """Trabajos en cola, en el orden en que se ejecutarán"""
+        return [job for _, _, job in sorted(self._heap) if job.status == QUEUED]
+
+    def running(self) -> List[ParseJob]:
+        return [job for job in self.jobs.values() if job.status == RUNNING]
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": [job.to_dict() for job in self.queued()],
+            "running": [job.to_dict() for job in self.running()],
+            "finished": [job.to_dict() for job in reversed(self.finished)]
+        }
+
+    def cancel(self, job_id: str) -> ParseJob:
+        """
+        Cancelar un trabajo en cola o en curso (terminando su proceso).
+
+        Lanza ``KeyError`` si no existe; un trabajo ya terminado se
+        devuelve sin cambios.
+        """
+        job = self.jobs[job_id]
+        if job.status == QUEUED:
+            # La entrada del montículo se descarta al sacarla
+            job.status = CANCELLED
+            self._finish(job)
+        elif job.status == RUNNING:
+            job.status = CANCELLED
+            if job.process is not None:
+                job.process.terminate()
+        return job
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for job in self.running():
+            if job.process is not None:
+                job.process.terminate()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _next(self) -> ParseJob:
+        while True:
+            while self._heap:
+                _, _, job = heapq.heappop(self._heap)
+                if job.status == QUEUED:
+                    return job
+            self._ready.clear()
+            await self._ready.wait()
+
+    async def _worker(self):
+        while True:
+            job = await self._next()
+            await self._run(job)
+
+    async def _run(self, job: ParseJob):
+        job.status = RUNNING
+        job.started_at = time.time()
+        receptor, emisor = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_run_in_child,
+            args=(self.target, (job.environment, job.path, job.id), self.memory_limit_bytes, emisor),
+            # No daemon: el trabajo puede abrir su propio pool (páginas de un PDF);
+            # stop() termina los que sigan en curso
+            daemon=False
+        )
+        job.process = process
+        try:
+            process.start()
+            emisor.close()
+            await asyncio.to_thread(process.join)
+            resultado = receptor.recv() if receptor.poll() else None
+        except (EOFError, OSError):
+            resultado = None
+        finally:
+            receptor.close()
+            job.process = None
+
+        if job.status != CANCELLED:
+            if resultado is not None and resultado[0] == "ok":
+                job.status = DONE
+                job.result = resultado[1]
+            else:
+                job.status = FAILED
+                job.error = resultado[1] if resultado else f"El proceso terminó con código {process.exitcode}"
+        if job.status != DONE and self.on_failure is not None:
+            try:
+                await self.on_failure(job)
+            except Exception as e:
+                print(f"⚠️  Error en on_failure del trabajo {job.id}: {e}")
+        self._finish(job)
+
+    def _finish(self, job: ParseJob):
+        job.finished_at = time.time()
+        if len(self.finished) == self.finished.maxlen:
+            self.jobs.pop(self.finished[0].id, None)
+        self.finished.append(job)
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception as e:
+                print(f"⚠️  Error en on_finish del trabajo {job.id}: {e}")
@@ -3,10 +3,45 @@ Microservicio de Extracción de Datos - Análisis de Gastos
 Puerto: 8004
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, status, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime, timezone
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import asyncio
+import json
 import time
+import os
+import functools
+import sys
+import uuid
+import jwt
+import pandas as pd
+import requests
+
+# Código compartido entre microservicios (services/common)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from common.health import HealthProbes, http_probe, filesystem_probe
+from common.metrics import REGISTRY, setup_metrics
+from common.excel_reader import ExcelCache
+from common.loader import load_file
+
+try:
+    from app.watcher import FileWatcher, WATCHED_EXTENSIONS, file_signature
+    from app.jobs import JobQueue, ParseJob, QUEUED, RUNNING, CANCELLED
+    from app.pdf_statements import read_pdf_statement
+    from app import bank_formats
+    from app.csv_stream import CsvBatcher
+    from app.multipart_stream import MultipartParser, MultipartError, parse_boundary, part_info, HEADERS, DATA, PART_END
+except ImportError:  # Ejecución directa: python app/main.py
+    from watcher import FileWatcher, WATCHED_EXTENSIONS, file_signature
+    from jobs import JobQueue, ParseJob, QUEUED, RUNNING, CANCELLED
+    from pdf_statements import read_pdf_statement
+    import bank_formats
+    from csv_stream import CsvBatcher
+    from multipart_stream import MultipartParser, MultipartError, parse_boundary, part_info, HEADERS, DATA, PART_END
 
 app = FastAPI(
     title="Data Extraction Service - Análisis de Gastos",
@@ -23,9 +58,254 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas Prometheus en /metrics
+setup_metrics(app, service="data-extraction")
+
 # Variables globales
 START_TIME = time.time()
 
+# Configuración
+PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8001")
+DATA_COLLECTION_SERVICE_URL = os.getenv("DATA_COLLECTION_SERVICE_URL", "http://localhost:8002")
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret-key-change-in-production")
+JWT_ALGORITHM = "HS256"
+
+# Vigilancia de carpetas: WATCH_ENABLED=0 la desactiva
+WATCH_ENABLED = os.getenv("WATCH_ENABLED", "1") != "0"
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2"))
+WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", "2"))
+# Registros por petición al servicio de recopilación
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", "50000"))
+# Procesos de parseo simultáneos y memoria máxima de cada uno (0 = sin límite)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+PARSE_MEMORY_LIMIT_MB = int(os.getenv("PARSE_MEMORY_LIMIT_MB", "2048"))
+# Procesos por extracto PDF para leer sus páginas en paralelo (0 = uno por CPU)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+# Subidas: tamaño máximo por petición, tamaño de cada lote y subidas simultáneas
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "512"))
+UPLOAD_BATCH_MB = int(os.getenv("UPLOAD_BATCH_MB", "8"))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "2"))
+
+# Misma caché de Excel que data-collection-service (indexada por contenido)
+EXCEL_CACHE = ExcelCache(Path(os.getenv("EXCEL_CACHE_DIR", PROJECT_ROOT / "data" / "cache" / "excel")))
+# Formatos que solo lee este servicio
+READERS = {
+    ".pdf": functools.partial(read_pdf_statement, workers=PDF_WORKERS or None),
+    **bank_formats.READERS
+}
+
+PARSE_JOBS = REGISTRY.counter(
+    "parse_jobs_total", "Trabajos de parseo terminados por entorno y resultado", ["environment", "status"]
+)
+PARSE_JOB_SECONDS = REGISTRY.histogram(
+    "parse_job_seconds", "Duración de los trabajos de parseo (proceso hijo incluido)", ["environment"]
+)
+UPLOADS = REGISTRY.counter(
+    "uploads_total", "Subidas por entorno y resultado", ["environment", "status"]
+)
+UPLOAD_BYTES = REGISTRY.counter(
+    "upload_bytes_total", "Bytes recibidos en subidas", ["environment"]
+)
+
+# Las subidas que superan UPLOAD_CONCURRENCY esperan sin leer su cuerpo
+UPLOAD_SLOTS = asyncio.Semaphore(max(1, UPLOAD_CONCURRENCY))
+
+# Verificación de dependencias en segundo plano
+HEALTH_PROBES = HealthProbes(
+    {
+        "filesystem": filesystem_probe(PROJECT_ROOT),
+        "auth_service": http_probe(f"{AUTH_SERVICE_URL}/api/v1/health")
+    },
+    critical=["filesystem"]
+)
+
+
+
+# Modelos Pydantic
+class JobRequest(BaseModel):
+    environment: str = Field(..., description="Entorno: pre o pro")
+    filename: Optional[str] = Field(None, description="Archivo de la carpeta del entorno; si se omite, todos")
+
+
+def verify_token(authorization: str) -> dict:
+    """Verificar token JWT"""
+    if not authorization:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "message": "Token no proporcionado",
+                "error_code": "MISSING_TOKEN"
+            }
+        )
+
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "message": "Formato de token inválido",
+                "error_code": "INVALID_TOKEN_FORMAT"
+            }
+        )
+
+    try:
+        return jwt.decode(parts[1], JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "message": "Token inválido o expirado",
+                "error_code": "INVALID_TOKEN"
+            }
+        )
+
+
+def service_token() -> str:
+    """Token JWT de corta duración para llamar a data-collection-service"""
+    payload = {
+        "sub": "data-extraction-service",
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=5)
+    }
+    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def post_batch(environment: str, df: pd.DataFrame, file_info: dict, upload_id: str, first: bool, last: bool):
+    """
+    Enviar un lote de registros al endpoint de ingesta de data-collection-service.
+
+    ``upload_id`` (el trabajo o la subida) separa en el recopilador los
+    lotes de dos envíos del mismo archivo.
+    """
+    # to_json convierte NaN en null y las fechas a ISO 8601
+    payload = {
+        "file": file_info,
+        "records": json.loads(df.to_json(orient="records", date_format="iso")),
+        "upload_id": upload_id,
+        "first": first,
+        "last": last
+    }
+    response = requests.post(
+        f"{DATA_COLLECTION_SERVICE_URL}/api/v1/data/ingest/{environment}",
+        json=payload,
+        headers={"Authorization": f"Bearer {service_token()}"},
+        timeout=60
+    )
+    response.raise_for_status()
+
+
+def abort_batches(environment: str, upload_id: str):
+    """Descartar en data-collection-service los lotes enviados de una subida que no se completará"""
+    response = requests.delete(
+        f"{DATA_COLLECTION_SERVICE_URL}/api/v1/data/ingest/{environment}",
+        params={"upload_id": upload_id},
+        headers={"Authorization": f"Bearer {service_token()}"},
+        timeout=60
+    )
+    response.raise_for_status()
+
+
+def ingest_file(environment: str, filepath: Path, job_id: str) -> int:
+    """
+    Parsear un archivo y enviarlo por lotes a data-collection-service.
+    
+    Devuelve el número de registros enviados.
+    """
+    df, file_info = load_file(filepath, excel_cache=EXCEL_CACHE, readers=READERS)
+    inicios = range(0, len(df), INGEST_BATCH_ROWS) if len(df) else [0]
+    for inicio in inicios:
+        post_batch(environment, df.iloc[inicio:inicio + INGEST_BATCH_ROWS], file_info, job_id,
+                   first=inicio == 0, last=inicio + INGEST_BATCH_ROWS >= len(df))
+    return len(df)
+
+
+def on_job_finished(job: ParseJob):
+    """Registrar métricas y resultado de cada trabajo terminado"""
+    PARSE_JOBS.inc(environment=job.environment, status=job.status)
+    if job.started_at is not None:
+        PARSE_JOB_SECONDS.observe(job.finished_at - job.started_at, environment=job.environment)
+    if job.error:
+        print(f"❌ {job.path.name}: {job.error}")
+    elif job.status != CANCELLED:
+        print(f"✅ {job.path.name}: {job.result} registros enviados a {job.environment.upper()}")
+
+
+async def on_job_failed(job: ParseJob):
+    """
+    Descartar los lotes que el proceso del trabajo llegó a enviar.
+
+    Un proceso terminado (cancelación, falta de memoria) o fallido a medias
+    deja en data-collection-service lotes sin su último lote; los registros
+    ya cargados de ese archivo no se tocan.
+    """
+    try:
+        await asyncio.to_thread(abort_batches, job.environment, job.id)
+    except requests.RequestException as e:
+        print(f"⚠️  No se pudieron descartar los lotes de {job.path.name}: {e}")
+
+
+JOBS = JobQueue(
+    ingest_file,
+    workers=PARSE_WORKERS,
+    memory_limit_bytes=PARSE_MEMORY_LIMIT_MB * 1024 * 1024 or None,
+    on_finish=on_job_finished,
+    on_failure=on_job_failed
+)
+
+
+async def on_new_file(environment: str, filepath: Path):
+    """Callback del vigilante: encolar el archivo para parsearlo"""
+    JOBS.submit(environment, filepath)
+
+
+WATCHER = FileWatcher(
+    {"pre": PROJECT_ROOT / "datos-pre", "pro": PROJECT_ROOT / "datos-pro"},
+    on_new_file,
+    debounce=WATCH_DEBOUNCE_SECONDS,
+    poll_interval=WATCH_POLL_SECONDS
+)
+
+
+# Eventos de inicio/cierre
+@app.on_event("startup")
+async def startup_event():
+    """Iniciar la verificación de dependencias, la cola de parseo y la vigilancia de carpetas"""
+    await HEALTH_PROBES.start()
+    await JOBS.start()
+    if WATCH_ENABLED:
+        await WATCHER.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detener las tareas en segundo plano"""
+    await WATCHER.stop()
+    await JOBS.stop()
+    await HEALTH_PROBES.stop()
+
+
+# Manejadores de excepciones
+@app.exception_handler(HTTPException)
+async def http_exception_handler(request: Request, exc: HTTPException):
+    """Manejar HTTPException y devolver formato consistente"""
+    if isinstance(exc.detail, dict) and "success" in exc.detail:
+        return JSONResponse(
+            status_code=exc.status_code,
+            content=exc.detail
+        )
+
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "success": False,
+            "message": str(exc.detail),
+            "error_code": "ERROR"
+        }
+    )
+
 
 @app.get("/api/v1/health", tags=["Health"])
 async def health_check():
@@ -36,31 +316,261 @@ async def health_check():
     - Estado general del servicio
     - Tiempo de actividad
     - Estado de dependencias (filesystem, auth_service)
+    
+    Las dependencias se comprueban en segundo plano; aquí solo se devuelve
+    el último resultado.
     """
     uptime = int(time.time() - START_TIME)
+    estado, checks = HEALTH_PROBES.snapshot()
     
-    # Por ahora, el servicio está en estado "healthy" simplificado
-    # En una implementación real, verificaríamos acceso al filesystem y auth service
-    
-    return {
-        "status": "healthy",
-        "service": "data-extraction-service",
-        "version": "1.0.0",
-        "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-        "uptime": uptime,
-        "checks": {
-            "filesystem": {
-                "status": "healthy",
-                "response_time_ms": 8
-            },
-            "auth_service": {
-                "status": "healthy",
-                "response_time_ms": 22
-            }
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if estado in ("healthy", "degraded") else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": estado,
+            "service": "data-extraction-service",
+            "version": "1.0.0",
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "uptime": uptime,
+            "checks": checks
         }
+    )
+
+
+def get_job(job_id: str) -> ParseJob:
+    job = JOBS.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "success": False,
+                "message": f"Trabajo no encontrado: {job_id}",
+                "error_code": "JOB_NOT_FOUND"
+            }
+        )
+    return job
+
+
+@app.get("/api/v1/jobs", tags=["Jobs"])
+async def list_jobs(authorization: Optional[str] = Header(None)):
+    """
+    Trabajos de parseo en cola (en orden de ejecución), en curso y
+    terminados (los más recientes primero), con sus tiempos.
+    """
+    verify_token(authorization)
+    return {"success": True, "data": JOBS.snapshot()}
+
+
+@app.post("/api/v1/jobs", status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def submit_jobs(request_body: JobRequest, authorization: Optional[str] = Header(None)):
+    """
+    Encolar archivos de datos-pre o datos-pro (uno o toda la carpeta).
+
+    Útil para procesar extractos históricos: se ejecutan con su prioridad
+    sin retrasar a los archivos pequeños ni a los de PRO.
+    """
+    verify_token(authorization)
+    folder = PROJECT_ROOT / f"datos-{request_body.environment}"
+    if request_body.environment not in ("pre", "pro") or not folder.is_dir():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "success": False,
+                "message": f"Entorno no válido: {request_body.environment}",
+                "error_code": "INVALID_ENVIRONMENT"
+            }
+        )
+
+    if request_body.filename is not None:
+        archivos = [folder / Path(request_body.filename).name]
+    else:
+        archivos = sorted(p for p in folder.iterdir() if p.suffix.lower() in WATCHED_EXTENSIONS)
+    archivos = [p for p in archivos if p.is_file() and p.suffix.lower() in WATCHED_EXTENSIONS]
+    if not archivos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "success": False,
+                "message": f"No se encontraron archivos para procesar en {request_body.environment.upper()}",
+                "error_code": "NO_FILES_FOUND"
+            }
+        )
+
+    jobs = [JOBS.submit(request_body.environment, path) for path in archivos]
+    return {"success": True, "data": {"jobs": [job.to_dict() for job in jobs]}}
+
+
+@app.get("/api/v1/jobs/{job_id}", tags=["Jobs"])
+async def job_status(job_id: str, authorization: Optional[str] = Header(None)):
+    """Estado y tiempos de un trabajo"""
+    verify_token(authorization)
+    return {"success": True, "data": get_job(job_id).to_dict()}
+
+
+@app.delete("/api/v1/jobs/{job_id}", tags=["Jobs"])
+async def cancel_job(job_id: str, authorization: Optional[str] = Header(None)):
+    """Cancelar un trabajo en cola o en curso (se termina su proceso)"""
+    verify_token(authorization)
+    job = get_job(job_id)
+    if job.status not in (QUEUED, RUNNING):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "success": False,
+                "message": f"El trabajo ya terminó ({job.status})",
+                "error_code": "JOB_ALREADY_FINISHED"
+            }
+        )
+    JOBS.cancel(job_id)
+    return {"success": True, "data": job.to_dict()}
+
+
+def upload_error(status_code: int, message: str, error_code: str) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail={"success": False, "message": message, "error_code": error_code}
+    )
+
+
+async def stream_upload(environment: str, request: Request, folder: Path) -> dict:
+    """
+    Parsear un CSV mientras llega el cuerpo multipart y enviarlo por lotes.
+
+    Cada lote se envía a data-collection-service mientras se recibe y parsea
+    el siguiente; con un envío en curso no se lee más cuerpo, así que un
+    cliente más rápido que la ingesta espera (contrapresión TCP) en lugar de
+    acumular datos aquí. El último lote se retiene para enviarlo con
+    ``last=True`` y los metadatos completos. El archivo se guarda además en
+    la carpeta del entorno (sin que el vigilante lo vuelva a procesar).
+    """
+    limite = UPLOAD_MAX_MB * 1024 * 1024
+    parser = MultipartParser(parse_boundary(request.headers.get("content-type")))
+    batcher = CsvBatcher(UPLOAD_BATCH_MB * 1024 * 1024)
+    upload_id = uuid.uuid4().hex[:12]
+    nombre = None
+    parte = None
+    parcial = None
+    copia = None
+    en_vuelo = None  # como mucho un envío en curso
+    retenido = None
+    enviados = 0
+    recibidos = 0
+    inicio = time.perf_counter()
+
+    async def enviar(df: pd.DataFrame, last: bool):
+        nonlocal en_vuelo, enviados
+        if en_vuelo is not None:
+            await en_vuelo
+        en_vuelo = asyncio.create_task(asyncio.to_thread(
+            post_batch, environment, df, batcher.file_info(nombre), upload_id, enviados == 0, last
+        ))
+        enviados += 1
+
+    async def encolar(lotes):
+        nonlocal retenido
+        for df in lotes:
+            if retenido is not None:
+                await enviar(retenido, last=False)
+            retenido = df
+
+    try:
+        async for chunk in request.stream():
+            recibidos += len(chunk)
+            if recibidos > limite:
+                raise upload_error(413,
+                                   f"La subida supera el límite de {UPLOAD_MAX_MB} MB", "UPLOAD_TOO_LARGE")
+            for evento, valor in parser.feed(chunk):
+                if evento == HEADERS:
+                    info = part_info(valor)
+                    parte = info["name"] if nombre is None else None
+                    if parte != "file":
+                        continue
+                    nombre = Path(info["filename"] or "").name
+                    if Path(nombre).suffix.lower() != ".csv":
+                        raise upload_error(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                                           "Solo se admiten archivos CSV; el resto de formatos se procesan "
+                                           "desde las carpetas de datos", "UNSUPPORTED_FORMAT")
+                    parcial = folder / f".{nombre}.part"
+                    copia = open(parcial, "wb")
+                elif evento == DATA and parte == "file":
+                    copia.write(valor)
+                    await encolar(batcher.feed(valor))
+                elif evento == PART_END and parte == "file":
+                    await encolar(batcher.close())
+                    parte = None
+        parser.close()
+        if nombre is None:
+            raise upload_error(status.HTTP_400_BAD_REQUEST, "Falta el campo 'file' con el CSV", "MISSING_FILE")
+        # Un archivo sin filas se registra igualmente (lote vacío)
+        await enviar(retenido if retenido is not None else pd.DataFrame(), last=True)
+        await en_vuelo
+    except BaseException:
+        if en_vuelo is not None:
+            await asyncio.gather(en_vuelo, return_exceptions=True)
+            # Los lotes sin last=True solo están acumulados en el recopilador:
+            # se descartan sin tocar lo ya cargado de ese archivo
+            await asyncio.gather(asyncio.to_thread(abort_batches, environment, upload_id), return_exceptions=True)
+        if copia is not None:
+            copia.close()
+            parcial.unlink(missing_ok=True)
+        raise
+    copia.close()
+
+    destino = folder / nombre
+    os.replace(parcial, destino)
+    WATCHER.seen[destino.resolve()] = file_signature(destino)
+
+    segundos = time.perf_counter() - inicio
+    UPLOAD_BYTES.inc(recibidos, environment=environment)
+    return {
+        **batcher.file_info(nombre),
+        "environment": environment,
+        "batches": enviados,
+        "detected": batcher.detectado,
+        "elapsed_ms": round(segundos * 1000, 3),
+        "rows_per_second": round(batcher.records / segundos) if segundos else None
     }
 
 
+@app.post("/api/v1/upload/{environment}", tags=["Upload"])
+async def upload_file(environment: str, request: Request, authorization: Optional[str] = Header(None)):
+    """
+    Subir un extracto CSV (campo ``file`` de un formulario multipart).
+
+    Las filas se parsean y se envían a data-collection-service mientras se
+    recibe el cuerpo. Devuelve las estadísticas de la ingesta.
+    """
+    verify_token(authorization)
+    folder = PROJECT_ROOT / f"datos-{environment}"
+    if environment not in ("pre", "pro") or not folder.is_dir():
+        raise upload_error(status.HTTP_404_NOT_FOUND, f"Entorno no válido: {environment}", "INVALID_ENVIRONMENT")
+
+    longitud = request.headers.get("content-length")
+    if longitud and longitud.isdigit() and int(longitud) > UPLOAD_MAX_MB * 1024 * 1024:
+        UPLOADS.inc(environment=environment, status="rejected")
+        raise upload_error(413,
+                           f"La subida supera el límite de {UPLOAD_MAX_MB} MB", "UPLOAD_TOO_LARGE")
+
+    async with UPLOAD_SLOTS:
+        try:
+            stats = await stream_upload(environment, request, folder)
+        except MultipartError as e:
+            UPLOADS.inc(environment=environment, status="failed")
+            raise upload_error(status.HTTP_400_BAD_REQUEST, str(e), "INVALID_MULTIPART")
+        except HTTPException:
+            UPLOADS.inc(environment=environment, status="rejected")
+            raise
+        except requests.RequestException as e:
+            UPLOADS.inc(environment=environment, status="failed")
+            raise upload_error(status.HTTP_502_BAD_GATEWAY,
+                               f"Error al enviar los datos a data-collection-service: {e}", "INGEST_FAILED")
+        except (ValueError, pd.errors.ParserError) as e:
+            UPLOADS.inc(environment=environment, status="failed")
+            raise upload_error(status.HTTP_400_BAD_REQUEST, f"Error al leer el CSV: {e}", "INVALID_CSV")
+
+    UPLOADS.inc(environment=environment, status="done")
+    return {"success": True, "data": stats}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
@@ -0,0 +1,133 @@
+"""
+Parser incremental de cuerpos ``multipart/form-data``.
+
+Se alimenta con los trozos del cuerpo según llegan (``feed``) y devuelve
+eventos por parte: cabeceras, datos y fin. No guarda más que lo necesario
+para reconocer el delimitador entre dos trozos, así que una subida de
+cientos de MB se procesa sin tenerla en memoria ni en disco.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Cabeceras de una parte (Content-Disposition, Content-Type)
+MAX_HEADER_BYTES = 16 * 1024
+
+HEADERS = "headers"
+DATA = "data"
+PART_END = "part_end"
+
+PARAM = re.compile(r';\s*([\w*-]+)\s*=\s*(?:"((?:[^"\\]|\\.)*)"|([^;\s]*))')
+
+Event = Tuple[str, object]
+
+
+class MultipartError(ValueError):
+    """Cuerpo multipart mal formado"""
+
+
+def parse_boundary(content_type: Optional[str]) -> bytes:
+    """Delimitador de la cabecera ``Content-Type``"""
+    if not content_type or not content_type.lower().startswith("multipart/form-data"):
+        raise MultipartError("Se esperaba Content-Type multipart/form-data")
+    params = parse_params(content_type)
+    if not params.get("boundary"):
+        raise MultipartError("Falta el boundary en Content-Type")
+    return params["boundary"].encode("latin-1")
+
+
+def parse_params(value: str) -> Dict[str, str]:
+    """Parámetros ``; clave=valor`` de una cabecera"""
+    return {m.group(1).lower(): m.group(2) if m.group(2) is not None else m.group(3)
+            for m in PARAM.finditer(value)}
+
+
+def parse_headers(raw: bytes) -> Dict[str, str]:
+    cabeceras = {}
+    for linea in raw.decode("utf-8", errors="replace").split("\r\n"):
+        if ":" in linea:
+            nombre, valor = linea.split(":", 1)
+            cabeceras[nombre.strip().lower()] = valor.strip()
+    return cabeceras
+
+
+def part_info(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Nombre del campo y del archivo de una parte"""
+    params = parse_params(headers.get("content-disposition", ""))
+    return {"name": params.get("name"), "filename": params.get("filename")}
+
+
+class MultipartParser:
+    """
+    ``feed(trozo)`` devuelve la lista de eventos que completa ese trozo:
+
+    - ``("headers", {cabecera: valor})`` al empezar cada parte
+    - ``("data", bytes)`` con el contenido de la parte, en trozos
+    - ``("part_end", None)`` al terminar cada parte
+
+    ``close()`` comprueba que el cuerpo terminó con el delimitador final.
+    """
+
+    def __init__(self, boundary: bytes):
+        # El primer delimitador puede ir al principio, sin CRLF delante
+        self.delimiter = b"\r\n--" + boundary
+        self.buffer = b"\r\n"
+        self.state = "preamble"
+        self.finished = False
+
+    def feed(self, chunk: bytes) -> List[Event]:
+        eventos = []
+        self.buffer += chunk
+        while True:
+            if self.state in ("preamble", "body"):
+                pos = self.buffer.find(self.delimiter)
+                if pos < 0:
+                    # Lo que no puede ser el principio del delimitador ya es contenido
+                    seguro = len(self.buffer) - len(self.delimiter) + 1
+                    if seguro > 0:
+                        if self.state == "body":
+                            eventos.append((DATA, self.buffer[:seguro]))
+                        self.buffer = self.buffer[seguro:]
+                    return eventos
+                if self.state == "body":
+                    if pos:
+                        eventos.append((DATA, self.buffer[:pos]))
+                    eventos.append((PART_END, None))
+                self.buffer = self.buffer[pos + len(self.delimiter):]
+                self.state = "after_delimiter"
+            elif self.state == "after_delimiter":
+                if len(self.buffer) < 2:
+                    return eventos
+                if self.buffer.startswith(b"--"):
+                    self.state = "epilogue"
+                    self.finished = True
+                    self.buffer = b""
+                    return eventos
+                fin = self.buffer.find(b"\r\n")
+                if fin < 0:
+                    return eventos
+                # Espacios permitidos tras el delimitador
+                self.buffer = self.buffer[fin + 2:]
+                self.state = "headers"
+            elif self.state == "headers":
+                if self.buffer.startswith(b"\r\n"):
+                    # Parte sin cabeceras
+                    eventos.append((HEADERS, {}))
+                    self.buffer = self.buffer[2:]
+                    self.state = "body"
+                    continue
+                fin = self.buffer.find(b"\r\n\r\n")
+                if fin < 0:
+                    if len(self.buffer) > MAX_HEADER_BYTES:
+                        raise MultipartError("Cabeceras de parte demasiado largas")
+                    return eventos
+                eventos.append((HEADERS, parse_headers(self.buffer[:fin])))
+                self.buffer = self.buffer[fin + 4:]
+                self.state = "body"
+            else:  # epilogue: se ignora
+                self.buffer = b""
+                return eventos
+
+    def close(self):
+        if not self.finished:
+            raise MultipartError("Cuerpo multipart incompleto")
@@ -0,0 +1,132 @@
+"""
+Extractos de cuenta en PDF a movimientos.
+
+Convierte los extractos en PDF con texto (no escaneados) al mismo esquema
+que los ``excelFile_*.xlsx`` de cuenta: ``Fecha``, ``F. Valor``,
+``Concepto``, ``Importe`` y ``Saldo``. Una línea es un movimiento si
+empieza por una fecha y termina con dos importes con coma decimal
+(importe y saldo); el resto (cabeceras, pies, totales) se ignora.
+
+El texto de cada página se extrae con ``pypdf`` en modo ``layout``, que
+conserva la disposición de las columnas; también abre los extractos
+cifrados con contraseña de usuario vacía, habituales en los bancos.
+
+Las páginas se leen por bloques de ``pages_per_task`` y los bloques se
+reparten entre procesos (``fork``) que heredan el documento ya abierto.
+Como mucho hay ``2 * workers`` bloques en vuelo y los resultados se
+entregan en orden de página, así que la memoria no depende del número de
+páginas del documento sino de los movimientos extraídos.
+"""
+
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from pypdf import PdfReader
+
+COLUMNS = ["Fecha", "F. Valor", "Concepto", "Importe", "Saldo"]
+PAGES_PER_TASK = 16
+
+DATE = r"\d{2}[/-]\d{2}[/-]\d{2,4}"
+AMOUNT = r"[-+]?(?:\d{1,3}(?:\.\d{3})+|\d+),\d{2}"
+MOVEMENT_LINE = re.compile(
+    rf"^(?P<fecha>{DATE})\s+(?:(?P<valor>{DATE})\s+)?(?P<concepto>.+?)\s+"
+    rf"(?P<importe>{AMOUNT})\s*(?:€|EUR)?\s+(?P<saldo>{AMOUNT})\s*(?:€|EUR)?$"
+)
+
+Movement = Tuple[str, str, str, float, float]
+
+# Lector del documento en los procesos del pool (heredado con fork)
+_READER: Optional["PageReader"] = None
+
+
+class PageReader:
+    """Líneas de texto de las páginas sueltas de un PDF"""
+
+    def __init__(self, path: Path):
+        self.pdf = PdfReader(str(path))
+
+    def __len__(self) -> int:
+        return len(self.pdf.pages)
+
+    def lines(self, index: int) -> List[str]:
+        texto = self.pdf.pages[index].extract_text(extraction_mode="layout") or ""
+        # El modo layout separa las columnas con varios espacios
+        return [re.sub(r"\s{2,}", " ", linea).strip() for linea in texto.splitlines() if linea.strip()]
+
+    def close(self):
+        self.pdf.close()
+
+
+def parse_amount(text: str) -> float:
+    """Importe con coma decimal y punto de miles (``-1.234,56``)"""
+    return float(text.replace(".", "").replace(",", "."))
+
+
+def parse_lines(lines: Sequence[str]) -> List[Movement]:
+    """Movimientos de las líneas de texto de una página"""
+    movimientos = []
+    for linea in lines:
+        m = MOVEMENT_LINE.match(linea.strip())
+        if m is None:
+            continue
+        movimientos.append((
+            m["fecha"],
+            m["valor"] or m["fecha"],
+            m["concepto"],
+            parse_amount(m["importe"]),
+            parse_amount(m["saldo"])
+        ))
+    return movimientos
+
+
+def _init_worker(reader: PageReader):
+    global _READER
+    _READER = reader
+
+
+def _parse_pages(pages: range) -> List[Movement]:
+    return [mov for i in pages for mov in parse_lines(_READER.lines(i))]
+
+
+def iter_movements(path: Path, workers: Optional[int] = None,
+                   pages_per_task: int = PAGES_PER_TASK) -> Iterator[List[Movement]]:
+    """Movimientos del documento por bloques de páginas, en orden"""
+    reader = PageReader(Path(path))
+    try:
+        total = len(reader)
+        bloques = [range(i, min(i + pages_per_task, total)) for i in range(0, total, pages_per_task)]
+        workers = min(workers or os.cpu_count() or 1, len(bloques))
+        if workers <= 1:
+            _init_worker(reader)
+            for bloque in bloques:
+                yield _parse_pages(bloque)
+            return
+
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(reader,)) as pool:
+            en_vuelo = deque()
+            pendientes = iter(bloques)
+            for bloque in pendientes:
+                en_vuelo.append(pool.submit(_parse_pages, bloque))
+                if len(en_vuelo) >= 2 * workers:
+                    yield en_vuelo.popleft().result()
+            while en_vuelo:
+                yield en_vuelo.popleft().result()
+    finally:
+        reader.close()
+
+
+def read_pdf_statement(path: Path, workers: Optional[int] = None,
+                       pages_per_task: int = PAGES_PER_TASK) -> pd.DataFrame:
+    """Leer un extracto en PDF con las columnas de los extractos de cuenta"""
+    movimientos = []
+    for bloque in iter_movements(path, workers, pages_per_task):
+        movimientos.extend(bloque)
+    return pd.DataFrame.from_records(movimientos, columns=COLUMNS)
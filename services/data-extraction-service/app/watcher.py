@@ -0,0 +1,167 @@
+"""
+Vigilancia de las carpetas de extractos (datos-pre, datos-pro).
+
+Con ``watchdog`` instalado se reciben los eventos del sistema de archivos
+(inotify en Linux); si no, se recorren las carpetas cada
+``poll_interval`` segundos comparando tamaño y fecha de modificación.
+
+Copiar un extracto genera una ráfaga de eventos mientras se escribe, así
+que cada archivo se procesa cuando lleva ``debounce`` segundos sin
+cambios. Los archivos que ya existían al arrancar no se procesan (se
+cargan con los endpoints de data-collection-service); sí se procesan si
+se modifican después.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Dependencia opcional
+    FileSystemEventHandler = object
+    Observer = None
+
+# Extensiones de los extractos que se procesan
+WATCHED_EXTENSIONS = (".csv", ".xls", ".xlsx", ".pdf", ".ofx", ".qfx", ".qif", ".xml", ".053")
+
+Signature = Tuple[int, int]
+
+
+def file_signature(path: Path) -> Optional[Signature]:
+    """Tamaño y fecha de modificación (ns) de un archivo, o None si no existe"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Reenvía los eventos de watchdog (en su hilo) al bucle de eventos"""
+
+    def __init__(self, watcher: "FileWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        # En un renombrado el archivo que interesa es el destino
+        path = getattr(event, "dest_path", None) or event.src_path
+        self.watcher.loop.call_soon_threadsafe(self.watcher.touch, Path(path))
+
+
+class FileWatcher:
+    """
+    Vigila carpetas y llama a ``callback(entorno, ruta)`` con cada archivo
+    nuevo o modificado, una vez que deja de cambiar.
+    """
+
+    def __init__(
+        self,
+        folders: Dict[str, Path],
+        callback: Callable[[str, Path], Awaitable[None]],
+        debounce: float = 2.0,
+        poll_interval: float = 2.0,
+        use_watchdog: bool = True
+    ):
+        self.folders = {env: Path(folder).resolve() for env, folder in folders.items()}
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.mode = "watchdog" if self.use_watchdog else "polling"
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Archivo -> (entorno, instante del último evento)
+        self.pending: Dict[Path, Tuple[str, float]] = {}
+        # Archivo -> firma con la que se procesó (o se encontró al arrancar)
+        self.seen: Dict[Path, Signature] = {}
+        self.tasks: List[asyncio.Task] = []
+        self.observer = None
+
+    def environment_of(self, path: Path) -> Optional[str]:
+        for env, folder in self.folders.items():
+            if path.parent == folder:
+                return env
+        return None
+
+    def scan(self) -> Dict[Path, Signature]:
+        """Firmas de los archivos vigilados que hay ahora en las carpetas"""
+        firmas = {}
+        for folder in self.folders.values():
+            if not folder.is_dir():
+                continue
+            for path in folder.iterdir():
+                if path.suffix.lower() in WATCHED_EXTENSIONS and not path.name.startswith("."):
+                    firma = file_signature(path)
+                    if firma is not None:
+                        firmas[path] = firma
+        return firmas
+
+    def touch(self, path: Path):
+        """Registrar actividad en un archivo (reinicia su espera)"""
+        if path.suffix.lower() not in WATCHED_EXTENSIONS or path.name.startswith("."):
+            return
+        env = self.environment_of(path)
+        if env is not None:
+            self.pending[path] = (env, self.loop.time())
+
+    async def start(self):
+        """Tomar la foto inicial y empezar a vigilar"""
+        self.loop = asyncio.get_running_loop()
+        self.seen = self.scan()
+        if self.use_watchdog:
+            self.observer = Observer()
+            handler = _EventHandler(self)
+            for folder in self.folders.values():
+                folder.mkdir(parents=True, exist_ok=True)
+                self.observer.schedule(handler, str(folder), recursive=False)
+            self.observer.start()
+        else:
+            self.tasks.append(asyncio.create_task(self._poll()))
+        self.tasks.append(asyncio.create_task(self._process_pending()))
+        print(f"👀 Vigilando {', '.join(str(f) for f in self.folders.values())} ({self.mode})")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.observer is not None:
+            self.observer.stop()
+            await asyncio.to_thread(self.observer.join)
+            self.observer = None
+
+    async def _poll(self):
+        anterior = dict(self.seen)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            actual = self.scan()
+            # Solo cuenta como actividad lo que cambió desde la última pasada
+            for path, firma in actual.items():
+                if anterior.get(path) != firma:
+                    self.touch(path)
+            anterior = actual
+
+    async def _process_pending(self):
+        while True:
+            await asyncio.sleep(min(self.debounce / 4, 0.5))
+            await self.flush()
+
+    async def flush(self):
+        """Procesar los archivos que llevan ``debounce`` segundos sin cambios"""
+        ahora = self.loop.time()
+        listos = [path for path, (_, t) in self.pending.items() if ahora - t >= self.debounce]
+        for path in listos:
+            env, _ = self.pending.pop(path)
+            firma = file_signature(path)
+            if firma is None or self.seen.get(path) == firma:
+                # Borrado o sin cambios respecto a lo ya procesado
+                continue
+            self.seen[path] = firma
+            try:
+                await self.callback(env, path)
+            except Exception as e:
+                # Se reintenta cuando el archivo vuelva a cambiar
+                print(f"❌ Error al procesar {path.name}: {e}")
@@ -0,0 +1,139 @@
+"""
+Detección en línea de cargos inusuales.
+
+Cada comercio y cada categoría mantiene una media y una varianza con
+suavizado exponencial (EWMA) del logaritmo del importe. El estado por clave
+es constante (3 números), de modo que los movimientos se procesan en una
+sola pasada a medida que se ingieren y nunca hay que volver a recorrer el
+histórico.
+"""
+
+import math
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from common.money import cents_to_euros
+
+
+class EwmaStats:
+    """Media y varianza exponenciales de una serie"""
+
+    __slots__ = ("count", "mean", "var")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, var: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.var = var
+
+    def zscore(self, value: float, min_std: float) -> float:
+        """Desviación de ``value`` respecto a la media, en desviaciones típicas"""
+        std = max(math.sqrt(self.var), min_std)
+        return (value - self.mean) / std
+
+    def update(self, value: float, alpha: float):
+        """Incorporar una observación (media acumulada durante el arranque)"""
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            self.var = 0.0
+            return
+        weight = max(alpha, 1.0 / self.count)
+        diff = value - self.mean
+        incr = weight * diff
+        self.mean += incr
+        self.var = (1 - weight) * (self.var + diff * incr)
+
+
+class AnomalyDetector:
+    """
+    Detector de cargos inusuales por comercio y por categoría.
+
+    Un cargo se marca cuando su importe se aleja más de ``threshold``
+    desviaciones de lo habitual en su comercio. Si el comercio todavía no
+    tiene ``warmup`` cargos se compara con su categoría.
+    """
+
+    def __init__(self, alpha: float = 0.1, threshold: float = 3.5, warmup: int = 5,
+                 min_std: float = 0.05, max_flagged: int = 5000):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.min_std = min_std
+        self.merchants: Dict[str, EwmaStats] = {}
+        self.categories: Dict[str, EwmaStats] = {}
+        self.flagged: deque = deque(maxlen=max_flagged)
+        self.processed = 0
+
+    def _score(self, stats: Optional[EwmaStats], value: float) -> Optional[float]:
+        if stats is None or stats.count < self.warmup:
+            return None
+        return stats.zscore(value, self.min_std)
+
+    def _update(self, stats: EwmaStats, value: float):
+        # Limitar el peso de los valores atípicos para que no desplacen la referencia
+        if stats.count >= self.warmup:
+            limit = self.threshold * max(math.sqrt(stats.var), self.min_std)
+            value = min(max(value, stats.mean - limit), stats.mean + limit)
+        stats.update(value, self.alpha)
+
+    def process(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Procesar un lote de movimientos normalizados y devolver los marcados"""
+        nuevos = []
+        cargos = df[df["importe"] < 0]
+        columnas = ["fecha", "comercio", "categoria", "importe", "concepto", "source_file"]
+
+        for fecha, comercio, categoria, importe, concepto, source_file in cargos[columnas].itertuples(index=False):
+            euros = cents_to_euros(importe)
+            value = math.log1p(-euros)
+            merchant = self.merchants.get(comercio)
+            category = self.categories.get(categoria)
+
+            z = self._score(merchant, value)
+            reference, motivo = merchant, "comercio"
+            if z is None:
+                z = self._score(category, value)
+                reference, motivo = category, "categoria"
+
+            if z is not None and abs(z) >= self.threshold:
+                flag = {
+                    "fecha": fecha.isoformat() if pd.notna(fecha) else None,
+                    "comercio": comercio,
+                    "categoria": categoria,
+                    "concepto": concepto,
+                    "importe": float(euros),
+                    "importe_esperado": round(-math.expm1(reference.mean), 2),
+                    "z_score": round(z, 2),
+                    "motivo": motivo,
+                    "source_file": source_file,
+                }
+                self.flagged.append(flag)
+                nuevos.append(flag)
+
+            if merchant is None:
+                merchant = self.merchants[comercio] = EwmaStats()
+            if category is None:
+                category = self.categories[categoria] = EwmaStats()
+            self._update(merchant, value)
+            self._update(category, value)
+
+        self.processed += len(cargos)
+        return nuevos
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar el estado para guardarlo en disco"""
+        return {
+            "processed": self.processed,
+            "merchants": {k: [s.count, s.mean, s.var] for k, s in self.merchants.items()},
+            "categories": {k: [s.count, s.mean, s.var] for k, s in self.categories.items()},
+            "flagged": list(self.flagged),
+        }
+
+    def load_dict(self, data: Dict[str, Any]):
+        """Restaurar el estado guardado con ``to_dict``"""
+        self.processed = data.get("processed", 0)
+        self.merchants = {k: EwmaStats(*v) for k, v in data.get("merchants", {}).items()}
+        self.categories = {k: EwmaStats(*v) for k, v in data.get("categories", {}).items()}
+        self.flagged.clear()
+        self.flagged.extend(data.get("flagged", []))
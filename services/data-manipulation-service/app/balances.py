@@ -0,0 +1,214 @@
+"""
+Saldo acumulado, flujo de caja diario y control de coherencia de las cuentas.
+
+Trabaja sobre los extractos de cuenta (``excelFile_*.xls``/``.xlsx``), que
+traen ``importe`` y ``saldo``. Los movimientos se separan por cuenta (columna
+``cuenta``, ``iban``... del extracto) y los de cada cuenta se fusionan en un
+único array ordenado por fecha; el resto de cálculos son sumas acumuladas y
+reducciones por tramos sobre esos arrays. Los extractos sin columna de
+cuenta se tratan como una sola cuenta. Las sumas se hacen en céntimos
+enteros, así que el saldo calculado cuadra exactamente con el reportado.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from common.columns import ACCOUNT_COLUMNS, coalesce
+from common.money import cents_to_euros
+
+ACCOUNT_FILE_PATTERN = r"(?i)^excelFile_.*\.xlsx?$"
+# Clave de los movimientos de extractos sin columna de cuenta
+SIN_CUENTA = ""
+DUPLICATE_KEY = ["_cuenta", "fecha", "importe", "saldo", "concepto"]
+
+
+def euros(cents) -> float:
+    return round(float(cents_to_euros(cents)), 2)
+
+
+def account_label(clave: str) -> Optional[str]:
+    return None if clave == SIN_CUENTA else clave
+
+
+def account_movements(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fusionar los movimientos de cuenta de todos los extractos, por cuenta y en orden cronológico.
+
+    Los bancos suelen exportar del más reciente al más antiguo; el orden de
+    cada archivo se invierte cuando es descendente para conservar el orden
+    real de los movimientos de un mismo día. Los movimientos repetidos en
+    extractos solapados se cuentan una sola vez. La cuenta queda en ``_cuenta``.
+    """
+    if "saldo" not in df.columns:
+        return df.iloc[0:0]
+
+    cuenta = df[df["source_file"].str.match(ACCOUNT_FILE_PATTERN) &
+                df["fecha"].notna() & df["importe"].notna() & df["saldo"].notna()]
+    if cuenta.empty:
+        return cuenta
+
+    claves = coalesce(cuenta, ACCOUNT_COLUMNS)
+    if claves is None:
+        claves = pd.Series(SIN_CUENTA, index=cuenta.index)
+    claves = claves.fillna(SIN_CUENTA).astype(str).str.replace(r"\s+", "", regex=True).str.upper()
+    cuenta = cuenta.assign(_cuenta=claves)
+
+    grupos = cuenta.groupby(["_cuenta", "source_file"], sort=False)["fecha"]
+    posicion = grupos.cumcount().to_numpy()
+    total = grupos.transform("size").to_numpy()
+    descendente = (grupos.transform("first") > grupos.transform("last")).to_numpy()
+    orden_en_archivo = np.where(descendente, total - 1 - posicion, posicion)
+
+    cuenta = cuenta.assign(_orden=orden_en_archivo, _inicio_archivo=grupos.transform("min"))
+    cuenta = cuenta.sort_values(["_cuenta", "fecha", "_inicio_archivo", "_orden"], kind="mergesort")
+    return cuenta.drop_duplicates(subset=DUPLICATE_KEY).drop(columns=["_orden", "_inicio_archivo"])
+
+
+def single_account(cuenta: pd.DataFrame, tolerance: int) -> Dict[str, Any]:
+    """Saldos, descuadres, flujo diario (en arrays de céntimos) y cobertura de una cuenta"""
+    nombre = account_label(cuenta["_cuenta"].iloc[0])
+    fechas = cuenta["fecha"].to_numpy(dtype="datetime64[ns]")
+    importes = cuenta["importe"].to_numpy(dtype=np.int64)
+    saldos = cuenta["saldo"].to_numpy(dtype=np.int64)
+
+    saldo_inicial = saldos[0] - importes[0]
+    acumulado = saldo_inicial + np.cumsum(importes)
+
+    # Descuadres: saldo[i] debería ser saldo[i-1] + importe[i]
+    descuadre = saldos[1:] - saldos[:-1] - importes[1:]
+    idx_descuadre = np.flatnonzero(np.abs(descuadre) > tolerance) + 1
+    conceptos = cuenta["concepto"].to_numpy()
+    archivos_fila = cuenta["source_file"].to_numpy()
+    inconsistencias = [
+        {
+            "cuenta": nombre,
+            "fecha": pd.Timestamp(fechas[i]).date().isoformat(),
+            "concepto": conceptos[i],
+            "source_file": archivos_fila[i],
+            "saldo_anterior": euros(saldos[i - 1]),
+            "importe": euros(importes[i]),
+            "saldo_reportado": euros(saldos[i]),
+            "importe_no_explicado": euros(descuadre[i - 1]),
+        }
+        for i in idx_descuadre
+    ]
+
+    # Flujo diario: reducción por tramos sobre el array ordenado
+    dias = fechas.astype("datetime64[D]")
+    dias_unicos, inicio = np.unique(dias, return_index=True)
+    fin = np.append(inicio[1:], len(dias)) - 1
+
+    # Cobertura de cada extracto y huecos entre ellos
+    cobertura = cuenta.groupby("source_file")["fecha"].agg(["min", "max", "size"]).sort_values("min")
+    archivos = [
+        {"cuenta": nombre, "source_file": archivo, "fecha_inicio": row["min"].date().isoformat(),
+         "fecha_fin": row["max"].date().isoformat(), "movimientos": int(row["size"])}
+        for archivo, row in cobertura.iterrows()
+    ]
+    cubierto_hasta = cobertura["max"].cummax().shift()
+    huecos = [
+        {"cuenta": nombre,
+         "desde": (hasta + pd.Timedelta(days=1)).date().isoformat(),
+         "hasta": (inicio_archivo - pd.Timedelta(days=1)).date().isoformat()}
+        for hasta, inicio_archivo in zip(cubierto_hasta, cobertura["min"])
+        if pd.notna(hasta) and (inicio_archivo - hasta).days > 1
+    ]
+
+    return {
+        "cuenta": nombre,
+        "saldo_inicial": saldo_inicial,
+        "dias": dias_unicos,
+        "ingresos": np.add.reduceat(np.where(importes > 0, importes, 0), inicio),
+        "gastos": np.add.reduceat(np.where(importes < 0, importes, 0), inicio),
+        "saldo_cierre": saldos[fin],
+        "saldo_calculado": acumulado[fin],
+        "movimientos": len(cuenta),
+        "archivos": archivos,
+        "inconsistencias": inconsistencias,
+        "huecos": huecos,
+    }
+
+
+def daily_flow(dias, ingresos, gastos, saldo_cierre, saldo_calculado) -> List[Dict[str, Any]]:
+    return [
+        {
+            "fecha": str(dia),
+            "ingresos": euros(ing),
+            "gastos": euros(gas),
+            "neto": euros(ing + gas),
+            "saldo_cierre": euros(cierre),
+            "saldo_calculado": euros(calculado),
+        }
+        for dia, ing, gas, cierre, calculado in zip(dias, ingresos, gastos, saldo_cierre, saldo_calculado)
+    ]
+
+
+def compute_balances(df: pd.DataFrame, tolerance: int = 0) -> Dict[str, Any]:
+    """
+    Calcular por cuenta saldo acumulado, flujo diario, descuadres y huecos de cobertura.
+
+    - ``cuentas``: saldos y totales de cada cuenta (``cuenta`` es ``None``
+      para los extractos sin columna de cuenta).
+    - ``flujo_diario``: ingresos y gastos de todas las cuentas por día; el
+      saldo de cierre suma el último saldo conocido de cada cuenta.
+    - ``flujo_por_cuenta``: el flujo diario de cada cuenta.
+    - ``inconsistencias``: movimientos cuyo saldo no cuadra con el saldo
+      anterior de su cuenta más su importe (faltan movimientos entre ambos).
+    - ``huecos``: periodos entre extractos consecutivos de una cuenta no
+      cubiertos por ningún archivo.
+
+    ``tolerance`` es el descuadre admitido en céntimos.
+    """
+    movimientos = account_movements(df)
+    if movimientos.empty:
+        return {"movimientos": 0, "cuentas": [], "archivos": [], "flujo_diario": [], "flujo_por_cuenta": {},
+                "inconsistencias": [], "huecos": []}
+
+    cuentas = [single_account(grupo, tolerance) for _, grupo in movimientos.groupby("_cuenta", sort=True)]
+
+    # Flujo conjunto: sumas por día y, antes del primer movimiento de una
+    # cuenta, su saldo inicial
+    dias = np.unique(np.concatenate([c["dias"] for c in cuentas]))
+    ingresos = np.zeros(len(dias), dtype=np.int64)
+    gastos = np.zeros(len(dias), dtype=np.int64)
+    saldo_cierre = np.zeros(len(dias), dtype=np.int64)
+    saldo_calculado = np.zeros(len(dias), dtype=np.int64)
+    for c in cuentas:
+        posiciones = np.searchsorted(dias, c["dias"])
+        ingresos[posiciones] += c["ingresos"]
+        gastos[posiciones] += c["gastos"]
+        ultimo = np.searchsorted(c["dias"], dias, side="right") - 1
+        antes = ultimo < 0
+        saldo_cierre += np.where(antes, c["saldo_inicial"], c["saldo_cierre"][np.maximum(ultimo, 0)])
+        saldo_calculado += np.where(antes, c["saldo_inicial"], c["saldo_calculado"][np.maximum(ultimo, 0)])
+
+    return {
+        "movimientos": len(movimientos),
+        "saldo_inicial": euros(sum(c["saldo_inicial"] for c in cuentas)),
+        "saldo_final": euros(saldo_cierre[-1]),
+        "saldo_calculado": euros(saldo_calculado[-1]),
+        "total_ingresos": euros(ingresos.sum()),
+        "total_gastos": euros(gastos.sum()),
+        "cuentas": [
+            {
+                "cuenta": c["cuenta"],
+                "movimientos": c["movimientos"],
+                "saldo_inicial": euros(c["saldo_inicial"]),
+                "saldo_final": euros(c["saldo_cierre"][-1]),
+                "saldo_calculado": euros(c["saldo_calculado"][-1]),
+                "total_ingresos": euros(c["ingresos"].sum()),
+                "total_gastos": euros(c["gastos"].sum()),
+            }
+            for c in cuentas
+        ],
+        "archivos": [a for c in cuentas for a in c["archivos"]],
+        "flujo_diario": daily_flow(dias, ingresos, gastos, saldo_cierre, saldo_calculado),
+        "flujo_por_cuenta": {
+            c["cuenta"]: daily_flow(c["dias"], c["ingresos"], c["gastos"], c["saldo_cierre"], c["saldo_calculado"])
+            for c in cuentas
+        },
+        "inconsistencias": [i for c in cuentas for i in c["inconsistencias"]],
+        "huecos": [h for c in cuentas for h in c["huecos"]],
+    }
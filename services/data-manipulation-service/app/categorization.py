@@ -0,0 +1,110 @@
+"""
+Categorización automática de movimientos.
+
+Las palabras clave de todas las reglas se compilan en una única expresión
+regular con un grupo con nombre por regla. Las expresiones regulares del
+usuario se compilan por separado, cada una tal cual: pegadas en un patrón
+común cambiarían de significado (las referencias ``\\1`` apuntarían a grupos
+de otras reglas y los indicadores como ``(?i)`` dejarían de estar al
+principio). Gana la primera regla que coincide, no la coincidencia más a la
+izquierda. Se aplica por columnas: cada descripción distinta se evalúa una
+sola vez y el resultado queda en caché para los siguientes lotes.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RULES = [
+    {"categoria": "NÓMINA", "keywords": ["NOMINA", "SALARIO"]},
+    {"categoria": "SUPERMERCADO", "keywords": ["MERCADONA", "CARREFOUR", "LIDL", "ALDI", "ALCAMPO", "EROSKI",
+                                               "SUPERMERCADO", "HIPERCOR", "CONSUM"]},
+    {"categoria": "RESTAURANTES", "keywords": ["RESTAURANTE", "BAR", "CAFETERIA", "BURGER", "PIZZERIA",
+                                               "JUST EAT", "GLOVO", "DELIVEROO"]},
+    {"categoria": "TRANSPORTE", "keywords": ["RENFE", "METRO", "EMT", "UBER", "CABIFY", "TAXI", "PARKING"]},
+    {"categoria": "COMBUSTIBLE", "keywords": ["GASOLINERA", "REPSOL", "CEPSA", "GALP", "SHELL", "BP"]},
+    {"categoria": "SUSCRIPCIONES", "keywords": ["NETFLIX", "SPOTIFY", "HBO", "DISNEY", "AMAZON PRIME", "APPLE COM"]},
+    {"categoria": "SUMINISTROS", "keywords": ["IBERDROLA", "ENDESA", "NATURGY", "HOLALUZ", "CANAL DE ISABEL",
+                                              "MOVISTAR", "VODAFONE", "ORANGE", "DIGI"]},
+    {"categoria": "COMPRAS ONLINE", "keywords": ["AMAZON", "ALIEXPRESS", "PAYPAL", "EBAY"]},
+    {"categoria": "EFECTIVO", "keywords": ["CAJERO", "REINTEGRO"]},
+    {"categoria": "TRANSFERENCIAS", "keywords": ["TRANSFERENCIA", "BIZUM"]},
+    {"categoria": "COMISIONES", "keywords": ["COMISION"]},
+]
+
+
+def normalize_text(text: str) -> str:
+    """Pasar a mayúsculas, sin acentos y con los signos como espacios"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").upper()
+    return " ".join(re.sub(r"[^A-Z0-9]+", " ", text).split())
+
+
+def compile_rules(rules: List[Dict[str, Any]]) -> Tuple[Optional[re.Pattern], List[Tuple[int, re.Pattern]]]:
+    """
+    Compilar las reglas: las palabras clave juntas y cada ``regex`` aparte.
+
+    Las palabras clave de cada regla son un grupo ``r<i>`` dentro de una
+    búsqueda anticipada desde el inicio del texto, así que las alternativas
+    se prueban en orden de prioridad sobre todo el texto; se buscan como
+    palabras completas sobre el texto normalizado. Las ``regex`` se
+    devuelven con el índice de su regla, en orden de prioridad.
+    Lanza ``re.error`` si alguna expresión no es válida.
+    """
+    alternatives = []
+    expressions = []
+    for i, rule in enumerate(rules):
+        terms = [r"\b" + re.escape(normalize_text(k)) + r"\b" for k in rule.get("keywords", []) if normalize_text(k)]
+        if terms:
+            alternatives.append(f"(?=.*?(?P<r{i}>{'|'.join(terms)}))")
+        if rule.get("regex"):
+            expressions.append((i, re.compile(rule["regex"], re.DOTALL)))
+    keywords = re.compile("|".join(alternatives), re.DOTALL) if alternatives else None
+    return keywords, expressions
+
+
+class Categorizer:
+    """Motor de reglas compilado con caché por descripción"""
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, max_cache: int = 200_000):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.keywords, self.expressions = compile_rules(self.rules)
+        self.max_cache = max_cache
+        self.cache: Dict[str, Optional[str]] = {}
+
+    def categorize_text(self, description: str) -> Optional[str]:
+        """Categoría de una descripción, o None si ninguna regla coincide"""
+        text = normalize_text(description)
+        match = self.keywords.match(text) if self.keywords is not None else None
+        # Regla de palabras clave que coincide; las regex de antes tienen prioridad
+        first = int(match.lastgroup[1:]) if match is not None else len(self.rules)
+        for i, expression in self.expressions:
+            if i >= first:
+                break
+            if expression.search(text):
+                return self.rules[i]["categoria"]
+        return self.rules[first]["categoria"] if match is not None else None
+
+    def categorize(self, descriptions: pd.Series) -> pd.Series:
+        """Categorizar una columna de descripciones evaluando cada valor distinto una vez"""
+        codes, uniques = pd.factorize(descriptions.fillna(""), sort=False)
+        if len(self.cache) + len(uniques) > self.max_cache:
+            self.cache.clear()
+
+        categories = np.empty(len(uniques), dtype=object)
+        for i, description in enumerate(uniques):
+            if description not in self.cache:
+                self.cache[description] = self.categorize_text(description)
+            categories[i] = self.cache[description]
+
+        return pd.Series(categories[codes], index=descriptions.index, dtype=object)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Asignar ``categoria`` a los movimientos; sin coincidencia se mantiene la original"""
+        if "categoria_original" not in df.columns:
+            df["categoria_original"] = df["categoria"]
+        descriptions = df["establecimiento"] + " " + df["concepto"] + " " + df["tipo"]
+        df["categoria"] = self.categorize(descriptions).fillna(df["categoria_original"])
+        return df
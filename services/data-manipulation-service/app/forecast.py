@@ -0,0 +1,190 @@
+"""
+Previsión del gasto mensual por categoría.
+
+Por cada categoría se acumulan los totales mensuales de gasto a medida que
+se ingieren movimientos. El modelo (Holt-Winters aditivo, o naive estacional
+cuando no hay dos años de histórico) solo se actualiza cuando se cierra un
+mes nuevo; las consultas se limitan a evaluar los parámetros guardados.
+
+Los totales mensuales se acumulan en céntimos enteros; los modelos se
+ajustan en euros.
+"""
+
+import itertools
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from common.money import CENTS_PER_EURO, cents_to_euros
+
+SEASON = 12
+# Rejilla de parámetros de suavizado que se prueba en el ajuste inicial
+SMOOTHING_GRID = (0.1, 0.3, 0.5, 0.8)
+
+
+def period_label(period: int) -> str:
+    """Convertir un índice de mes (año * 12 + mes - 1) a 'YYYY-MM'"""
+    return f"{period // 12:04d}-{period % 12 + 1:02d}"
+
+
+def holt_winters_pass(values: np.ndarray, start: int, alpha: float, beta: float, gamma: float,
+                      level: float, trend: float, season: np.ndarray) -> tuple:
+    """
+    Aplicar las ecuaciones de Holt-Winters aditivo a ``values``.
+
+    ``start`` es el índice de mes del primer valor y ``season`` se indexa por
+    mes del año. Devuelve el estado final y el error cuadrático de la
+    predicción a un paso.
+    """
+    season = season.copy()
+    sse = 0.0
+    for offset, value in enumerate(values):
+        pos = (start + offset) % SEASON
+        prediction = level + trend + season[pos]
+        sse += (value - prediction) ** 2
+        previous_level = level
+        level = alpha * (value - season[pos]) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+        season[pos] = gamma * (value - level) + (1 - gamma) * season[pos]
+    return level, trend, season, sse
+
+
+def fit_holt_winters(values: np.ndarray, start: int) -> Dict[str, Any]:
+    """Ajustar Holt-Winters aditivo eligiendo los suavizados con menor error"""
+    first, second = values[:SEASON], values[SEASON:2 * SEASON]
+    level0 = float(first.mean())
+    trend0 = float(second.mean() - first.mean()) / SEASON
+    season0 = np.zeros(SEASON)
+    season0[(start + np.arange(SEASON)) % SEASON] = first - level0
+
+    best = None
+    for alpha, beta, gamma in itertools.product(SMOOTHING_GRID, repeat=3):
+        level, trend, season, sse = holt_winters_pass(
+            values[SEASON:], start + SEASON, alpha, beta, gamma, level0, trend0, season0
+        )
+        if best is None or sse < best["sse"]:
+            best = {"alpha": alpha, "beta": beta, "gamma": gamma,
+                    "level": level, "trend": trend, "season": season, "sse": sse}
+
+    best.pop("sse")
+    best["method"] = "holt_winters"
+    return best
+
+
+class SpendingForecaster:
+    """Totales mensuales y modelos ajustados por categoría de un entorno"""
+
+    def __init__(self):
+        self.monthly: Dict[str, Dict[int, float]] = {}
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.last_period: Optional[int] = None
+
+    def update(self, df: pd.DataFrame) -> List[str]:
+        """
+        Acumular el gasto de un lote y reajustar las categorías con meses nuevos.
+
+        Se consideran cerrados los meses anteriores al último mes con
+        movimientos. Devuelve las categorías cuyo modelo ha cambiado.
+        """
+        gastos = df[(df["importe"] < 0) & df["fecha"].notna()]
+        if gastos.empty:
+            return []
+
+        periods = gastos["fecha"].dt.year * 12 + gastos["fecha"].dt.month - 1
+        totals = (-gastos["importe"]).groupby([gastos["categoria"], periods]).sum()
+        for (categoria, period), total in totals.items():
+            months = self.monthly.setdefault(categoria, {})
+            months[int(period)] = months.get(int(period), 0) + int(total)
+            # Un mes ya ajustado ha cambiado (p. ej. un extracto antiguo): reajuste completo
+            model = self.models.get(categoria)
+            if model and period <= model["fitted_until"]:
+                del self.models[categoria]
+
+        self.last_period = max(int(periods.max()), self.last_period or 0)
+        return [categoria for categoria in self.monthly if self._refresh(categoria)]
+
+    def _series(self, categoria: str, start: int, end: int) -> np.ndarray:
+        months = self.monthly[categoria]
+        return cents_to_euros(np.array([months.get(p, 0) for p in range(start, end + 1)], dtype=float))
+
+    def _refresh(self, categoria: str) -> bool:
+        """Actualizar el modelo de una categoría si hay meses cerrados nuevos"""
+        closed_until = self.last_period - 1
+        first = min(self.monthly[categoria])
+        model = self.models.get(categoria)
+        if first > closed_until or (model and model["fitted_until"] >= closed_until):
+            return False
+
+        n_months = closed_until - first + 1
+        if model and model["method"] == "holt_winters":
+            # Reajuste incremental: solo se recorren los meses nuevos
+            start = model["fitted_until"] + 1
+            level, trend, season, _ = holt_winters_pass(
+                self._series(categoria, start, closed_until), start,
+                model["alpha"], model["beta"], model["gamma"],
+                model["level"], model["trend"], np.asarray(model["season"])
+            )
+            model.update(level=level, trend=trend, season=season)
+        elif n_months >= 2 * SEASON:
+            model = fit_holt_winters(self._series(categoria, first, closed_until), first)
+        else:
+            # Naive estacional con un año de histórico; media reciente si hay menos
+            history = self._series(categoria, max(first, closed_until - SEASON + 1), closed_until)
+            model = {"method": "seasonal_naive" if n_months >= SEASON else "mean", "history": history}
+
+        model["fitted_until"] = closed_until
+        model["season"] = np.asarray(model.get("season", []), dtype=float)
+        self.models[categoria] = model
+        return True
+
+    def forecast(self, categoria: str, horizon: int) -> List[Dict[str, Any]]:
+        """Evaluar el modelo guardado para los ``horizon`` meses siguientes"""
+        model = self.models.get(categoria)
+        if model is None:
+            return []
+
+        last = model["fitted_until"]
+        steps = np.arange(1, horizon + 1)
+        if model["method"] == "holt_winters":
+            values = model["level"] + steps * model["trend"] + model["season"][(last + steps) % SEASON]
+        elif model["method"] == "seasonal_naive":
+            values = np.asarray(model["history"])[(steps - 1) % SEASON]
+        else:
+            values = np.full(horizon, float(np.mean(model["history"][-3:])))
+
+        return [
+            {"mes": period_label(last + int(step)), "importe": round(max(float(value), 0.0), 2)}
+            for step, value in zip(steps, values)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar totales y modelos para guardarlos en disco"""
+        models = {}
+        for categoria, model in self.models.items():
+            models[categoria] = {
+                key: value.tolist() if isinstance(value, np.ndarray) else value
+                for key, value in model.items()
+            }
+        return {
+            "last_period": self.last_period,
+            "unit": "cents",
+            "monthly": {c: {str(p): t for p, t in months.items()} for c, months in self.monthly.items()},
+            "models": models,
+        }
+
+    def load_dict(self, data: Dict[str, Any]):
+        """Restaurar el estado guardado con ``to_dict``"""
+        self.last_period = data.get("last_period")
+        # Los estados anteriores guardaban los totales en euros
+        escala = 1 if data.get("unit") == "cents" else CENTS_PER_EURO
+        self.monthly = {
+            c: {int(p): int(round(t * escala)) for p, t in months.items()}
+            for c, months in data.get("monthly", {}).items()
+        }
+        self.models = {}
+        for categoria, model in data.get("models", {}).items():
+            model["season"] = np.asarray(model.get("season", []), dtype=float)
+            if "history" in model:
+                model["history"] = np.asarray(model["history"], dtype=float)
+            self.models[categoria] = model
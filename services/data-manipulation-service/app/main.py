@@ -3,10 +3,41 @@ Microservicio de Manipulación de Datos - Análisis de Gastos
 Puerto: 8003
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, status, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any
+from pathlib import Path
 import time
+import json
+import os
+import re
+import sys
+import pandas as pd
+import jwt
+
+# Código compartido entre microservicios (services/common)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from common.health import HealthProbes, http_probe, filesystem_probe
+from common.metrics import setup_metrics
+
+try:
+    from app.movements import prepare_movements, movements_to_dict, movements_from_dict
+    from app.anomalies import AnomalyDetector
+    from app.forecast import SpendingForecaster, period_label
+    from app.recurring import detect_recurring
+    from app.categorization import Categorizer
+    from app.balances import compute_balances
+except ImportError:  # Ejecución directa: python app/main.py
+    from movements import prepare_movements, movements_to_dict, movements_from_dict
+    from anomalies import AnomalyDetector
+    from forecast import SpendingForecaster, period_label
+    from recurring import detect_recurring
+    from categorization import Categorizer
+    from balances import compute_balances
 
 app = FastAPI(
     title="Data Manipulation Service - Análisis de Gastos",
@@ -23,10 +54,316 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas Prometheus en /metrics
+setup_metrics(app, service="data-manipulation")
+
 # Variables globales
 START_TIME = time.time()
+ENVIRONMENTS = ("pre", "pro")
+MOVIMIENTOS: Dict[str, pd.DataFrame] = {env: pd.DataFrame() for env in ENVIRONMENTS}
+DETECTORES: Dict[str, AnomalyDetector] = {env: AnomalyDetector() for env in ENVIRONMENTS}
+PREVISIONES: Dict[str, SpendingForecaster] = {env: SpendingForecaster() for env in ENVIRONMENTS}
+CATEGORIZADOR = Categorizer()
+# Resultados de saldos por entorno; se invalidan con cada ingesta
+SALDOS: Dict[str, Dict[str, Any]] = {}
+# Entornos restaurados de un estado sin movimientos (anterior a guardarlos):
+# su previsión no se puede reconstruir hasta la próxima carga completa
+SIN_HISTORICO: set = set()
+
+# Configuración
+PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
+STATE_FILE = PROJECT_ROOT / "data" / "estado-ms-data-manipulation-service.json"
+RULES_FILE = PROJECT_ROOT / "data" / "reglas-categorias.json"
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret-key-change-in-production")
+JWT_ALGORITHM = "HS256"
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8001")
+DATA_COLLECTION_SERVICE_URL = os.getenv("DATA_COLLECTION_SERVICE_URL", "http://localhost:8002")
+
+# Verificación de dependencias en segundo plano
+HEALTH_PROBES = HealthProbes(
+    {
+        "database": filesystem_probe(STATE_FILE.parent, writable=True),
+        "auth_service": http_probe(f"{AUTH_SERVICE_URL}/api/v1/health"),
+        "data_collection_service": http_probe(f"{DATA_COLLECTION_SERVICE_URL}/api/v1/health")
+    },
+    critical=["database"]
+)
+
+
+# Modelos Pydantic
+class IngestRequest(BaseModel):
+    environment: str = Field(..., pattern="^(pre|pro)$", description="Entorno de datos: pre o pro")
+    records: List[Dict[str, Any]] = Field(default_factory=list, description="Movimientos recién cargados")
+    reset: bool = Field(False, description="Descartar el análisis previo del entorno")
+    amount_unit: str = Field("euros", pattern="^(euros|cents)$", description="Unidad de importe y saldo en los registros")
+
+
+class CategoryRule(BaseModel):
+    categoria: str = Field(..., min_length=1, description="Categoría asignada")
+    keywords: List[str] = Field(default_factory=list, description="Palabras clave (sin distinguir mayúsculas ni acentos)")
+    regex: Optional[str] = Field(None, description="Expresión regular sobre el texto normalizado en mayúsculas")
+
+
+class RulesRequest(BaseModel):
+    rules: List[CategoryRule] = Field(..., description="Reglas en orden de prioridad")
+
+
+class AnalysisResponse(BaseModel):
+    success: bool
+    message: str
+    data: Optional[Dict[str, Any]] = None
+
+
+# Funciones auxiliares
+def movements_file(environment: str) -> Path:
+    """Movimientos ingeridos de un entorno, junto al archivo de estado (una línea por lote)"""
+    return STATE_FILE.with_name(f"{STATE_FILE.stem}-movements-{environment}.jsonl")
+
+
+def append_movements(environment: str, df: pd.DataFrame):
+    """Añadir un lote al archivo de movimientos del entorno sin reescribir los anteriores"""
+    try:
+        STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(movements_file(environment), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(movements_to_dict(df), ensure_ascii=False, default=str) + "\n")
+    except Exception as e:
+        print(f"❌ Error al guardar movimientos de {environment}: {e}")
+
+
+def write_movements(environment: str):
+    """
+    Reescribir el archivo de movimientos del entorno con lo que hay en memoria.
+
+    Solo al descartar el entorno, al recategorizar con reglas nuevas o al
+    migrar un estado que guardaba los movimientos dentro del JSON.
+    """
+    try:
+        STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        ruta = movements_file(environment)
+        temporal = ruta.with_suffix(".tmp")
+        with open(temporal, 'w', encoding='utf-8') as f:
+            if not MOVIMIENTOS[environment].empty:
+                f.write(json.dumps(movements_to_dict(MOVIMIENTOS[environment]), ensure_ascii=False, default=str) + "\n")
+        os.replace(temporal, ruta)
+    except Exception as e:
+        print(f"❌ Error al guardar movimientos de {environment}: {e}")
+
+
+def read_movements(environment: str) -> Optional[pd.DataFrame]:
+    """Movimientos guardados de un entorno (``None`` si no hay archivo)"""
+    ruta = movements_file(environment)
+    if not ruta.exists():
+        return None
+    with open(ruta, 'r', encoding='utf-8') as f:
+        lotes = [movements_from_dict(json.loads(linea)) for linea in f if linea.strip()]
+    return pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame()
+
+
+def save_state():
+    """
+    Guardar el estado de los análisis incrementales en archivo JSON.
+
+    Los movimientos no van aquí: cada lote se añade a su archivo al
+    ingerirlo (``append_movements``), así que guardar no depende del
+    tamaño del histórico.
+    """
+    try:
+        STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        estado = {
+            "anomalies": {env: DETECTORES[env].to_dict() for env in ENVIRONMENTS},
+            "forecast": {env: PREVISIONES[env].to_dict() for env in ENVIRONMENTS},
+            "incomplete": sorted(SIN_HISTORICO)
+        }
+        with open(STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False, default=str)
+        print(f"✅ Estado guardado en {STATE_FILE}")
+    except Exception as e:
+        print(f"❌ Error al guardar estado: {e}")
+
+
+def load_state():
+    """Cargar el estado de los análisis incrementales desde archivo JSON"""
+    try:
+        if STATE_FILE.exists():
+            with open(STATE_FILE, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+            for env, data in estado.get("anomalies", {}).items():
+                if env in DETECTORES:
+                    DETECTORES[env].load_dict(data)
+            for env, data in estado.get("forecast", {}).items():
+                if env in PREVISIONES:
+                    PREVISIONES[env].load_dict(data)
+            # Estados anteriores guardaban los movimientos dentro del JSON
+            movimientos = estado.get("movements") or {}
+            for env in ENVIRONMENTS:
+                guardados = read_movements(env)
+                if guardados is not None:
+                    MOVIMIENTOS[env] = guardados
+                elif env in movimientos:
+                    MOVIMIENTOS[env] = movements_from_dict(movimientos[env])
+                    write_movements(env)
+                elif PREVISIONES[env].monthly:
+                    SIN_HISTORICO.add(env)
+            SIN_HISTORICO.update(env for env in estado.get("incomplete", []) if env in ENVIRONMENTS)
+            if SIN_HISTORICO:
+                print(f"⚠️  Estado sin movimientos en {sorted(SIN_HISTORICO)}: se completará con la próxima carga")
+            print(f"✅ Estado cargado desde {STATE_FILE}")
+        else:
+            print(f"ℹ️  No se encontró archivo de estado, usando estado inicial")
+    except Exception as e:
+        print(f"⚠️  Error al cargar estado: {e}, usando estado inicial")
+
+
+def load_rules():
+    """Cargar las reglas de categorización definidas por el usuario"""
+    global CATEGORIZADOR
+    try:
+        if RULES_FILE.exists():
+            with open(RULES_FILE, 'r', encoding='utf-8') as f:
+                CATEGORIZADOR = Categorizer(json.load(f))
+            print(f"✅ {len(CATEGORIZADOR.rules)} reglas de categorización cargadas")
+    except Exception as e:
+        print(f"⚠️  Error al cargar reglas de categorización: {e}, usando reglas por defecto")
+
 
+def save_rules():
+    """Guardar las reglas de categorización en archivo JSON"""
+    try:
+        RULES_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(RULES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(CATEGORIZADOR.rules, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"❌ Error al guardar reglas de categorización: {e}")
 
+
+def verify_token(authorization: str) -> dict:
+    """Verificar token JWT"""
+    if not authorization:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "message": "Token no proporcionado",
+                "error_code": "MISSING_TOKEN"
+            }
+        )
+
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "message": "Formato de token inválido",
+                "error_code": "INVALID_TOKEN_FORMAT"
+            }
+        )
+
+    try:
+        return jwt.decode(parts[1], JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "message": "Token inválido o expirado",
+                "error_code": "INVALID_TOKEN"
+            }
+        )
+
+
+def reset_environment(environment: str):
+    """Descartar movimientos y estado incremental de un entorno"""
+    MOVIMIENTOS[environment] = pd.DataFrame()
+    DETECTORES[environment] = AnomalyDetector()
+    PREVISIONES[environment] = SpendingForecaster()
+    SALDOS.pop(environment, None)
+    SIN_HISTORICO.discard(environment)
+
+
+def ingest_movements(environment: str, records: List[Dict[str, Any]], amount_unit: str = "euros") -> dict:
+    """Incorporar un lote de movimientos, guardarlo y actualizar los análisis en una pasada"""
+    if not records:
+        return {"environment": environment, "received": 0, "flagged": 0, "refitted_categories": []}
+
+    df = CATEGORIZADOR.apply(prepare_movements(records, amounts_in_cents=amount_unit == "cents"))
+    MOVIMIENTOS[environment] = pd.concat([MOVIMIENTOS[environment], df], ignore_index=True)
+    append_movements(environment, df)
+    SALDOS.pop(environment, None)
+    flagged = DETECTORES[environment].process(df)
+    refitted = PREVISIONES[environment].update(df)
+
+    return {
+        "environment": environment,
+        "received": len(df),
+        "flagged": len(flagged),
+        "refitted_categories": refitted
+    }
+
+
+def get_balances(environment: str) -> Dict[str, Any]:
+    """Obtener los saldos de un entorno, calculándolos solo si hubo ingestas nuevas"""
+    if environment not in SALDOS:
+        SALDOS[environment] = compute_balances(MOVIMIENTOS[environment])
+    return SALDOS[environment]
+
+
+# Eventos de inicio/cierre
+@app.on_event("startup")
+async def startup_event():
+    """Cargar estado al iniciar el servicio"""
+    load_rules()
+    load_state()
+    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    await HEALTH_PROBES.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detener las tareas en segundo plano"""
+    await HEALTH_PROBES.stop()
+
+
+# Manejadores de excepciones
+@app.exception_handler(HTTPException)
+async def http_exception_handler(request: Request, exc: HTTPException):
+    """Manejar HTTPException y devolver formato consistente"""
+    if isinstance(exc.detail, dict) and "success" in exc.detail:
+        return JSONResponse(
+            status_code=exc.status_code,
+            content=exc.detail
+        )
+
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "success": False,
+            "message": str(exc.detail),
+            "error_code": "ERROR"
+        }
+    )
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Manejar errores de validación de Pydantic"""
+    errors = {}
+    for error in exc.errors():
+        field = error["loc"][-1] if error["loc"] else "unknown"
+        errors.setdefault(field, []).append(error["msg"])
+
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={
+            "success": False,
+            "message": "Datos inválidos",
+            "errors": errors,
+            "error_code": "VALIDATION_ERROR"
+        }
+    )
+
+
+# Endpoints
 @app.get("/api/v1/health", tags=["Health"])
 async def health_check():
     """
@@ -35,36 +372,322 @@ async def health_check():
     Verifica:
     - Estado general del servicio
     - Tiempo de actividad
-    - Estado de dependencias (auth_service, data_collection_service)
+    - Estado de dependencias (database, auth_service, data_collection_service)
+    
+    Las dependencias se comprueban en segundo plano; aquí solo se devuelve
+    el último resultado.
     """
     uptime = int(time.time() - START_TIME)
+    estado, checks = HEALTH_PROBES.snapshot()
     
-    # Por ahora, el servicio está en estado "healthy" simplificado
-    # En una implementación real, verificaríamos conexiones a otros servicios
-    
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if estado in ("healthy", "degraded") else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": estado,
+            "service": "data-manipulation-service",
+            "version": "1.0.0",
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "uptime": uptime,
+            "checks": checks
+        }
+    )
+
+
+@app.post("/api/v1/analysis/ingest",
+          response_model=AnalysisResponse,
+          responses={
+              200: {"description": "Movimientos procesados"},
+              400: {"description": "Datos inválidos"},
+              401: {"description": "No autenticado"}
+          },
+          tags=["Análisis"])
+async def ingest(
+    request_body: IngestRequest,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Recibir los movimientos recién cargados por el servicio de recopilación.
+
+    Los análisis incrementales (detección de anomalías y modelos de
+    previsión) se actualizan con el lote recibido, sin volver a procesar
+    el histórico.
+    """
+    verify_token(authorization)
+
+    if request_body.reset:
+        reset_environment(request_body.environment)
+        write_movements(request_body.environment)
+
+    data = ingest_movements(request_body.environment, request_body.records, request_body.amount_unit)
+    save_state()
+
     return {
-        "status": "healthy",
-        "service": "data-manipulation-service",
-        "version": "1.0.0",
-        "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-        "uptime": uptime,
-        "checks": {
-            "database": {
-                "status": "healthy",
-                "response_time_ms": 15
-            },
-            "auth_service": {
-                "status": "healthy",
-                "response_time_ms": 20
-            },
-            "data_collection_service": {
-                "status": "healthy",
-                "response_time_ms": 18
-            }
+        "success": True,
+        "message": "Movimientos procesados exitosamente",
+        "data": data
+    }
+
+
+@app.get("/api/v1/analysis/anomalies",
+         response_model=AnalysisResponse,
+         responses={
+             200: {"description": "Cargos inusuales detectados"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Análisis"])
+async def get_anomalies(
+    environment: str = Query(..., pattern="^(pre|pro)$"),
+    limit: int = Query(100, ge=1, le=5000),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Obtener los cargos marcados como inusuales, del más reciente al más antiguo.
+    """
+    verify_token(authorization)
+
+    detector = DETECTORES[environment]
+    flagged = list(detector.flagged)[-limit:][::-1]
+
+    return {
+        "success": True,
+        "message": "Cargos inusuales obtenidos exitosamente",
+        "data": {
+            "environment": environment,
+            "processed": detector.processed,
+            "total_flagged": len(detector.flagged),
+            "anomalies": flagged
+        }
+    }
+
+
+@app.get("/api/v1/analysis/forecast",
+         response_model=AnalysisResponse,
+         responses={
+             200: {"description": "Previsión de gasto mensual por categoría"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Predicciones"])
+async def get_forecast(
+    environment: str = Query(..., pattern="^(pre|pro)$"),
+    horizon: int = Query(3, ge=1, le=24, description="Meses a prever"),
+    categoria: Optional[str] = Query(None, description="Limitar a una categoría"),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Prever el gasto mensual por categoría.
+
+    Solo evalúa los modelos ya ajustados durante la ingesta; nunca reentrena.
+    """
+    verify_token(authorization)
+
+    forecaster = PREVISIONES[environment]
+    categorias = [categoria] if categoria else sorted(forecaster.models)
+
+    previsiones = []
+    for nombre in categorias:
+        model = forecaster.models.get(nombre)
+        if model is None:
+            continue
+        previsiones.append({
+            "categoria": nombre,
+            "method": model["method"],
+            "fitted_until": period_label(model["fitted_until"]),
+            "predictions": forecaster.forecast(nombre, horizon)
+        })
+
+    return {
+        "success": True,
+        "message": "Previsión obtenida exitosamente",
+        "data": {
+            "environment": environment,
+            "horizon": horizon,
+            "forecasts": previsiones
+        }
+    }
+
+
+@app.get("/api/v1/analysis/recurring",
+         response_model=AnalysisResponse,
+         responses={
+             200: {"description": "Pagos recurrentes detectados"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Análisis"])
+async def get_recurring(
+    environment: str = Query(..., pattern="^(pre|pro)$"),
+    min_occurrences: int = Query(3, ge=2, description="Cargos mínimos para considerar un pago recurrente"),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Detectar pagos recurrentes (suscripciones, recibos) en los cargos ingeridos.
+    """
+    verify_token(authorization)
+
+    movimientos = MOVIMIENTOS[environment]
+    recurrentes = detect_recurring(movimientos, min_occurrences) if not movimientos.empty else []
+
+    return {
+        "success": True,
+        "message": "Pagos recurrentes obtenidos exitosamente",
+        "data": {
+            "environment": environment,
+            "total": len(recurrentes),
+            "recurring": recurrentes
         }
     }
 
 
+@app.get("/api/v1/analysis/categories/rules",
+         response_model=AnalysisResponse,
+         responses={
+             200: {"description": "Reglas de categorización"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Análisis"])
+async def get_category_rules(authorization: Optional[str] = Header(None)):
+    """
+    Obtener las reglas de categorización vigentes, en orden de prioridad.
+    """
+    verify_token(authorization)
+
+    return {
+        "success": True,
+        "message": "Reglas de categorización obtenidas exitosamente",
+        "data": {"rules": CATEGORIZADOR.rules}
+    }
+
+
+@app.put("/api/v1/analysis/categories/rules",
+         response_model=AnalysisResponse,
+         responses={
+             200: {"description": "Reglas actualizadas"},
+             400: {"description": "Reglas inválidas"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Análisis"])
+async def put_category_rules(
+    request_body: RulesRequest,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Reemplazar las reglas de categorización.
+
+    Las reglas se compilan de nuevo y se recategorizan los movimientos ya
+    ingeridos. Los modelos de previsión se recalculan con las nuevas categorías,
+    salvo en los entornos restaurados sin movimientos, que conservan la
+    previsión hasta la próxima carga completa.
+    """
+    global CATEGORIZADOR
+    verify_token(authorization)
+
+    rules = [rule.model_dump(exclude_none=True) for rule in request_body.rules]
+    try:
+        CATEGORIZADOR = Categorizer(rules)
+    except re.error as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "success": False,
+                "message": f"Expresión regular inválida: {e}",
+                "error_code": "INVALID_RULE"
+            }
+        )
+    save_rules()
+
+    for env in ENVIRONMENTS:
+        if not MOVIMIENTOS[env].empty:
+            MOVIMIENTOS[env] = CATEGORIZADOR.apply(MOVIMIENTOS[env])
+            write_movements(env)
+            if env not in SIN_HISTORICO:
+                PREVISIONES[env] = SpendingForecaster()
+                PREVISIONES[env].update(MOVIMIENTOS[env])
+    save_state()
+
+    return {
+        "success": True,
+        "message": "Reglas de categorización actualizadas",
+        "data": {"rules": CATEGORIZADOR.rules}
+    }
+
+
+@app.get("/api/v1/analysis/balance",
+         response_model=AnalysisResponse,
+         responses={
+             200: {"description": "Saldo y coherencia de los extractos de cuenta"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"}
+         },
+         tags=["Análisis"])
+async def get_balance(
+    environment: str = Query(..., pattern="^(pre|pro)$"),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Obtener el saldo de cada cuenta fusionando todos sus extractos, los
+    descuadres entre saldo e importes y los periodos sin cobertura.
+    """
+    verify_token(authorization)
+
+    saldos = {k: v for k, v in get_balances(environment).items() if k not in ("flujo_diario", "flujo_por_cuenta")}
+
+    return {
+        "success": True,
+        "message": "Saldos obtenidos exitosamente",
+        "data": {"environment": environment, **saldos}
+    }
+
+
+@app.get("/api/v1/analysis/cashflow",
+         response_model=AnalysisResponse,
+         responses={
+             200: {"description": "Flujo de caja diario"},
+             400: {"description": "Parámetros inválidos"},
+             401: {"description": "No autenticado"},
+             404: {"description": "Cuenta no encontrada"}
+         },
+         tags=["Análisis"])
+async def get_cashflow(
+    environment: str = Query(..., pattern="^(pre|pro)$"),
+    desde: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Fecha inicial (YYYY-MM-DD)"),
+    hasta: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$", description="Fecha final (YYYY-MM-DD)"),
+    cuenta: Optional[str] = Query(None, description="Cuenta (IBAN o número); todas si se omite"),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Obtener ingresos, gastos y saldo de cierre por día de las cuentas.
+    """
+    verify_token(authorization)
+
+    saldos = get_balances(environment)
+    if cuenta is None:
+        diario = saldos["flujo_diario"]
+    else:
+        diario = saldos["flujo_por_cuenta"].get("".join(cuenta.split()).upper())
+        if diario is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "success": False,
+                    "message": f"Cuenta no encontrada: {cuenta}",
+                    "error_code": "ACCOUNT_NOT_FOUND"
+                }
+            )
+
+    flujo = [
+        dia for dia in diario
+        if (desde is None or dia["fecha"] >= desde) and (hasta is None or dia["fecha"] <= hasta)
+    ]
+
+    return {
+        "success": True,
+        "message": "Flujo de caja obtenido exitosamente",
+        "data": {"environment": environment, "total_days": len(flujo), "cashflow": flujo}
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
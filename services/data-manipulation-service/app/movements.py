@@ -0,0 +1,98 @@
+"""
+Normalización de los movimientos recibidos del servicio de recopilación.
+
+Los registros llegan con los nombres de columna originales de cada banco
+(``Fecha``, ``Fecha y hora``, ``Importe``...). Aquí se convierten a un
+DataFrame con columnas canónicas (``common.columns``) sobre el que
+trabajan los análisis.
+
+``importe`` y ``saldo`` son céntimos enteros (``Int64``): las sumas de los
+análisis son exactas y solo se pasan a euros al responder.
+
+Los movimientos ingeridos se guardan con el estado del servicio
+(``movements_to_dict``) para que saldos, pagos recurrentes y recategorización
+sigan disponibles tras un reinicio.
+"""
+
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from common.columns import canonical_name, coalesce
+from common.dates import parse_dates
+from common.money import parse_cents
+
+SIN_CATEGORIA = "SIN CATEGORÍA"
+
+TEXT_COLUMNS = ["concepto", "establecimiento", "tipo", "operacion", "source_file"]
+
+
+def amount_cents(series: pd.Series, in_cents: bool) -> pd.Series:
+    """Importes a céntimos ``Int64``; ``in_cents`` si ya llegan en céntimos (data-collection)"""
+    if in_cents:
+        return pd.to_numeric(series, errors="coerce").round().astype("Int64")
+    return parse_cents(series)
+
+
+def prepare_movements(records: List[Dict[str, Any]], amounts_in_cents: bool = False) -> pd.DataFrame:
+    """
+    Construir el DataFrame canónico de movimientos.
+
+    Columnas resultantes: fecha, importe (céntimos), concepto,
+    establecimiento, tipo, operacion, source_file, comercio (establecimiento
+    o, si falta, concepto) y categoria. Se conservan el resto de columnas
+    normalizadas (saldo, f_valor...).
+    """
+    df = pd.DataFrame.from_records(records)
+    df.columns = [canonical_name(col) for col in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    fecha = coalesce(df, ["fecha", "fecha_hora"])
+    df["fecha"] = pd.NaT if fecha is None else parse_dates(fecha)
+
+    if "importe" in df.columns:
+        df["importe"] = amount_cents(df["importe"], amounts_in_cents)
+    else:
+        df["importe"] = pd.array([pd.NA] * len(df), dtype="Int64")
+    if "saldo" in df.columns:
+        df["saldo"] = amount_cents(df["saldo"], amounts_in_cents)
+
+    for col in TEXT_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+        df[col] = df[col].fillna("").astype(str).str.strip()
+
+    df["comercio"] = df["establecimiento"].where(df["establecimiento"] != "", df["concepto"])
+    if "categoria" in df.columns:
+        df["categoria"] = df["categoria"].fillna("").astype(str)
+    else:
+        df["categoria"] = df["tipo"]
+    df["categoria"] = df["categoria"].where(df["categoria"] != "", SIN_CATEGORIA)
+
+    return df
+
+
+def movements_to_dict(df: pd.DataFrame) -> Dict[str, Any]:
+    """Serializar los movimientos por columnas: fechas en ISO 8601, céntimos como enteros y ``None`` en lo que falta"""
+    tipos = {}
+    columnas = {}
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            tipos[col] = "datetime"
+            serie = serie.dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+        elif isinstance(serie.dtype, pd.Int64Dtype):
+            tipos[col] = "Int64"
+        columnas[col] = serie.astype(object).where(serie.notna(), None).tolist()
+    return {"types": tipos, "columns": columnas}
+
+
+def movements_from_dict(data: Dict[str, Any]) -> pd.DataFrame:
+    """Restaurar los movimientos guardados con ``movements_to_dict``"""
+    df = pd.DataFrame(data.get("columns", {}))
+    for col, tipo in data.get("types", {}).items():
+        if tipo == "datetime":
+            df[col] = pd.to_datetime(df[col], format="ISO8601")
+        elif tipo == "Int64":
+            df[col] = pd.array(df[col].tolist(), dtype="Int64")
+    return df
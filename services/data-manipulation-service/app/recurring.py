@@ -0,0 +1,115 @@
+"""
+Detección de pagos recurrentes (suscripciones).
+
+El texto del comercio se normaliza (mayúsculas, sin acentos, sin números
+de referencia) y se reduce a una clave hash de 64 bits. Con una única
+ordenación por (clave, fecha) y una única agrupación se obtienen las
+estadísticas de intervalos e importes de cada comercio.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from common.money import cents_to_euros
+
+NANOSECONDS_PER_DAY = 86_400 * 10**9
+
+# Periodicidades reconocidas: (nombre, días, tolerancia en días)
+PERIODS = (
+    ("semanal", 7, 2),
+    ("quincenal", 14, 3),
+    ("mensual", 30.4, 4),
+    ("bimestral", 60.8, 6),
+    ("trimestral", 91.3, 8),
+    ("semestral", 182.6, 12),
+    ("anual", 365.2, 20),
+)
+
+
+def normalize_merchant(text: str) -> str:
+    """Quitar acentos, números de referencia y signos de un texto de comercio"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").upper()
+    text = re.sub(r"[^A-Z ]+", " ", text)
+    return " ".join(text.split())
+
+
+def merchant_keys(texts: pd.Series) -> tuple:
+    """
+    Calcular la clave hash de cada texto.
+
+    La normalización se hace una vez por texto distinto. Devuelve las claves
+    (uint64, una por fila) y un diccionario clave -> texto normalizado.
+    """
+    codes, uniques = pd.factorize(texts.fillna(""), sort=False)
+    normalized = np.array([normalize_merchant(str(u)) for u in uniques], dtype=object)
+    hashes = pd.util.hash_array(normalized) if len(normalized) else np.empty(0, dtype=np.uint64)
+    names = dict(zip(hashes.tolist(), normalized.tolist()))
+    return hashes[codes], names
+
+
+def detect_recurring(df: pd.DataFrame, min_occurrences: int = 3,
+                     max_interval_cv: float = 0.25, max_amount_cv: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Encontrar cargos que se repiten con periodicidad e importe regulares.
+
+    ``max_interval_cv`` y ``max_amount_cv`` son los coeficientes de variación
+    máximos tolerados en los intervalos entre cargos y en los importes.
+    """
+    gastos = df[(df["importe"] < 0) & df["fecha"].notna()]
+    if gastos.empty:
+        return []
+
+    keys, names = merchant_keys(gastos["comercio"])
+    fechas = gastos["fecha"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    importes = -cents_to_euros(gastos["importe"].to_numpy(dtype=float))
+
+    # Única ordenación: por clave y, dentro de cada clave, por fecha
+    order = np.lexsort((fechas, keys))
+    keys, fechas, importes = keys[order], fechas[order], importes[order]
+
+    intervals = np.full(len(keys), np.nan)
+    same_key = keys[1:] == keys[:-1]
+    intervals[1:][same_key] = np.diff(fechas)[same_key] / NANOSECONDS_PER_DAY
+
+    # Única agrupación
+    stats = pd.DataFrame({"key": keys, "fecha": fechas, "importe": importes, "intervalo": intervals}) \
+        .groupby("key", sort=False) \
+        .agg(ocurrencias=("importe", "size"),
+             importe_medio=("importe", "mean"),
+             importe_std=("importe", "std"),
+             intervalo_mediano=("intervalo", "median"),
+             intervalo_std=("intervalo", "std"),
+             primera=("fecha", "min"),
+             ultima=("fecha", "max"))
+
+    stats = stats[stats["ocurrencias"] >= min_occurrences]
+    regular = (stats["intervalo_std"].fillna(0) <= max_interval_cv * stats["intervalo_mediano"]) & \
+              (stats["importe_std"].fillna(0) <= max_amount_cv * stats["importe_medio"])
+    stats = stats[regular & (stats["intervalo_mediano"] > 0)]
+
+    periodicidad = pd.Series(None, index=stats.index, dtype=object)
+    for nombre, dias, tolerancia in PERIODS:
+        coincide = periodicidad.isna() & ((stats["intervalo_mediano"] - dias).abs() <= tolerancia)
+        periodicidad[coincide] = nombre
+    stats = stats.assign(periodicidad=periodicidad).dropna(subset=["periodicidad"])
+
+    proximo = stats["ultima"] + (stats["intervalo_mediano"] * NANOSECONDS_PER_DAY).astype(np.int64)
+    resultado = []
+    for key, row, siguiente in zip(stats.index, stats.itertuples(index=False), proximo):
+        resultado.append({
+            "merchant_key": f"{key:016x}",
+            "comercio": names[key],
+            "periodicidad": row.periodicidad,
+            "ocurrencias": int(row.ocurrencias),
+            "importe_medio": round(float(row.importe_medio), 2),
+            "intervalo_mediano_dias": round(float(row.intervalo_mediano), 1),
+            "primer_cargo": pd.Timestamp(row.primera).date().isoformat(),
+            "ultimo_cargo": pd.Timestamp(row.ultima).date().isoformat(),
+            "proximo_cargo": pd.Timestamp(siguiente).date().isoformat(),
+        })
+
+    return sorted(resultado, key=lambda r: -r["importe_medio"])
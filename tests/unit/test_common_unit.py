@@ -0,0 +1,229 @@
+"""
+Tests unitarios para el código compartido entre microservicios (services/common).
+"""
+
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio services al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "services"))
+
+from common.columns import canonical_name, coalesce, find_column
+from common.health import HealthProbes, filesystem_probe
+from common.metrics import MetricsRegistry, setup_metrics
+from common.money import parse_cents
+
+
+def ok():
+    pass
+
+
+def failing():
+    raise ConnectionError("Connection refused")
+
+
+def slow():
+    time.sleep(0.05)
+
+
+class TestHealthProbes:
+    """Tests para las sondas de salud cacheadas"""
+
+    def test_starting_before_first_round(self):
+        """Test: antes de la primera ronda el servicio está 'starting'"""
+        probes = HealthProbes({"database": ok})
+
+        estado, checks = probes.snapshot()
+
+        assert estado == "starting"
+        assert checks["database"]["status"] == "connecting"
+        assert checks["database"]["response_time_ms"] is None
+
+    def test_all_healthy_measures_latency(self):
+        """Test: con todas las dependencias bien el estado es 'healthy' y se mide la latencia"""
+        probes = HealthProbes({"database": ok, "auth_service": ok})
+        asyncio.run(probes.run_once())
+
+        estado, checks = probes.snapshot()
+
+        assert estado == "healthy"
+        assert isinstance(checks["auth_service"]["response_time_ms"], float)
+
+    def test_non_critical_failure_degrades(self):
+        """Test: el fallo de una dependencia no crítica degrada el servicio"""
+        probes = HealthProbes({"database": ok, "auth_service": failing}, critical=["database"])
+        asyncio.run(probes.run_once())
+
+        estado, checks = probes.snapshot()
+
+        assert estado == "degraded"
+        assert checks["auth_service"]["status"] == "unhealthy"
+        assert "Connection refused" in checks["auth_service"]["error"]
+
+    def test_critical_failure_is_unhealthy(self):
+        """Test: el fallo de una dependencia crítica deja el servicio 'unhealthy'"""
+        probes = HealthProbes({"database": failing}, critical=["database"])
+        asyncio.run(probes.run_once())
+
+        assert probes.snapshot()[0] == "unhealthy"
+
+    def test_slow_and_timed_out_probes(self):
+        """Test: una sonda lenta se degrada y una que excede el timeout falla"""
+        probes = HealthProbes({"lenta": slow}, slow_ms=10)
+        asyncio.run(probes.run_once())
+        assert probes.snapshot()[1]["lenta"]["status"] == "degraded"
+
+        probes = HealthProbes({"lenta": slow}, timeout=0.01)
+        asyncio.run(probes.run_once())
+        assert probes.snapshot()[1]["lenta"]["error"] == "Timeout"
+
+    def test_filesystem_probe(self, tmp_path):
+        """Test: la sonda de filesystem falla si la ruta no existe"""
+        filesystem_probe(tmp_path, writable=True)()
+
+        with pytest.raises(FileNotFoundError):
+            filesystem_probe(tmp_path / "no-existe")()
+
+
+class TestMetrics:
+    """Tests para el registro de métricas en formato Prometheus"""
+
+    def test_counter_and_gauge_render(self):
+        """Test: contadores y gauges se exponen con sus etiquetas"""
+        registry = MetricsRegistry()
+        rows = registry.counter("rows_total", "Filas", ["environment"])
+        size = registry.gauge("snapshot_bytes", "Bytes")
+
+        rows.inc(10, environment="pre")
+        rows.inc(5, environment="pre")
+        size.set(2048)
+        text = registry.render()
+
+        assert "# TYPE rows_total counter" in text
+        assert 'rows_total{environment="pre"} 15' in text
+        assert "snapshot_bytes 2048" in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test: las cubetas del histograma son acumuladas e incluyen +Inf"""
+        registry = MetricsRegistry()
+        hist = registry.histogram("parse_seconds", "Parseo", ["format"], buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.5, 0.7, 3.0):
+            hist.observe(value, format="csv")
+        text = registry.render()
+
+        assert 'parse_seconds_bucket{format="csv",le="0.1"} 1' in text
+        assert 'parse_seconds_bucket{format="csv",le="1"} 3' in text
+        assert 'parse_seconds_bucket{format="csv",le="+Inf"} 4' in text
+        assert 'parse_seconds_count{format="csv"} 4' in text
+        assert 'parse_seconds_sum{format="csv"} 4.25' in text
+
+    def test_register_same_name_returns_existing(self):
+        """Test: registrar dos veces el mismo nombre reutiliza la métrica"""
+        registry = MetricsRegistry()
+
+        assert registry.counter("a_total", "A") is registry.counter("a_total", "A")
+
+    def test_metrics_endpoint_uses_route_template(self):
+        """Test: /metrics expone la latencia etiquetada con la plantilla de la ruta"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        app = FastAPI()
+        setup_metrics(app, service="test-service")
+
+        @app.get("/items/{item_id}")
+        def item(item_id: int):
+            return {"id": item_id}
+
+        client = TestClient(app)
+        client.get("/items/1")
+        client.get("/items/2")
+        text = client.get("/metrics").text
+
+        assert ('http_request_duration_seconds_count{service="test-service",method="GET",'
+                'route="/items/{item_id}",status="200"} 2') in text
+        assert "/items/1" not in text
+
+
+class TestColumns:
+    """Tests para los nombres de columna compartidos entre servicios"""
+
+    def test_canonical_name(self):
+        """Test: debe quitar acentos, mayúsculas y aplicar alias"""
+        assert canonical_name("Fecha y hora") == "fecha_hora"
+        assert canonical_name("Descripción") == "concepto"
+        assert canonical_name("F. Valor") == "f_valor"
+
+    def test_coalesce_original_and_normalized_names(self):
+        """Test: las candidatas se buscan por nombre normalizado, lleven el nombre del banco o el canónico"""
+        import pandas as pd
+        originales = pd.DataFrame({"Fecha": ["01/02/2024", None, ""], "Fecha y hora": [None, "02/02/2024", "03/02/2024"]})
+        normalizados = originales.rename(columns=canonical_name)
+
+        for df in (originales, normalizados):
+            fechas = coalesce(df, ["fecha", "fecha_y_hora", "fecha_hora"])
+            assert fechas.tolist() == ["01/02/2024", "02/02/2024", "03/02/2024"]
+        assert coalesce(originales, ["cuenta"]) is None
+        assert find_column(originales, ["fecha_y_hora"]) == "Fecha y hora"
+
+
+class TestMoney:
+    """Tests para los importes en céntimos"""
+
+    def test_parse_cents_spanish_text(self):
+        """Test: coma decimal, punto de miles, signo y símbolo del euro sin pasar por float"""
+        import pandas as pd
+        valores = pd.Series(["-45,80", "1.234,56", "12.5", "45,80-", " 1 234,5 €", "1.234.567", None, "abc", "12-5"])
+
+        result = parse_cents(valores)
+
+        assert str(result.dtype) == "Int64"
+        assert result.iloc[:6].tolist() == [-4580, 123456, 1250, -4580, 123450, 123456700]
+        assert result.iloc[6:].isna().all()
+
+    def test_parse_cents_rounds_third_decimal(self):
+        """Test: el tercer decimal redondea el céntimo, lejos de cero"""
+        import pandas as pd
+
+        result = parse_cents(pd.Series(["0,125", "-0,125", "0,1249", "2.675"]))
+
+        assert result.tolist() == [13, -13, 12, 268]
+
+    def test_parse_cents_with_known_decimal(self):
+        """Test: con el separador decimal del archivo el otro carácter es de miles"""
+        import pandas as pd
+
+        coma = parse_cents(pd.Series(["1.000", "-1.234", "2,5", "1.000,5,0"]), decimal=",")
+        punto = parse_cents(pd.Series(["1,000", "1,234.56", "2.675", "1.2,3"]), decimal=".")
+
+        assert coma.iloc[:3].tolist() == [100000, -123400, 250]
+        assert pd.isna(coma.iloc[3])
+        assert punto.iloc[:3].tolist() == [100000, 123456, 268]
+        assert pd.isna(punto.iloc[3])
+
+    def test_parse_cents_known_decimal_leaves_numbers_alone(self):
+        """Test: el separador del archivo no se aplica a los valores que ya son números"""
+        import pandas as pd
+
+        result = parse_cents(pd.Series([12.5, -3.25, 7, "-1,5", None, True], dtype=object), decimal=",")
+
+        assert result.iloc[:4].tolist() == [1250, -325, 700, -150]
+        assert result.iloc[4:].isna().all()
+
+    def test_parse_cents_numeric_and_mixed_columns(self):
+        """Test: columnas numéricas y objetos mezclados (lotes JSON)"""
+        import pandas as pd
+
+        numericos = parse_cents(pd.Series([-45.3, 0.1 + 0.2, float("nan")]))
+        mezclados = parse_cents(pd.Series([-45.8, "-60,10", 7, "1e-02"], dtype=object))
+
+        assert numericos.iloc[:2].tolist() == [-4530, 30]
+        assert pd.isna(numericos.iloc[2])
+        assert mezclados.tolist() == [-4580, -6010, 700, 1]
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -33,6 +33,59 @@ from app.main import (
 )
 
 
+@pytest.fixture(autouse=True)
+def excel_cache(tmp_path, monkeypatch):
+    """Caché de Excel en el directorio temporal para no escribir en data/cache del repositorio"""
+    import app.main as main_module
+    from common.excel_reader import ExcelCache
+    cache = ExcelCache(tmp_path / "excel-cache")
+    monkeypatch.setattr(main_module, "EXCEL_CACHE", cache)
+    return cache
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Servicio con carpeta ``datos-pre``, estado e índices propios en el directorio temporal"""
+    import copy
+    import app.main as main_module
+    from app.dedup import DedupIndex
+    from app.search import SearchIndex
+    (tmp_path / "datos-pre").mkdir()
+    monkeypatch.setattr(main_module, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(main_module, "STATE_FILE", tmp_path / "estado.json")
+    monkeypatch.setattr(main_module, "ESTADO", copy.deepcopy(main_module.ESTADO))
+    monkeypatch.setattr(main_module, "DEDUP", {"pre": DedupIndex(), "pro": DedupIndex()})
+    monkeypatch.setattr(main_module, "SEARCH", {"pre": SearchIndex(), "pro": SearchIndex()})
+    return main_module
+
+
+@pytest.fixture
+def listings_client(service, tmp_path):
+    """Cliente con un extracto de cuenta y uno de tarjetas cargados en PRE"""
+    from datetime import timedelta, timezone
+    from fastapi.testclient import TestClient
+    carpeta = tmp_path / "datos-pre"
+    pd.DataFrame({
+        "Fecha": ["03/01/2024", "01/01/2024", "02/01/2024", "31/01/2024"],
+        "F. Valor": ["03/01/2024", "01/01/2024", "02/01/2024", "01/02/2024"],
+        "Concepto": ["RECIBO LUZ", "NOMINA", "Bizum a Pedro", "RECIBO AGUA"],
+        "Importe": [-45.3, 1500.0, -20.0, -30.0],
+        "Saldo": [1434.7, 1500.0, 1480.0, 1404.7],
+    }).to_excel(carpeta / "excelFile_1.xlsx", index=False)
+    (carpeta / "MOV1.csv").write_text(
+        "Operación;Fecha y hora;Tipo;Importe;Comisión;Establecimiento\n"
+        "100001;02/01/2024 18:00:00;COMPRA;-120,50;0,00;MERCADONA\n"
+        "100000;02/01/2024 09:30:00;COMPRA;-3,20;0,00;BAR LA PLAZA\n"
+        "100002;05/01/2024 12:00:00;DEVOLUCION;15,00;0,00;ZARA\n")
+    service.ESTADO["data"]["pro"] = []
+    service.load_data_from_environment("pre", clear_existing=True)
+    token = jwt.encode(
+        {"sub": "user", "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+        JWT_SECRET_KEY, algorithm=JWT_ALGORITHM
+    )
+    return TestClient(service.app), {"Authorization": f"Bearer {token}"}, service
+
+
 class TestSaveState:
     """Tests para la función save_state()"""
     
@@ -387,6 +440,76 @@ class TestParseDateColumn:
         # Verificar que retorna el DataFrame original
         assert 'fecha' in result.columns
 
+    
+    def test_parse_date_column_mixed_formats(self):
+        """Test: una columna con DD/MM/YYYY y fechas ISO no debe perder valores"""
+        # Preparar
+        df = pd.DataFrame({
+            'fecha': ['15/01/2024 10:30:00', '2024-02-01', '20/02/2024 08:00:00', None]
+        })
+        
+        # Ejecutar
+        result = parse_date_column(df, 'fecha')
+        
+        # Verificar
+        assert result['fecha'].tolist()[:3] == [
+            pd.Timestamp('2024-01-15 10:30:00'), pd.Timestamp('2024-02-01'), pd.Timestamp('2024-02-20 08:00:00')
+        ]
+        assert pd.isna(result['fecha'].iloc[3])
+
+
+class TestDateFormats:
+    """Tests para la detección de formato de fechas (common/dates.py)"""
+    
+    def test_rank_formats_prefers_day_first(self):
+        """Test: ante fechas ambiguas gana DD/MM/YYYY"""
+        import numpy as np
+        from common.dates import rank_formats
+        
+        ranking = rank_formats(np.array(['01/02/2024', '03/04/2024'], dtype=object))
+        
+        assert ranking[0] == ('%d/%m/%Y', 2)
+    
+    def test_parse_with_format_validates_calendar(self):
+        """Test: fechas fuera de calendario o con otro formato quedan sin convertir"""
+        import numpy as np
+        from common.dates import parse_with_format
+        
+        values = np.array(['29/02/2024', '29/02/2023', '31/04/2024', '15/13/2024', '2024-02-01', None], dtype=object)
+        
+        fechas, ok = parse_with_format(values, '%d/%m/%Y')
+        
+        assert ok.tolist() == [True, False, False, False, False, False]
+        assert fechas[0] == np.datetime64('2024-02-29')
+    
+    def test_iso_with_fractional_seconds_keeps_day_and_month(self):
+        """Test: las fechas ISO con fracción de segundo no intercambian día y mes"""
+        from common.dates import parse_dates
+        
+        result = parse_dates(pd.Series(['2024-01-07T10:00:00.123', '2024-01-08T10:00:00.123456', None]))
+        
+        assert result.iloc[0] == pd.Timestamp('2024-01-07 10:00:00.123')
+        assert result.iloc[1] == pd.Timestamp('2024-01-08 10:00:00.123456')
+        assert pd.isna(result.iloc[2])
+    
+    def test_formats_are_cached_per_layout(self):
+        """Test: el formato detectado se reutiliza y se redetecta si el archivo cambia"""
+        from common import dates
+        
+        # Preparar
+        layout = (('fecha', 'importe'), 'fecha')
+        dates.FORMAT_CACHE.pop(layout, None)
+        
+        # Ejecutar
+        dates.parse_dates(pd.Series(['15/01/2024', '16/01/2024']), layout)
+        cacheado = list(dates.FORMAT_CACHE[layout])
+        result = dates.parse_dates(pd.Series(['2024-03-01', '2024-03-02']), layout)
+        
+        # Verificar
+        assert cacheado[0] == '%d/%m/%Y'
+        assert dates.FORMAT_CACHE[layout][0] == '%Y-%m-%d'
+        assert result.iloc[0] == pd.Timestamp('2024-03-01')
+
 
 class TestLoadFile:
     """Tests para la función load_file()"""
@@ -471,6 +594,783 @@ class TestLoadFile:
             load_file(txt_file)
         
         assert "Formato no soportado" in str(exc_info.value)
+    
+    def test_load_file_records_stage_timings(self, tmp_path):
+        """Test: load_file debe rellenar los tiempos de cada etapa"""
+        # Preparar
+        csv_file = tmp_path / "test.csv"
+        csv_file.write_text("fecha;amount\n2024-01-01;100\n")
+        timings = {}
+        
+        # Ejecutar
+        load_file(csv_file, timings)
+        
+        # Verificar
+        assert set(timings) == {"sniff", "read", "parse_dates"}
+        assert all(ms >= 0 for ms in timings.values())
+
+
+class TestCsvReader:
+    """Tests para el lector de CSV proyectado en memoria"""
+
+    def test_read_csv_matches_pandas(self, tmp_path):
+        """Test: debe dar el mismo DataFrame que pd.read_csv sobre la ruta"""
+        from common.csv_reader import read_csv
+
+        # Preparar
+        csv_file = tmp_path / "MOV1.csv"
+        csv_file.write_text("Operación;Fecha y hora;Importe\nCompra;01/01/2024 10:00:00;-12,5\n"
+                            "Devolución;02/01/2024 11:30:00;3,2\n", encoding="utf-8")
+
+        # Ejecutar
+        df, detectado = read_csv(csv_file)
+
+        # Verificar
+        assert detectado == {"encoding": "utf-8", "delimiter": ";", "quotechar": '"', "decimal": ","}
+        pd.testing.assert_frame_equal(df, pd.read_csv(csv_file, delimiter=";", decimal=","))
+
+    def test_read_csv_detects_cp1252(self, tmp_path):
+        """Test: un CSV exportado en Windows no debe perder los acentos"""
+        from common.csv_reader import read_csv
+
+        # Preparar
+        csv_file = tmp_path / "MOV2.csv"
+        csv_file.write_bytes("Concepto;Importe\nCAFÉ;-1,5\nPEÑA;2\n".encode("cp1252"))
+
+        # Ejecutar
+        df, detectado = read_csv(csv_file)
+
+        # Verificar
+        assert detectado["encoding"] == "cp1252"
+        assert df["Concepto"].tolist() == ["CAFÉ", "PEÑA"]
+
+    def test_read_csv_detects_encoding_beyond_ascii_header(self, tmp_path):
+        """Test: el primer acento tras muchas filas ASCII decide la codificación"""
+        from common.csv_reader import SNIFF_BYTES, read_csv
+
+        # Preparar
+        filas = "x;1\n" * (SNIFF_BYTES // 4 + 10)
+        csv_file = tmp_path / "MOV4.csv"
+        csv_file.write_bytes(("a;b\n" + filas + "PEÑA;2\n").encode("latin-1"))
+
+        # Ejecutar
+        df, detectado = read_csv(csv_file)
+
+        # Verificar
+        assert detectado["encoding"] == "cp1252"
+        assert df["a"].iloc[-1] == "PEÑA"
+
+    def test_read_csv_sniffs_quotes_and_decimal(self, tmp_path):
+        """Test: comillas simples con el delimitador dentro y coma decimal"""
+        from common.csv_reader import read_csv
+
+        # Preparar
+        csv_file = tmp_path / "MOV5.csv"
+        csv_file.write_text("Concepto;Importe\n'BAR; CAFÉ';-3,40\n'NOMINA';1500,00\n", encoding="utf-8")
+
+        # Ejecutar
+        df, detectado = read_csv(csv_file)
+
+        # Verificar
+        assert detectado["quotechar"] == "'"
+        assert detectado["decimal"] == ","
+        assert df["Concepto"].tolist() == ["BAR; CAFÉ", "NOMINA"]
+        assert df["Importe"].tolist() == [-3.4, 1500.0]
+
+    def test_read_csv_comma_delimiter_keeps_quoted_comma_decimals(self, tmp_path):
+        """Test: con coma como delimitador los importes con coma decimal quedan como texto"""
+        from common.csv_reader import read_csv
+        from common.money import parse_cents
+
+        # Preparar
+        csv_file = tmp_path / "MOV6.csv"
+        csv_file.write_text('Concepto,Importe\nBAR,"-3,40"\nNOMINA,"1.500,00"\n', encoding="utf-8")
+
+        # Ejecutar
+        df, detectado = read_csv(csv_file)
+
+        # Verificar
+        assert detectado["delimiter"] == ","
+        assert detectado["decimal"] == ","
+        assert parse_cents(df["Importe"], detectado["decimal"]).tolist() == [-340, 150000]
+
+    def test_read_csv_strips_utf8_bom(self, tmp_path):
+        """Test: el BOM no debe quedar pegado al nombre de la primera columna"""
+        from common.csv_reader import read_csv
+
+        # Preparar
+        csv_file = tmp_path / "MOV3.csv"
+        csv_file.write_bytes(b"\xef\xbb\xbffecha,amount\n2024-01-01,100\n")
+
+        # Ejecutar
+        df, _ = read_csv(csv_file)
+
+        # Verificar
+        assert list(df.columns) == ["fecha", "amount"]
+
+
+class TestExcelReader:
+    """Tests para el lector de Excel y su caché por contenido"""
+    
+    def write_workbook(self, path):
+        df = pd.DataFrame({
+            "Fecha": pd.to_datetime(["2024-01-02", "2024-01-01"]),
+            "Concepto": ["NOMINA", "RECIBO LUZ"],
+            "Importe": [1500.0, -45.3],
+            "Saldo": [1954.7, 454.7],
+        })
+        df.to_excel(path, index=False)
+    
+    def test_read_excel_matches_pandas(self, tmp_path):
+        """Test: el lector en streaming debe dar el mismo DataFrame que pd.read_excel"""
+        from common.excel_reader import read_excel
+        
+        # Preparar
+        xlsx_file = tmp_path / "excelFile_1.xlsx"
+        self.write_workbook(xlsx_file)
+        
+        # Ejecutar
+        df, engine = read_excel(xlsx_file)
+        
+        # Verificar
+        pd.testing.assert_frame_equal(df, pd.read_excel(xlsx_file))
+        assert engine in ("calamine", "openpyxl")
+    
+    def test_cache_hit_by_content(self, tmp_path):
+        """Test: un libro con el mismo contenido no se vuelve a parsear"""
+        from common.excel_reader import ExcelCache, read_excel_cached
+        
+        # Preparar
+        cache = ExcelCache(tmp_path / "cache")
+        original = tmp_path / "excelFile_1.xlsx"
+        self.write_workbook(original)
+        copia = tmp_path / "excelFile_copia.xlsx"
+        copia.write_bytes(original.read_bytes())
+        
+        # Ejecutar
+        df1, origen1 = read_excel_cached(original, cache)
+        df2, origen2 = read_excel_cached(copia, cache)
+        
+        # Verificar
+        assert origen1 != "cache"
+        assert origen2 == "cache"
+        pd.testing.assert_frame_equal(df1, df2)
+    
+    def test_cache_evicts_least_recently_used(self, tmp_path):
+        """Test: la caché no supera max_entries"""
+        from common.excel_reader import ExcelCache
+        
+        # Preparar
+        cache = ExcelCache(tmp_path / "cache", max_entries=2)
+        
+        # Ejecutar
+        for key in ("a", "b", "c"):
+            cache.put(key, pd.DataFrame({"x": [1]}))
+        
+        # Verificar
+        assert cache.get("c") is not None
+        assert len(list((tmp_path / "cache").iterdir())) == 2
+    
+    def test_concurrent_writers_of_the_same_book(self, tmp_path, monkeypatch):
+        """Test: dos escritores del mismo libro no comparten el archivo temporal"""
+        import common.excel_reader as excel_reader
+        
+        # Preparar: otro escritor guarda el mismo libro justo antes del primer os.replace
+        cache = excel_reader.ExcelCache(tmp_path / "cache")
+        replace = os.replace
+        intercalado = []
+        
+        def replace_intercalado(origen, destino):
+            if not intercalado:
+                intercalado.append(origen)
+                cache.put("libro", pd.DataFrame({"x": [2]}))
+            replace(origen, destino)
+        
+        monkeypatch.setattr(excel_reader.os, "replace", replace_intercalado)
+        
+        # Ejecutar
+        cache.put("libro", pd.DataFrame({"x": [1]}))
+        
+        # Verificar: el último en sustituir la entrada gana y no quedan temporales
+        assert cache.get("libro")["x"].tolist() == [1]
+        assert not [p for p in (tmp_path / "cache").iterdir() if p.name.endswith(".tmp")]
+    
+    def test_header_offset_and_multiple_sheets(self, tmp_path):
+        """Test: debe saltar los títulos y concatenar las hojas con la misma cabecera"""
+        from openpyxl import Workbook
+        from common.excel_reader import read_excel
+        
+        # Preparar
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "2023"
+        ws.append(["Extracto de movimientos"])
+        ws.append(["Cuenta:", "ES12 3456 7890"])
+        ws.append([])
+        ws.append(["Fecha", "Concepto", "Importe", "Saldo"])
+        ws.append([datetime(2023, 12, 30), "NOMINA", 1500, 2000])
+        ws.append([datetime(2023, 12, 31), "RECIBO LUZ", -45.3, 1954.7])
+        ws = wb.create_sheet("2024")
+        ws.append(["Fecha", "Concepto", "Importe", "Saldo"])
+        ws.append([datetime(2024, 1, 2), "BIZUM", -20, 1934.7])
+        ws = wb.create_sheet("Información")
+        ws.append(["Documento generado por el banco"])
+        xlsx_file = tmp_path / "excelFile_banner.xlsx"
+        wb.save(xlsx_file)
+        
+        # Ejecutar
+        df, _ = read_excel(xlsx_file)
+        
+        # Verificar
+        assert list(df.columns) == ["Fecha", "Concepto", "Importe", "Saldo"]
+        assert len(df) == 3
+        assert df["Concepto"].tolist() == ["NOMINA", "RECIBO LUZ", "BIZUM"]
+        assert df["Fecha"].iloc[2] == pd.Timestamp("2024-01-02")
+    
+    def test_find_header_row(self):
+        """Test: la cabecera es la primera fila ancha y solo de texto"""
+        from common.excel_reader import find_header_row
+        
+        rows = [
+            ["Banco Ejemplo", None, None],
+            ["Periodo:", "01/01/2024 - 31/01/2024", None],
+            ["Fecha", "Concepto", "Importe"],
+            [datetime(2024, 1, 1), "NOMINA", 1500],
+        ]
+        
+        assert find_header_row(rows) == 2
+        assert find_header_row([[1, 2], [3, 4]]) is None
+    
+    def test_xlrd_column_conversion(self):
+        """Test: las celdas de xlrd se convierten a fechas, enteros y nulos sin bucles"""
+        import xlrd
+        from common.excel_reader import _xlrd_column
+        
+        # Preparar: 45292 es el 01/01/2024 en el sistema de fechas de 1900
+        values = [45292.0, 12.0, 3.5, "", "texto", 1]
+        types = [xlrd.XL_CELL_DATE, xlrd.XL_CELL_NUMBER, xlrd.XL_CELL_NUMBER,
+                 xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_TEXT, xlrd.XL_CELL_BOOLEAN]
+        
+        # Ejecutar
+        column = _xlrd_column(values, types, datemode=0)
+        
+        # Verificar
+        assert column[0] == pd.Timestamp("2024-01-01")
+        assert column[1] == 12 and isinstance(column[1], int)
+        assert column[2] == 3.5
+        assert column[3] is None
+        assert column[4] == "texto"
+        assert column[5] is True
+
+
+class TestLoadProfile:
+    """Tests para el desglose de tiempos de load_data_from_environment()"""
+    
+    def test_profile_returns_stages_and_peak_memory(self, tmp_path, monkeypatch):
+        """Test: con profile=True la respuesta incluye tiempos por archivo y pico de memoria"""
+        # Preparar
+        import copy
+        import app.main as main_module
+        (tmp_path / "datos-pre").mkdir()
+        (tmp_path / "datos-pre" / "MOV1.csv").write_text("fecha;importe\n2024-01-01;-10\n")
+        monkeypatch.setattr(main_module, "PROJECT_ROOT", tmp_path)
+        monkeypatch.setattr(main_module, "STATE_FILE", tmp_path / "estado.json")
+        monkeypatch.setattr(main_module, "ESTADO", copy.deepcopy(main_module.ESTADO))
+        
+        # Ejecutar
+        data = main_module.load_data_from_environment("pre", clear_existing=True, profile=True)
+        
+        # Verificar
+        perfil = data["profile"]
+        assert perfil["files"][0]["filename"] == "MOV1.csv"
+        assert {"sniff", "read", "parse_dates", "to_records", "total"} <= set(perfil["files"][0]["stages_ms"])
+        assert perfil["save_state_ms"] >= 0
+        assert perfil["peak_memory_bytes"] > 0
+    
+    def test_profile_is_omitted_by_default(self, tmp_path, monkeypatch):
+        """Test: sin profile la respuesta no cambia"""
+        # Preparar
+        import copy
+        import app.main as main_module
+        (tmp_path / "datos-pre").mkdir()
+        (tmp_path / "datos-pre" / "MOV1.csv").write_text("fecha;importe\n2024-01-01;-10\n")
+        monkeypatch.setattr(main_module, "PROJECT_ROOT", tmp_path)
+        monkeypatch.setattr(main_module, "STATE_FILE", tmp_path / "estado.json")
+        monkeypatch.setattr(main_module, "ESTADO", copy.deepcopy(main_module.ESTADO))
+        
+        # Ejecutar
+        data = main_module.load_data_from_environment("pre", clear_existing=True)
+        
+        # Verificar
+        assert "profile" not in data
+
+
+class TestDedup:
+    """Tests para el descarte de movimientos repetidos entre extractos solapados"""
+    
+    def test_overlapping_exports_are_loaded_once(self, service, tmp_path):
+        """Test: los días comunes a dos extractos se cuentan una vez"""
+        # Preparar
+        carpeta = tmp_path / "datos-pre"
+        (carpeta / "excelFile_1.csv").write_text(
+            "Fecha;Concepto;Importe;Saldo\n02/01/2024;RECIBO LUZ;-45,30;954,70\n"
+            "01/01/2024;NOMINA;1500,00;1000,00\n")
+        (carpeta / "excelFile_2.csv").write_text(
+            "Fecha;Concepto;Importe;Saldo\n03/01/2024;BIZUM;-4,70;950,00\n"
+            "02/01/2024;recibo  luz ;-45,3;954,7\n")
+        
+        # Ejecutar
+        data = service.load_data_from_environment("pre", clear_existing=True)
+        
+        # Verificar
+        assert data["duplicates_removed"] == 1
+        assert data["total_records"] == 3
+        assert len(service.ESTADO["data"]["pre"]) == 3
+        assert sorted(f["duplicates"] for f in data["files"]) == [0, 1]
+    
+    def test_repeated_movements_in_one_file_are_kept(self, service, tmp_path):
+        """Test: dos cargos idénticos del mismo archivo son dos movimientos"""
+        # Preparar
+        carpeta = tmp_path / "datos-pre"
+        (carpeta / "MOV1.csv").write_text(
+            "Fecha y hora;Importe;Establecimiento\n01/01/2024 10:00:00;-1,5;BAR\n01/01/2024 10:00:00;-1,5;BAR\n")
+        (carpeta / "MOV2.csv").write_text(
+            "Fecha y hora;Importe;Establecimiento\n01/01/2024 10:00:00;-1,5;BAR\n01/01/2024 10:00:00;-1,5;BAR\n"
+            "01/01/2024 10:00:00;-1,5;BAR\n")
+        
+        # Ejecutar
+        data = service.load_data_from_environment("pre", clear_existing=True)
+        
+        # Verificar: el segundo archivo solo añade la tercera aparición
+        assert data["total_records"] == 3
+        assert data["duplicates_removed"] == 2
+    
+    def test_index_survives_restart(self, service, tmp_path):
+        """Test: el índice guardado con el estado se recupera, o se reconstruye si falta"""
+        # Preparar
+        (tmp_path / "datos-pre" / "MOV1.csv").write_text("fecha;importe\n2024-01-01;-10\n2024-01-02;-20\n")
+        service.load_data_from_environment("pre", clear_existing=True)
+        claves = dict(service.DEDUP["pre"].counts)
+        
+        # Ejecutar
+        service.DEDUP["pre"].clear()
+        service.load_state()
+        recuperadas = dict(service.DEDUP["pre"].counts)
+        service.dedup_file().unlink()
+        service.load_state()
+        reconstruidas = dict(service.DEDUP["pre"].counts)
+        
+        # Verificar
+        assert len(claves) == 2
+        assert recuperadas == claves
+        assert reconstruidas == claves
+        data = service.load_data_from_environment("pre")
+        assert data["duplicates_removed"] == 2
+        assert len(service.ESTADO["data"]["pre"]) == 2
+
+
+
+class TestInterning:
+    """Tests para los valores de texto compartidos y su codificación en el estado"""
+    
+    def test_text_values_are_shared_across_files(self, service, tmp_path):
+        """Test: un mismo establecimiento es un único objeto en todos los registros"""
+        carpeta = tmp_path / "datos-pre"
+        for nombre, dia in (("MOV1.csv", "01"), ("MOV2.csv", "02")):
+            (carpeta / nombre).write_text(
+                f"Fecha y hora;Importe;Establecimiento\n{dia}/01/2024 10:00:00;-1,5;MERCADONA\n")
+        
+        # Ejecutar
+        service.load_data_from_environment("pre", clear_existing=True)
+        cargados = service.ESTADO["data"]["pre"]
+        service.load_state()
+        restaurados = service.ESTADO["data"]["pre"]
+        
+        # Verificar: también tras restaurar el estado de disco
+        for primero, segundo in (cargados, restaurados):
+            assert primero["Establecimiento"] == "MERCADONA"
+            assert primero["Establecimiento"] is segundo["Establecimiento"]
+    
+    def test_snapshot_keeps_dictionary_encoding(self, service):
+        """Test: el estado guarda índices y diccionarios, y se restaura igual"""
+        registros = [
+            {"Operación": "C", "Tipo": "COMPRA", "Importe": -1.0, "source_file": "MOV1.csv"},
+            {"Operación": 100001, "Tipo": None, "Importe": -2.0, "source_file": "MOV1.csv"},
+            {"Operación": "C", "Tipo": "COMPRA", "Importe": -3.0, "source_file": "MOV2.csv"},
+        ]
+        service.ESTADO["data"]["pre"] = [dict(r) for r in registros]
+        
+        # Ejecutar
+        service.save_state()
+        with open(service.STATE_FILE, encoding="utf-8") as f:
+            guardado = json.load(f)
+        service.load_state()
+        
+        # Verificar
+        assert guardado["dictionaries"]["pre"]["Tipo"] == ["COMPRA", None]
+        assert guardado["dictionaries"]["pre"]["Operación"] == ["C", 100001]
+        assert [r["Tipo"] for r in guardado["data"]["pre"]] == [0, 1, 0]
+        assert service.ESTADO["data"]["pre"] == registros
+        assert "dictionaries" not in service.ESTADO
+
+
+class TestAmounts:
+    """Tests para los importes en céntimos del almacén"""
+    
+    def test_store_keeps_cents_and_listings_answer_in_euros(self, listings_client):
+        """Test: el almacén guarda céntimos y los filtros de importe son exactos"""
+        client, headers, main_module = listings_client
+        
+        # Ejecutar
+        response = client.get("/api/v1/data/account?environment=pre&min_importe=-45.3&max_importe=-30",
+                              headers=headers)
+        
+        # Verificar
+        luz = next(r for r in main_module.ESTADO["data"]["pre"] if r.get("Concepto") == "RECIBO LUZ")
+        assert (luz["Importe"], luz["Saldo"]) == (-4530, 143470)
+        registros = response.json()["data"]["records"]
+        assert [(r["concepto"], r["importe"]) for r in registros] == [("RECIBO LUZ", -45.3), ("RECIBO AGUA", -30.0)]
+    
+    def test_state_in_euros_is_converted(self, service):
+        """Test: un estado guardado antes de los céntimos se convierte al cargarlo"""
+        estado = json.loads(json.dumps(service.ESTADO))
+        estado["data"]["pre"] = [{"Fecha": "2024-01-01", "Importe": -45.3, "Saldo": "1.234,56"},
+                                 {"Fecha": "2024-01-02", "Importe": None}]
+        service.STATE_FILE.write_text(json.dumps(estado), encoding="utf-8")
+        
+        # Ejecutar
+        service.load_state()
+        service.save_state()
+        service.load_state()
+        
+        # Verificar: la segunda carga ya no vuelve a convertir
+        assert service.ESTADO["data"]["pre"] == [
+            {"Fecha": "2024-01-01", "Importe": -4530, "Saldo": 123456},
+            {"Fecha": "2024-01-02", "Importe": None}]
+
+class TestListings:
+    """Tests para los listados de cuenta y tarjetas con filtros"""
+    
+    def test_account_listing_sorted_with_spec_fields(self, listings_client):
+        """Test: cuenta devuelve solo los extractos no CSV, por fecha y con fechas ISO"""
+        client, headers, _ = listings_client
+        
+        # Ejecutar
+        response = client.get("/api/v1/data/account?environment=pre&page_size=3", headers=headers)
+        
+        # Verificar
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["pagination"] == {"current_page": 1, "page_size": 3, "total_records": 4,
+                                      "total_pages": 2, "has_next": True, "has_previous": False}
+        assert [r["fecha"] for r in data["records"]] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+        assert data["records"][0] == {"fecha": "2024-01-01", "f_valor": "2024-01-01", "concepto": "NOMINA",
+                                      "importe": 1500.0, "saldo": 1500.0, "source_file": "excelFile_1.xlsx"}
+    
+    def test_card_listing_filters(self, listings_client):
+        """Test: rango de fechas, importes y texto se combinan en el servidor"""
+        client, headers, _ = listings_client
+        
+        # Ejecutar
+        dia = client.get("/api/v1/data/cards?environment=pre&from=2024-01-02&to=2024-01-02", headers=headers)
+        cargos = client.get("/api/v1/data/cards?environment=pre&max_importe=-100", headers=headers)
+        texto = client.get("/api/v1/data/cards?environment=pre&text=plaza&source_file=MOV1.csv", headers=headers)
+        
+        # Verificar
+        registros = dia.json()["data"]["records"]
+        assert [r["fecha_hora"] for r in registros] == ["2024-01-02 09:30:00", "2024-01-02 18:00:00"]
+        assert registros[0]["operacion"] == "100000"
+        assert [r["establecimiento"] for r in cargos.json()["data"]["records"]] == ["MERCADONA"]
+        assert [r["establecimiento"] for r in texto.json()["data"]["records"]] == ["BAR LA PLAZA"]
+    
+    def test_listing_sees_new_data(self, listings_client):
+        """Test: la vista ordenada se rehace tras una ingesta"""
+        client, headers, main_module = listings_client
+        client.get("/api/v1/data/account?environment=pre", headers=headers)
+        
+        # Ejecutar
+        main_module.ESTADO["data"]["pre"].append({
+            "Fecha": "2023-12-31T00:00:00.000", "Concepto": "APERTURA", "Importe": 0.0,
+            "Saldo": 0.0, "source_file": "extracto.pdf"})
+        response = client.get("/api/v1/data/account?environment=pre&to=2023-12-31", headers=headers)
+        
+        # Verificar
+        assert [r["concepto"] for r in response.json()["data"]["records"]] == ["APERTURA"]
+    
+    def test_listing_errors(self, listings_client):
+        """Test: errores de parámetros con el formato de los casos de uso"""
+        client, headers, _ = listings_client
+        
+        # Ejecutar y verificar
+        casos = {
+            "/api/v1/data/account": "MISSING_PARAMETER",
+            "/api/v1/data/account?environment=qa": "INVALID_ENVIRONMENT",
+            "/api/v1/data/account?environment=pre&page_size=3000": "INVALID_PAGE_SIZE",
+            "/api/v1/data/account?environment=pre&page=999": "INVALID_PAGE",
+            "/api/v1/data/cards?environment=pre&from=ayer": "INVALID_PARAMETER",
+        }
+        for ruta, codigo in casos.items():
+            response = client.get(ruta, headers=headers)
+            assert response.status_code == 400
+            assert response.json()["success"] is False
+            assert response.json()["error"]["code"] == codigo
+        assert client.get("/api/v1/data/account?environment=pre").status_code == 401
+        vacio = client.get("/api/v1/data/cards?environment=pro", headers=headers).json()
+        assert vacio["message"] == "No hay datos disponibles en el entorno especificado"
+        assert vacio["data"]["pagination"]["total_pages"] == 0
+
+
+
+class TestSearch:
+    """Tests para la búsqueda de texto en cuenta y tarjetas"""
+    
+    def test_search_ignores_case_and_accents(self, listings_client):
+        """Test: coincide por subcadena en concepto y establecimiento, ordenado por fecha"""
+        client, headers, _ = listings_client
+        
+        # Ejecutar
+        recibos = client.get("/api/v1/data/search?environment=pre&q=recibo", headers=headers)
+        plaza = client.get("/api/v1/data/search?environment=pre&q=pláza", headers=headers)
+        corta = client.get("/api/v1/data/search?environment=pre&q=ZA", headers=headers)
+        
+        # Verificar
+        assert recibos.status_code == 200
+        data = recibos.json()["data"]
+        assert [r["concepto"] for r in data["records"]] == ["RECIBO LUZ", "RECIBO AGUA"]
+        assert data["pagination"]["total_records"] == 2
+        assert {r["kind"] for r in data["records"]} == {"account"}
+        assert plaza.json()["data"]["records"][0] == {
+            "kind": "cards", "operacion": "100000", "fecha_hora": "2024-01-02 09:30:00", "tipo": "COMPRA",
+            "importe": -3.2, "comision": 0.0, "establecimiento": "BAR LA PLAZA", "source_file": "MOV1.csv"}
+        assert [r["establecimiento"] for r in corta.json()["data"]["records"]] == ["BAR LA PLAZA", "ZARA"]
+    
+    def test_search_follows_new_and_replaced_data(self, listings_client, monkeypatch):
+        """Test: el índice crece con la ingesta y se rehace si se sustituyen los registros"""
+        client, headers, main_module = listings_client
+        client.get("/api/v1/data/search?environment=pre&q=luz", headers=headers)
+        monkeypatch.setattr(main_module, "publish_to_analysis", lambda *args, **kwargs: None)
+        lote = {
+            "file": {"filename": "extracto.pdf", "format": "pdf", "records": 1, "size_bytes": 10},
+            "records": [{"Fecha": "2023-12-31T00:00:00.000", "Concepto": "Recibo Gas", "Importe": -9.0}]
+        }
+        
+        # Ejecutar
+        client.post("/api/v1/data/ingest/pre", json=lote, headers=headers)
+        indice = main_module.SEARCH["pre"]
+        incremental = indice.in_sync(main_module.ESTADO["data"]["pre"])
+        tras_ingesta = client.get("/api/v1/data/search?environment=pre&q=recibo", headers=headers)
+        main_module.ESTADO["data"]["pre"] = [r for r in main_module.ESTADO["data"]["pre"]
+                                             if r["source_file"] != "extracto.pdf"]
+        tras_cambio = client.get("/api/v1/data/search?environment=pre&q=recibo", headers=headers)
+        
+        # Verificar
+        assert [r["concepto"] for r in tras_ingesta.json()["data"]["records"]] == [
+            "Recibo Gas", "RECIBO LUZ", "RECIBO AGUA"]
+        assert incremental is True
+        assert [r["concepto"] for r in tras_cambio.json()["data"]["records"]] == ["RECIBO LUZ", "RECIBO AGUA"]
+    
+    def test_search_pagination_and_errors(self, listings_client):
+        """Test: paginación como los listados y errores de parámetros"""
+        client, headers, _ = listings_client
+        
+        # Ejecutar
+        pagina = client.get("/api/v1/data/search?environment=pre&q=r&page=2&page_size=2", headers=headers)
+        sin_q = client.get("/api/v1/data/search?environment=pre&q=%20", headers=headers)
+        nada = client.get("/api/v1/data/search?environment=pre&q=inexistente", headers=headers)
+        
+        # Verificar
+        assert pagina.json()["data"]["pagination"]["current_page"] == 2
+        assert pagina.json()["data"]["pagination"]["has_previous"] is True
+        assert len(pagina.json()["data"]["records"]) == 2
+        assert sin_q.status_code == 400
+        assert sin_q.json()["error"]["code"] == "MISSING_PARAMETER"
+        assert nada.json()["data"]["pagination"]["total_records"] == 0
+        assert client.get("/api/v1/data/search?environment=pre&q=luz").status_code == 401
+    
+    def test_search_query_empty_after_normalizing(self, listings_client):
+        """Test: una consulta que queda vacía al normalizarla se rechaza en lugar de devolverlo todo"""
+        client, headers, main_module = listings_client
+        
+        # Ejecutar
+        simbolo = client.get("/api/v1/data/search?environment=pre&q=€", headers=headers)
+        no_ascii = client.get("/api/v1/data/search?environment=pre&q=日本", headers=headers)
+        
+        # Verificar
+        for respuesta in (simbolo, no_ascii):
+            assert respuesta.status_code == 400
+            assert respuesta.json()["error"]["code"] == "MISSING_PARAMETER"
+        assert len(main_module.SEARCH["pre"].search("€")) == 0
+
+class TestIngestBatch:
+    """Tests para la incorporación de archivos enviados por data-extraction-service"""
+    
+    def client(self, tmp_path, monkeypatch):
+        import copy
+        from datetime import timedelta, timezone
+        from fastapi.testclient import TestClient
+        import app.main as main_module
+        from app.dedup import DedupIndex
+        monkeypatch.setattr(main_module, "STATE_FILE", tmp_path / "estado.json")
+        estado = copy.deepcopy(main_module.ESTADO)
+        estado["data"] = {"pre": [], "pro": []}
+        for entorno in estado["environments"].values():
+            entorno.update(files=[], total_records=0, total_files=0)
+        monkeypatch.setattr(main_module, "ESTADO", estado)
+        monkeypatch.setattr(main_module, "DEDUP", {"pre": DedupIndex(), "pro": DedupIndex()})
+        monkeypatch.setattr(main_module, "STAGING", {"pre": {}, "pro": {}})
+        monkeypatch.setattr(main_module, "publish_to_analysis", lambda *args, **kwargs: None)
+        token = jwt.encode(
+            {"sub": "data-extraction-service", "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+            JWT_SECRET_KEY, algorithm=JWT_ALGORITHM
+        )
+        return TestClient(main_module.app), {"Authorization": f"Bearer {token}"}, main_module
+    
+    def batch(self, filename, importes, **extra):
+        return {
+            "file": {"filename": filename, "format": "csv", "records": len(importes), "size_bytes": 10},
+            "records": [{"fecha": "2024-01-01T00:00:00.000", "importe": i} for i in importes],
+            **extra
+        }
+    
+    def test_ingest_appends_new_file(self, tmp_path, monkeypatch):
+        """Test: un archivo nuevo se añade al entorno sin recargar la carpeta"""
+        client, headers, main_module = self.client(tmp_path, monkeypatch)
+        
+        # Ejecutar
+        response = client.post("/api/v1/data/ingest/pre", json=self.batch("MOV1.csv", [-10, -20]), headers=headers)
+        
+        # Verificar
+        assert response.status_code == 200
+        assert response.json()["data"]["replaced"] is False
+        entorno = main_module.ESTADO["environments"]["pre"]
+        assert entorno["loaded"] is True
+        assert entorno["total_records"] == 2
+        assert [f["filename"] for f in entorno["files"]] == ["MOV1.csv"]
+        assert all(r["source_file"] == "MOV1.csv" for r in main_module.ESTADO["data"]["pre"])
+        assert (tmp_path / "estado.json").exists()
+    
+    def test_ingest_replaces_rewritten_file_in_batches(self, tmp_path, monkeypatch):
+        """Test: un archivo reescrito sustituye sus registros anteriores"""
+        client, headers, main_module = self.client(tmp_path, monkeypatch)
+        client.post("/api/v1/data/ingest/pre", json=self.batch("MOV1.csv", [-10, -20]), headers=headers)
+        client.post("/api/v1/data/ingest/pre", json=self.batch("MOV2.csv", [-5]), headers=headers)
+        
+        # Ejecutar: la nueva versión llega en dos lotes
+        primero = self.batch("MOV1.csv", [-1], last=False)
+        segundo = self.batch("MOV1.csv", [-2], first=False)
+        segundo["file"]["records"] = 2
+        client.post("/api/v1/data/ingest/pre", json=primero, headers=headers)
+        response = client.post("/api/v1/data/ingest/pre", json=segundo, headers=headers)
+        
+        # Verificar
+        assert response.json()["data"]["replaced"] is True
+        # El almacén guarda los importes en céntimos
+        importes = sorted(r["importe"] for r in main_module.ESTADO["data"]["pre"])
+        assert importes == [-500, -200, -100]
+        assert main_module.ESTADO["environments"]["pre"]["total_files"] == 2
+    
+    def test_ingest_drops_movements_already_loaded(self, tmp_path, monkeypatch):
+        """Test: un archivo solapado con otro solo añade los movimientos que faltaban"""
+        client, headers, main_module = self.client(tmp_path, monkeypatch)
+        client.post("/api/v1/data/ingest/pre", json=self.batch("MOV1.csv", [-10, -20]), headers=headers)
+        
+        # Ejecutar: el solape llega repartido en dos lotes
+        primero = self.batch("MOV2.csv", [-20], last=False)
+        segundo = self.batch("MOV2.csv", [-10, -30], first=False)
+        client.post("/api/v1/data/ingest/pre", json=primero, headers=headers)
+        response = client.post("/api/v1/data/ingest/pre", json=segundo, headers=headers)
+        
+        # Verificar: el último lote informa de los totales del archivo
+        assert response.json()["data"]["duplicates"] == 2
+        assert response.json()["data"]["added"] == 1
+        importes = sorted(r["importe"] for r in main_module.ESTADO["data"]["pre"])
+        assert importes == [-3000, -2000, -1000]
+        assert main_module.ESTADO["environments"]["pre"]["files"][-1]["duplicates"] == 2
+    
+    def test_failed_reupload_keeps_loaded_file(self, tmp_path, monkeypatch):
+        """Test: los lotes de un archivo que no llega a su último lote no tocan los datos cargados"""
+        client, headers, main_module = self.client(tmp_path, monkeypatch)
+        client.post("/api/v1/data/ingest/pre", json=self.batch("MOV1.csv", [-10, -20]), headers=headers)
+        
+        # Ejecutar: la nueva versión envía un lote y la subida se aborta
+        lote = client.post("/api/v1/data/ingest/pre",
+                           json=self.batch("MOV1.csv", [-1], last=False, upload_id="subida-1"), headers=headers)
+        durante = sorted(r["importe"] for r in main_module.ESTADO["data"]["pre"])
+        abortado = client.delete("/api/v1/data/ingest/pre?upload_id=subida-1", headers=headers)
+        
+        # Verificar
+        assert lote.json()["data"]["staged"] == 1
+        assert durante == [-2000, -1000]
+        assert abortado.status_code == 200
+        assert abortado.json()["data"]["discarded"] == 1
+        assert main_module.STAGING["pre"] == {}
+        assert sorted(r["importe"] for r in main_module.ESTADO["data"]["pre"]) == [-2000, -1000]
+        assert client.delete("/api/v1/data/ingest/qa?upload_id=subida-1", headers=headers).status_code == 404
+    
+    def test_batch_without_staged_batches_is_rejected(self, tmp_path, monkeypatch):
+        """Test: un lote intermedio sin lotes anteriores (reinicio, lotes descartados) no sustituye el archivo"""
+        client, headers, main_module = self.client(tmp_path, monkeypatch)
+        client.post("/api/v1/data/ingest/pre", json=self.batch("MOV1.csv", [-10, -20]), headers=headers)
+        
+        # Ejecutar: el primer lote se perdió y llega el último
+        response = client.post("/api/v1/data/ingest/pre",
+                               json=self.batch("MOV1.csv", [-1], first=False, upload_id="subida-1"), headers=headers)
+        
+        # Verificar
+        assert response.status_code == 409
+        assert response.json()["error_code"] == "MISSING_BATCHES"
+        assert main_module.STAGING["pre"] == {}
+        assert sorted(r["importe"] for r in main_module.ESTADO["data"]["pre"]) == [-2000, -1000]
+    
+    def test_uploads_of_the_same_file_are_staged_apart(self, tmp_path, monkeypatch):
+        """Test: dos envíos simultáneos del mismo archivo no mezclan sus lotes"""
+        client, headers, main_module = self.client(tmp_path, monkeypatch)
+        
+        # Ejecutar: los lotes de las dos subidas llegan intercalados
+        for lote in (self.batch("MOV1.csv", [-1], last=False, upload_id="a"),
+                     self.batch("MOV1.csv", [-5], last=False, upload_id="b"),
+                     self.batch("MOV1.csv", [-2], first=False, upload_id="a")):
+            client.post("/api/v1/data/ingest/pre", json=lote, headers=headers)
+        tras_a = sorted(r["importe"] for r in main_module.ESTADO["data"]["pre"])
+        client.post("/api/v1/data/ingest/pre", json=self.batch("MOV1.csv", [-6], first=False, upload_id="b"),
+                    headers=headers)
+        
+        # Verificar: cada subida sustituye el archivo solo con sus propios lotes
+        assert tras_a == [-200, -100]
+        assert sorted(r["importe"] for r in main_module.ESTADO["data"]["pre"]) == [-600, -500]
+        assert main_module.STAGING["pre"] == {}
+    
+    def test_ingest_float_amounts_ignore_file_decimal(self, tmp_path, monkeypatch):
+        """Test: los importes que pandas ya leyó como números no usan el separador del archivo"""
+        client, headers, main_module = self.client(tmp_path, monkeypatch)
+        lote = {
+            "file": {"filename": "MOV1.csv", "format": "csv", "records": 3, "size_bytes": 10, "decimal": ","},
+            "records": [
+                {"Fecha y hora": "2024-01-02T10:00:00.000", "Importe": -12.5, "Establecimiento": "BAR"},
+                {"Fecha y hora": "2024-01-03T10:00:00.000", "Importe": 3, "Establecimiento": "ZARA"},
+                {"Fecha y hora": "2024-01-04T10:00:00.000", "Importe": "1.000,5", "Establecimiento": "PC"},
+            ]
+        }
+
+        # Ejecutar
+        response = client.post("/api/v1/data/ingest/pre", json=lote, headers=headers)
+        tarjetas = client.get("/api/v1/data/cards?environment=pre", headers=headers)
+
+        # Verificar
+        assert response.status_code == 200
+        assert [r["Importe"] for r in main_module.ESTADO["data"]["pre"]] == [-1250, 300, 100050]
+        assert [r["importe"] for r in tarjetas.json()["data"]["records"]] == [-12.5, 3.0, 1000.5]
+
+    def test_ingest_rejects_unknown_environment(self, tmp_path, monkeypatch):
+        """Test: solo se aceptan los entornos pre y pro"""
+        client, headers, _ = self.client(tmp_path, monkeypatch)
+        
+        # Ejecutar
+        response = client.post("/api/v1/data/ingest/qa", json=self.batch("MOV1.csv", [-10]), headers=headers)
+        
+        # Verificar
+        assert response.status_code == 404
+        assert response.json()["error_code"] == "INVALID_ENVIRONMENT"
 
 
 class TestIntegration:
@@ -0,0 +1,594 @@
+"""
+Tests unitarios para el microservicio de extracción de datos.
+
+Prueban el vigilante de carpetas, la cola de parseo, la lectura de
+extractos en PDF, OFX, QIF y CAMT.053 y la lectura de subidas en streaming
+(multipart y CSV por lotes) de forma aislada, importándolos directamente desde el
+directorio del servicio.
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+# Agregar el directorio del servicio al path
+service_path = Path(__file__).parent.parent.parent / "services" / "data-extraction-service" / "app"
+sys.path.insert(0, str(service_path))
+sys.path.insert(0, str(service_path.parent.parent))
+
+from watcher import FileWatcher
+from jobs import JobQueue, DONE, FAILED, CANCELLED
+from pdf_statements import PageReader, parse_lines, read_pdf_statement
+import bank_formats
+from bank_formats import iter_camt053, read_camt053, read_ofx, read_qif
+from csv_stream import CsvBatcher
+from multipart_stream import MultipartParser, MultipartError, parse_boundary, part_info, HEADERS, DATA, PART_END
+from common.loader import load_file
+import pandas as pd
+
+
+def run_watcher(tmp_path, acciones, debounce=0.2, espera=0.6):
+    """Arrancar un vigilante por sondeo, ejecutar ``acciones`` y devolver los archivos procesados"""
+    procesados = []
+
+    async def callback(env, path):
+        procesados.append((env, path.name))
+
+    async def escenario():
+        watcher = FileWatcher(
+            {"pre": tmp_path / "datos-pre", "pro": tmp_path / "datos-pro"},
+            callback, debounce=debounce, poll_interval=0.05, use_watchdog=False
+        )
+        await watcher.start()
+        try:
+            for accion in acciones:
+                accion()
+                await asyncio.sleep(0.1)
+            await asyncio.sleep(espera)
+        finally:
+            await watcher.stop()
+
+    asyncio.run(escenario())
+    return procesados
+
+
+class TestFileWatcher:
+    """Tests para FileWatcher"""
+
+    def test_new_file_is_processed_once_after_burst(self, tmp_path):
+        """Test: una ráfaga de escrituras produce un único procesamiento"""
+        # Preparar
+        (tmp_path / "datos-pre").mkdir()
+        destino = tmp_path / "datos-pre" / "MOV1.csv"
+        escrituras = [lambda i=i: destino.write_text("fecha;importe\n" + "2024-01-01;-1\n" * (i + 1))
+                      for i in range(3)]
+
+        # Ejecutar
+        procesados = run_watcher(tmp_path, escrituras)
+
+        # Verificar
+        assert procesados == [("pre", "MOV1.csv")]
+
+    def test_existing_files_are_skipped_until_modified(self, tmp_path):
+        """Test: los archivos previos al arranque solo se procesan si cambian"""
+        # Preparar
+        (tmp_path / "datos-pro").mkdir()
+        existente = tmp_path / "datos-pro" / "MOV1.csv"
+        existente.write_text("fecha;importe\n2024-01-01;-1\n")
+        otro = tmp_path / "datos-pro" / "MOV2.csv"
+        otro.write_text("fecha;importe\n2024-01-01;-1\n")
+
+        # Ejecutar
+        procesados = run_watcher(tmp_path, [lambda: existente.write_text("fecha;importe\n2024-01-02;-2\n")])
+
+        # Verificar
+        assert procesados == [("pro", "MOV1.csv")]
+
+    def test_ignores_other_extensions_and_folders(self, tmp_path):
+        """Test: solo se vigilan extractos en datos-pre y datos-pro"""
+        # Preparar
+        (tmp_path / "datos-pre").mkdir()
+        (tmp_path / "otros").mkdir()
+
+        # Ejecutar
+        procesados = run_watcher(tmp_path, [
+            lambda: (tmp_path / "datos-pre" / "notas.txt").write_text("hola"),
+            lambda: (tmp_path / "datos-pre" / ".MOV1.csv.part").write_text("fecha\n"),
+            lambda: (tmp_path / "otros" / "MOV1.csv").write_text("fecha\n"),
+        ])
+
+        # Verificar
+        assert procesados == []
+
+
+def parse_target(environment, path, job_id):
+    """Trabajo de prueba: se comporta según el nombre del archivo"""
+    if path.name == "grande.csv":
+        return len(bytearray(1024 * 1024 * 1024))
+    if path.name == "lento.csv":
+        time.sleep(30)
+    return path.name
+
+
+def run_queue(queue, escenario):
+    async def principal():
+        await queue.start()
+        try:
+            await escenario()
+        finally:
+            await queue.stop()
+
+    asyncio.run(principal())
+
+
+async def wait_for(condicion, timeout=10.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "tiempo de espera agotado"
+        await asyncio.sleep(0.02)
+
+
+class TestJobQueue:
+    """Tests para JobQueue"""
+
+    def make_file(self, tmp_path, name, size):
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        return path
+
+    def test_priority_pro_first_then_smallest(self, tmp_path):
+        """Test: PRO antes que PRE y, dentro de cada entorno, los pequeños primero"""
+        # Preparar
+        queue = JobQueue(parse_target, workers=1)
+        queue.submit("pre", self.make_file(tmp_path, "historico.csv", 5000))
+        queue.submit("pre", self.make_file(tmp_path, "diario.csv", 10))
+        queue.submit("pro", self.make_file(tmp_path, "pro_grande.csv", 8000))
+        queue.submit("pro", self.make_file(tmp_path, "pro_diario.csv", 20))
+
+        # Verificar el orden previsto
+        assert [j.path.name for j in queue.queued()] == [
+            "pro_diario.csv", "pro_grande.csv", "diario.csv", "historico.csv"
+        ]
+
+        # Ejecutar
+        async def escenario():
+            await wait_for(lambda: len(queue.finished) == 4)
+
+        run_queue(queue, escenario)
+
+        # Verificar
+        assert [j.path.name for j in queue.finished] == [
+            "pro_diario.csv", "pro_grande.csv", "diario.csv", "historico.csv"
+        ]
+        assert all(j.status == DONE and j.result == j.path.name for j in queue.finished)
+        assert all(j.to_dict()["run_ms"] >= 0 for j in queue.finished)
+
+    def test_memory_limit_fails_only_that_job(self, tmp_path):
+        """Test: un trabajo que supera el límite de memoria falla sin afectar al resto"""
+        # Preparar
+        queue = JobQueue(parse_target, workers=1, memory_limit_bytes=768 * 1024 * 1024)
+        grande = queue.submit("pre", self.make_file(tmp_path, "grande.csv", 1))
+        normal = queue.submit("pre", self.make_file(tmp_path, "normal.csv", 2))
+
+        # Ejecutar
+        async def escenario():
+            await wait_for(lambda: len(queue.finished) == 2)
+
+        run_queue(queue, escenario)
+
+        # Verificar
+        assert grande.status == FAILED
+        assert "MemoryError" in grande.error
+        assert normal.status == DONE
+
+    def test_cancel_running_and_queued_jobs(self, tmp_path):
+        """Test: se puede cancelar un trabajo en curso y uno en cola"""
+        # Preparar
+        queue = JobQueue(parse_target, workers=1)
+        lento = queue.submit("pro", self.make_file(tmp_path, "lento.csv", 1))
+        en_cola = queue.submit("pre", self.make_file(tmp_path, "normal.csv", 1))
+
+        # Ejecutar
+        async def escenario():
+            await wait_for(lambda: lento.process is not None)
+            queue.cancel(en_cola.id)
+            queue.cancel(lento.id)
+            await wait_for(lambda: lento.finished_at is not None)
+
+        inicio = time.monotonic()
+        run_queue(queue, escenario)
+
+        # Verificar
+        assert lento.status == CANCELLED
+        assert en_cola.status == CANCELLED and en_cola.started_at is None
+        assert time.monotonic() - inicio < 10
+
+    def test_on_failure_only_for_started_jobs_that_do_not_finish(self, tmp_path):
+        """Test: se deshace lo enviado por los trabajos cancelados en curso o fallidos, no por el resto"""
+        # Preparar
+        deshechos = []
+
+        async def on_failure(job):
+            deshechos.append(job.path.name)
+
+        queue = JobQueue(parse_target, workers=1, memory_limit_bytes=768 * 1024 * 1024, on_failure=on_failure)
+        lento = queue.submit("pro", self.make_file(tmp_path, "lento.csv", 1))
+        queue.submit("pre", self.make_file(tmp_path, "grande.csv", 1))
+        queue.submit("pre", self.make_file(tmp_path, "normal.csv", 2))
+        en_cola = queue.submit("pre", self.make_file(tmp_path, "otro.csv", 3))
+
+        # Ejecutar
+        async def escenario():
+            await wait_for(lambda: lento.process is not None)
+            queue.cancel(en_cola.id)
+            queue.cancel(lento.id)
+            await wait_for(lambda: len(queue.finished) == 4)
+
+        run_queue(queue, escenario)
+
+        # Verificar
+        assert deshechos == ["lento.csv", "grande.csv"]
+
+    def test_submit_same_file_twice_reuses_job(self, tmp_path):
+        """Test: un archivo que ya está en cola no se encola dos veces"""
+        queue = JobQueue(parse_target)
+        path = self.make_file(tmp_path, "MOV1.csv", 1)
+
+        assert queue.submit("pre", path) is queue.submit("pre", path)
+        assert len(queue.queued()) == 1
+
+
+def write_pdf(path, contents):
+    """
+    PDF mínimo con una página por flujo de ``contents``.
+
+    El objeto 3 es la fuente Helvetica. Lleva tabla ``xref``, que pypdf
+    necesita.
+    """
+    n = len(contents)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n)).encode()
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % n,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, contenido in enumerate(contents):
+        datos = zlib.compress(contenido)
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 3 0 R >> >>"
+                       b" /Contents %d 0 R >>" % (5 + 2 * i))
+        objetos.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(datos) + datos + b"\nendstream")
+    cuerpo = b"%PDF-1.4\n"
+    posiciones = []
+    for i, objeto in enumerate(objetos):
+        posiciones.append(len(cuerpo))
+        cuerpo += b"%d 0 obj\n" % (i + 1) + objeto + b"\nendobj\n"
+    xref = b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    xref += b"".join(b"%010d 00000 n \n" % pos for pos in posiciones)
+    trailer = b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, len(cuerpo))
+    path.write_bytes(cuerpo + xref + trailer)
+    return path
+
+
+def movement_page(rows, y=700):
+    """Contenido de página con un movimiento por línea y un campo por fragmento"""
+    partes = [b"BT /F1 10 Tf 50 780 Td (Extracto de cuenta) Tj ET"]
+    for fila in rows:
+        for x, valor in zip((50, 120, 190, 400, 480), fila):
+            partes.append(b"BT /F1 8 Tf %d %d Td (%s) Tj ET" % (x, y, valor.encode("cp1252")))
+        y -= 12
+    return b"\n".join(partes)
+
+
+class TestPdfStatements:
+    """Tests para la extracción de movimientos de extractos en PDF"""
+
+    def test_parse_lines_keeps_only_movements(self):
+        """Test: líneas con fecha e importe y saldo; cabeceras y totales fuera"""
+        # Preparar
+        lineas = [
+            "Fecha F. Valor Concepto Importe Saldo",
+            "02/01/2024 03/01/2024 RECIBO LUZ IBERDROLA -1.045,30 12.954,70",
+            "05/01/2024 NOMINA EMPRESA 2.100,00 € 15.054,70 €",
+            "Saldo final 15.054,70",
+        ]
+
+        # Ejecutar
+        movimientos = parse_lines(lineas)
+
+        # Verificar
+        assert movimientos == [
+            ("02/01/2024", "03/01/2024", "RECIBO LUZ IBERDROLA", -1045.30, 12954.70),
+            ("05/01/2024", "05/01/2024", "NOMINA EMPRESA", 2100.00, 15054.70),
+        ]
+
+    def test_page_lines_keep_column_layout(self, tmp_path):
+        """Test: fragmentos escritos en desorden salen en una línea, ordenados por x"""
+        # Preparar: el saldo se escribe antes que la fecha y el concepto va en un TJ
+        contenido = (b"BT /F1 8 Tf 1 0 0 1 480 700 Tm (1.000,00) Tj ET\n"
+                     b"BT /F1 8 Tf 1 0 0 1 50 700 Tm (02/01/2024) Tj ET\n"
+                     b"BT /F1 8 Tf 1 0 0 1 190 700 Tm [(BIZUM) -300 (ENVIADO \\(ANA\\))] TJ ET\n"
+                     b"BT /F1 8 Tf 1 0 0 1 400 700 Tm <2D31352C3030> Tj ET")
+        pdf = write_pdf(tmp_path / "extracto.pdf", [contenido])
+
+        # Ejecutar
+        lector = PageReader(pdf)
+        try:
+            lineas = lector.lines(0)
+        finally:
+            lector.close()
+
+        # Verificar
+        assert parse_lines(lineas) == [("02/01/2024", "02/01/2024", "BIZUM ENVIADO (ANA)", -15.0, 1000.0)]
+
+    def test_encrypted_statement_with_empty_password(self, tmp_path):
+        """Test: los extractos cifrados con contraseña de usuario vacía se leen"""
+        from pypdf import PdfReader, PdfWriter
+
+        # Preparar
+        pdf = write_pdf(tmp_path / "extracto.pdf", [movement_page([
+            ("02/01/2024", "02/01/2024", "RECIBO AGUA", "-20,00", "980,00"),
+        ])])
+        escritor = PdfWriter(clone_from=PdfReader(pdf))
+        escritor.encrypt(user_password="", owner_password="banco", algorithm="RC4-128")
+        cifrado = tmp_path / "cifrado.pdf"
+        with open(cifrado, "wb") as f:
+            escritor.write(f)
+
+        # Ejecutar
+        df = read_pdf_statement(cifrado, workers=1)
+
+        # Verificar
+        assert PdfReader(cifrado).is_encrypted
+        assert df["Concepto"].tolist() == ["RECIBO AGUA"]
+        assert df["Saldo"].tolist() == [980.0]
+
+    def test_parallel_read_keeps_page_order(self, tmp_path):
+        """Test: con varios procesos los movimientos salen en orden de página"""
+        # Preparar: 6 páginas de 3 movimientos, cada una con su día
+        paginas = [movement_page([(f"{d:02d}/01/2024", f"{d:02d}/01/2024", f"PAGO {d}-{i}", "-1,00",
+                                   f"{100 - 3 * d - i},00") for i in range(3)]) for d in range(1, 7)]
+        pdf = write_pdf(tmp_path / "extracto.pdf", paginas)
+
+        # Ejecutar
+        secuencial = read_pdf_statement(pdf, workers=1)
+        paralelo = read_pdf_statement(pdf, workers=2, pages_per_task=1)
+
+        # Verificar
+        assert list(secuencial.columns) == ["Fecha", "F. Valor", "Concepto", "Importe", "Saldo"]
+        assert len(secuencial) == 18
+        assert secuencial["Concepto"].tolist()[:4] == ["PAGO 1-0", "PAGO 1-1", "PAGO 1-2", "PAGO 2-0"]
+        assert paralelo.equals(secuencial)
+
+    def test_load_file_with_pdf_reader(self, tmp_path):
+        """Test: load_file usa el lector de PDF y detecta el rango de fechas"""
+        # Preparar
+        pdf = write_pdf(tmp_path / "extracto.pdf", [movement_page([
+            ("02/01/2024", "02/01/2024", "RECIBO AGUA", "-20,00", "980,00"),
+            ("15/02/2024", "16/02/2024", "NOMINA", "1.500,00", "2.480,00"),
+        ])])
+
+        # Ejecutar
+        df, file_info = load_file(pdf, readers={".pdf": lambda p: read_pdf_statement(p, workers=1)})
+
+        # Verificar
+        assert file_info["format"] == "pdf"
+        assert file_info["records"] == 2
+        assert (file_info["fecha_inicio"], file_info["fecha_fin"]) == ("2024-01-02", "2024-02-15")
+        assert df["Importe"].tolist() == [-20.0, 1500.0]
+
+
+CAMT_NS = "urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"
+
+
+def camt_entry(importe, indicador, fecha, concepto):
+    return (f"<Ntry><Amt Ccy=\"EUR\">{importe}</Amt><CdtDbtInd>{indicador}</CdtDbtInd>"
+            f"<BookgDt><Dt>{fecha}</Dt></BookgDt><ValDt><Dt>{fecha}</Dt></ValDt>"
+            f"<NtryDtls><TxDtls><RmtInf><Ustrd>{concepto}</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>")
+
+
+def write_camt(path, entries, apertura="1000.00"):
+    """CAMT.053 con un extracto, saldo de apertura y ``entries`` (iterable de texto)"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><Document xmlns=\"{CAMT_NS}\">"
+                "<BkToCstmrStmt><GrpHdr><MsgId>1</MsgId></GrpHdr><Stmt><Id>1</Id>"
+                f"<Bal><Tp><CdOrPrtry><Cd>OPBD</Cd></CdOrPrtry></Tp><Amt Ccy=\"EUR\">{apertura}</Amt>"
+                "<CdtDbtInd>CRDT</CdtDbtInd><Dt><Dt>2024-01-01</Dt></Dt></Bal>")
+        for entry in entries:
+            f.write(entry)
+        f.write("</Stmt></BkToCstmrStmt></Document>")
+    return path
+
+
+class TestBankFormats:
+    """Tests para los lectores de OFX, QIF y CAMT.053"""
+
+    def test_camt053_signs_balance_and_concept(self, tmp_path):
+        """Test: DBIT resta, el saldo parte del de apertura y el concepto sale de Ustrd"""
+        # Preparar
+        camt = write_camt(tmp_path / "extracto.xml", [
+            camt_entry("45.30", "DBIT", "2024-01-02", "RECIBO LUZ"),
+            camt_entry("2100.00", "CRDT", "2024-01-05", "NOMINA"),
+        ])
+
+        # Ejecutar
+        df = read_camt053(camt)
+
+        # Verificar
+        assert list(df.columns) == ["Fecha", "F. Valor", "Concepto", "Importe", "Saldo"]
+        assert df["Fecha"].tolist() == ["2024-01-02", "2024-01-05"]
+        assert df["Concepto"].tolist() == ["RECIBO LUZ", "NOMINA"]
+        assert df["Importe"].tolist() == [-45.30, 2100.00]
+        assert df["Saldo"].tolist() == [954.70, 3054.70]
+
+    def test_camt053_rejects_other_xml(self, tmp_path):
+        """Test: un XML que no es CAMT.053 se rechaza"""
+        # Preparar
+        xml = tmp_path / "otro.xml"
+        xml.write_text("<config><valor>1</valor></config>")
+
+        # Ejecutar / Verificar
+        try:
+            read_camt053(xml)
+            assert False, "Debería lanzar ValueError"
+        except ValueError as e:
+            assert "CAMT.053" in str(e)
+
+    def test_camt053_streams_in_constant_memory(self, tmp_path):
+        """Test: recorrer un CAMT grande no retiene los apuntes ya leídos"""
+        # Preparar: 8.000 apuntes (~2,5 MB)
+        apunte = camt_entry("1.00", "DBIT", "2024-01-02", "PAGO TARJETA " + "X" * 100)
+        camt = write_camt(tmp_path / "grande.xml", (apunte for _ in range(8_000)), apertura="100000.00")
+
+        # Ejecutar
+        tracemalloc.start()
+        try:
+            total = sum(1 for _ in iter_camt053(camt))
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # Verificar
+        assert total == 8_000
+        assert pico < camt.stat().st_size / 4
+
+    def test_ofx_sgml_with_tags_split_between_chunks(self, tmp_path, monkeypatch):
+        """Test: OFX 1.x sin cierres, bloques pequeños y saldo reconstruido desde LEDGERBAL"""
+        # Preparar
+        monkeypatch.setattr(bank_formats, "CHUNK_SIZE", 7)
+        ofx = tmp_path / "extracto.ofx"
+        ofx.write_bytes(
+            "OFXHEADER:100\nDATA:OFXSGML\nCHARSET:1252\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>"
+            "<BANKTRANLIST>"
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240102120000[+1:CET]<TRNAMT>-45.30<NAME>Café &amp; Co"
+            "<MEMO>Desayuno</STMTTRN>"
+            "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240105<DTUSER>20240104<TRNAMT>2100,00<NAME>NOMINA</STMTTRN>"
+            "</BANKTRANLIST><LEDGERBAL><BALAMT>3054.70<DTASOF>20240131</LEDGERBAL>"
+            "</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>".encode("cp1252")
+        )
+
+        # Ejecutar
+        df = read_ofx(ofx)
+
+        # Verificar
+        assert df["Fecha"].tolist() == ["2024-01-02", "2024-01-05"]
+        assert df["F. Valor"].tolist() == ["2024-01-02", "2024-01-04"]
+        assert df["Concepto"].tolist() == ["Café & Co Desayuno", "NOMINA"]
+        assert df["Importe"].tolist() == [-45.30, 2100.00]
+        assert df["Saldo"].tolist() == [954.70, 3054.70]
+
+    def test_qif_dates_amounts_and_splits(self, tmp_path):
+        """Test: fechas día/mes, año con apóstrofo, importes con miles y divisiones"""
+        # Preparar
+        qif = tmp_path / "extracto.qif"
+        qif.write_text(
+            "!Type:Bank\n"
+            "D15/01/2024\nT-1,234.56\nPHIPOTECA\nMCuota enero\n^\n"
+            "D1/2'24\nT2.100,00\nPNOMINA\nSSueldo\n$2.000,00\nSExtra\n$100,00\n^\n"
+            "D01/31/2024\nU-10.00\nPCAFE\n^\n",
+            encoding="utf-8"
+        )
+
+        # Ejecutar
+        df = read_qif(qif)
+
+        # Verificar
+        assert df["Fecha"].tolist() == ["15/01/2024", "01/02/2024", "31/01/2024"]
+        assert df["Concepto"].tolist() == ["HIPOTECA Cuota enero", "NOMINA", "CAFE"]
+        assert df["Importe"].tolist() == [-1234.56, 2100.00, -10.00]
+        assert df["Saldo"].isna().all()
+
+
+def multipart_body(boundary, partes):
+    """Cuerpo multipart con ``partes`` = [(cabeceras, contenido)]"""
+    cuerpo = b""
+    for cabeceras, contenido in partes:
+        cuerpo += b"--" + boundary + b"\r\n" + cabeceras + b"\r\n\r\n" + contenido + b"\r\n"
+    return cuerpo + b"--" + boundary + b"--\r\n"
+
+
+def feed_in_chunks(objeto, data, size):
+    eventos = []
+    for i in range(0, len(data), size):
+        eventos += objeto.feed(data[i:i + size])
+    return eventos
+
+
+class TestStreamingUpload:
+    """Tests para el parser multipart incremental y el CSV por lotes"""
+
+    def test_multipart_parts_with_any_chunk_size(self):
+        """Test: partes y contenido idénticos troceando el cuerpo de cualquier forma"""
+        # Preparar: el contenido incluye algo parecido al delimitador
+        boundary = parse_boundary('multipart/form-data; boundary="----abc123"')
+        contenido = b"fecha;importe\r\n------abc12;-1\r\n" * 50
+        cuerpo = multipart_body(boundary, [
+            (b'Content-Disposition: form-data; name="comentario"', b"hola"),
+            (b'Content-Disposition: form-data; name="file"; filename="MOV1.csv"\r\n'
+             b"Content-Type: text/csv", contenido),
+        ])
+
+        for tamano in (1, 7, 64, len(cuerpo)):
+            # Ejecutar
+            parser = MultipartParser(boundary)
+            eventos = feed_in_chunks(parser, cuerpo, tamano)
+            parser.close()
+
+            # Verificar
+            cabeceras = [valor for evento, valor in eventos if evento == HEADERS]
+            assert [part_info(c) for c in cabeceras] == [
+                {"name": "comentario", "filename": None},
+                {"name": "file", "filename": "MOV1.csv"},
+            ]
+            datos = b"".join(valor for evento, valor in eventos if evento == DATA)
+            assert datos == b"hola" + contenido
+            assert [e for e, _ in eventos].count(PART_END) == 2
+
+    def test_multipart_truncated_body_fails(self):
+        """Test: un cuerpo sin delimitador final es un error"""
+        # Preparar
+        parser = MultipartParser(b"xyz")
+        parser.feed(b'--xyz\r\nContent-Disposition: form-data; name="file"\r\n\r\nfecha;importe\r\n')
+
+        # Ejecutar / Verificar
+        try:
+            parser.close()
+            assert False, "Debería lanzar MultipartError"
+        except MultipartError:
+            pass
+
+    def test_csv_batches_match_load_file(self, tmp_path):
+        """Test: los lotes concatenados son el DataFrame de load_file, con filas entre comillas partidas"""
+        # Preparar: conceptos con saltos de línea y punto y coma entre comillas
+        filas = [f'{i % 28 + 1:02d}/01/2024 10:00:00;"COMPRA\nTIENDA; {i}";-{i},50' for i in range(2000)]
+        csv = tmp_path / "MOV1.csv"
+        csv.write_text("Fecha y hora;Concepto;Importe\n" + "\n".join(filas) + "\n", encoding="utf-8")
+        esperado, info = load_file(csv)
+
+        # Ejecutar
+        batcher = CsvBatcher(batch_bytes=4096)
+        lotes = feed_in_chunks(batcher, csv.read_bytes(), 1000) + batcher.close()
+
+        # Verificar
+        assert len(lotes) > 5
+        df = pd.concat(lotes, ignore_index=True)
+        assert df.equals(esperado)
+        assert batcher.file_info("MOV1.csv") == info
+
+    def test_csv_switches_to_cp1252_after_ascii_sample(self):
+        """Test: un byte cp1252 más allá de la muestra ASCII no se pierde"""
+        # Preparar: >64 KB de filas ASCII y después una con "Ñ" en cp1252
+        datos = ("Fecha;Concepto;Importe\n" + "01/01/2024;CAFE;-1,00\n" * 4000
+                 + "02/01/2024;ESPAÑA;-2,00\n").encode("cp1252")
+
+        # Ejecutar
+        batcher = CsvBatcher(batch_bytes=16 * 1024)
+        lotes = feed_in_chunks(batcher, datos, 8192) + batcher.close()
+
+        # Verificar
+        df = pd.concat(lotes, ignore_index=True)
+        assert len(df) == 4001
+        assert df["Concepto"].iloc[-1] == "ESPAÑA"
+        assert df["Importe"].iloc[-1] == -2.0
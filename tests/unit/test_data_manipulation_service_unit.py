@@ -0,0 +1,528 @@
+"""
+Tests unitarios para el microservicio de manipulación de datos.
+
+Prueban los módulos de análisis de forma aislada, importándolos
+directamente desde el directorio del servicio.
+"""
+
+import json
+import pytest
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Agregar el directorio del servicio al path
+service_path = Path(__file__).parent.parent.parent / "services" / "data-manipulation-service" / "app"
+sys.path.insert(0, str(service_path))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "services"))
+
+from movements import prepare_movements, movements_to_dict, movements_from_dict
+from anomalies import AnomalyDetector
+from forecast import SpendingForecaster
+from recurring import detect_recurring, normalize_merchant, merchant_keys
+from categorization import Categorizer, compile_rules
+from balances import compute_balances
+
+
+def card_record(fecha, importe, establecimiento, tipo="COMPRA EN ESTABLECIMIENTO"):
+    """Crear un registro con el formato de los CSV de tarjetas"""
+    return {
+        "Fecha y hora": fecha,
+        "Importe": importe,
+        "Establecimiento": establecimiento,
+        "Tipo": tipo,
+        "source_file": "MOV-test.csv",
+    }
+
+
+class TestPrepareMovements:
+    """Tests para la normalización de movimientos"""
+
+    def test_prepare_movements_amounts_in_cents(self):
+        """Test: importe y saldo en céntimos, lleguen en euros o ya en céntimos"""
+        records = [{"Fecha": "17/10/2024", "Importe": v, "Saldo": "1.234,56"} for v in ["-45,80", "12.5", None]]
+        df = prepare_movements(records)
+        assert str(df["importe"].dtype) == "Int64"
+        assert list(df["importe"].iloc[:2]) == [-4580, 1250]
+        assert pd.isna(df["importe"].iloc[2])
+        assert df["saldo"].iloc[0] == 123456
+
+        df = prepare_movements([{"Fecha": "17/10/2024", "Importe": -4580}], amounts_in_cents=True)
+        assert df["importe"].iloc[0] == -4580
+
+    def test_prepare_movements_canonical_columns(self):
+        """Test: debe generar fecha, importe, comercio y categoria"""
+        df = prepare_movements([
+            card_record("2024-10-16T10:30:00.000", -45.8, "SUPERMERCADO XYZ"),
+            {"Fecha": "17/10/2024", "Concepto": "RECIBO LUZ", "Importe": "-60,10"},
+        ])
+
+        assert pd.api.types.is_datetime64_any_dtype(df["fecha"])
+        assert df["fecha"].iloc[0] == pd.Timestamp("2024-10-16 10:30:00")
+        assert df["fecha"].iloc[1].day == 17
+        assert list(df["comercio"]) == ["SUPERMERCADO XYZ", "RECIBO LUZ"]
+        assert df["categoria"].iloc[0] == "COMPRA EN ESTABLECIMIENTO"
+        assert df["importe"].iloc[1] == -6010
+
+
+class TestAnomalyDetector:
+    """Tests para el detector de cargos inusuales"""
+
+    def history(self, n=10, importe=-20.0, establecimiento="CAFETERIA"):
+        return [
+            card_record(f"2024-01-{day:02d}", importe + (day % 3) * 0.5, establecimiento)
+            for day in range(1, n + 1)
+        ]
+
+    def test_flags_unusual_charge_for_merchant(self):
+        """Test: un cargo muy superior al habitual del comercio debe marcarse"""
+        detector = AnomalyDetector()
+        detector.process(prepare_movements(self.history()))
+
+        flagged = detector.process(prepare_movements([card_record("2024-01-20", -400.0, "CAFETERIA")]))
+
+        assert len(flagged) == 1
+        assert flagged[0]["motivo"] == "comercio"
+        assert flagged[0]["importe"] == -400.0
+
+    def test_does_not_flag_usual_charges(self):
+        """Test: los cargos habituales no deben marcarse"""
+        detector = AnomalyDetector()
+        flagged = detector.process(prepare_movements(self.history(n=20)))
+
+        assert flagged == []
+        assert detector.processed == 20
+
+    def test_ignores_income(self):
+        """Test: los abonos (importe positivo) no se analizan"""
+        detector = AnomalyDetector()
+        detector.process(prepare_movements(self.history()))
+
+        flagged = detector.process(prepare_movements([card_record("2024-01-20", 5000.0, "CAFETERIA")]))
+
+        assert flagged == []
+
+    def test_new_merchant_compared_with_category(self):
+        """Test: un comercio sin histórico se compara con su categoría"""
+        detector = AnomalyDetector()
+        detector.process(prepare_movements(self.history()))
+
+        flagged = detector.process(prepare_movements([card_record("2024-01-20", -900.0, "OTRO COMERCIO")]))
+
+        assert len(flagged) == 1
+        assert flagged[0]["motivo"] == "categoria"
+
+    def test_state_round_trip(self):
+        """Test: el estado serializado debe restaurar el detector"""
+        detector = AnomalyDetector()
+        detector.process(prepare_movements(self.history()))
+
+        restored = AnomalyDetector()
+        restored.load_dict(detector.to_dict())
+        flagged = restored.process(prepare_movements([card_record("2024-01-20", -400.0, "CAFETERIA")]))
+
+        assert restored.processed == 11
+        assert len(flagged) == 1
+
+
+class TestSpendingForecaster:
+    """Tests para la previsión de gasto mensual"""
+
+    def monthly_records(self, months, base=100.0, categoria="SUPERMERCADO"):
+        """Un gasto por mes con estacionalidad anual (diciembre más caro)"""
+        records = []
+        for i in range(months):
+            year, month = 2020 + i // 12, i % 12 + 1
+            importe = base * (2 if month == 12 else 1)
+            records.append({"Fecha": f"{year}-{month:02d}-10", "Importe": -importe, "Tipo": categoria})
+        return prepare_movements(records)
+
+    def test_only_closed_months_are_fitted(self):
+        """Test: el último mes con datos se considera abierto"""
+        forecaster = SpendingForecaster()
+        forecaster.update(self.monthly_records(3))
+
+        assert forecaster.models["SUPERMERCADO"]["fitted_until"] == 2020 * 12 + 1
+        assert forecaster.models["SUPERMERCADO"]["method"] == "mean"
+
+    def test_seasonal_naive_repeats_last_year(self):
+        """Test: con un año de histórico se repite el mismo mes del año anterior"""
+        forecaster = SpendingForecaster()
+        forecaster.update(self.monthly_records(14))
+
+        predictions = forecaster.forecast("SUPERMERCADO", 12)
+
+        assert forecaster.models["SUPERMERCADO"]["method"] == "seasonal_naive"
+        assert predictions[0]["mes"] == "2021-02"
+        diciembre = next(p for p in predictions if p["mes"] == "2021-12")
+        assert diciembre["importe"] == pytest.approx(200.0)
+
+    def test_holt_winters_with_two_years(self):
+        """Test: con dos años de histórico se ajusta Holt-Winters"""
+        forecaster = SpendingForecaster()
+        forecaster.update(self.monthly_records(37))
+
+        predictions = forecaster.forecast("SUPERMERCADO", 12)
+
+        assert forecaster.models["SUPERMERCADO"]["method"] == "holt_winters"
+        diciembre = next(p for p in predictions if p["mes"].endswith("-12"))
+        noviembre = next(p for p in predictions if p["mes"].endswith("-11"))
+        assert diciembre["importe"] > noviembre["importe"]
+
+    def test_refit_only_when_new_month_closes(self):
+        """Test: un lote del mismo mes abierto no reajusta el modelo"""
+        forecaster = SpendingForecaster()
+        forecaster.update(self.monthly_records(30))
+
+        mismo_mes = prepare_movements([{"Fecha": "2022-06-20", "Importe": -5, "Tipo": "SUPERMERCADO"}])
+        assert forecaster.update(mismo_mes) == []
+
+        mes_nuevo = prepare_movements([{"Fecha": "2022-07-01", "Importe": -5, "Tipo": "SUPERMERCADO"}])
+        assert forecaster.update(mes_nuevo) == ["SUPERMERCADO"]
+
+    def test_state_round_trip(self):
+        """Test: el estado serializado debe producir la misma previsión"""
+        forecaster = SpendingForecaster()
+        forecaster.update(self.monthly_records(30))
+
+        restored = SpendingForecaster()
+        restored.load_dict(forecaster.to_dict())
+
+        assert restored.forecast("SUPERMERCADO", 6) == forecaster.forecast("SUPERMERCADO", 6)
+
+    def test_legacy_state_totals_in_euros(self):
+        """Test: los totales de un estado antiguo (en euros) se pasan a céntimos"""
+        forecaster = SpendingForecaster()
+        forecaster.load_dict({"last_period": 24241, "monthly": {"SUPERMERCADO": {"24240": 45.8}}, "models": {}})
+
+        assert forecaster.monthly["SUPERMERCADO"][24240] == 4580
+
+
+class TestRecurringDetector:
+    """Tests para la detección de pagos recurrentes"""
+
+    def test_normalize_merchant_removes_references(self):
+        """Test: los números de referencia y acentos no cambian la clave"""
+        assert normalize_merchant("Netflix.com *1234") == normalize_merchant("NETFLIX.COM 98765")
+        assert normalize_merchant("Café Ñandú") == "CAFE NANDU"
+
+    def test_merchant_keys_same_for_equivalent_texts(self):
+        """Test: textos equivalentes comparten clave hash"""
+        keys, names = merchant_keys(pd.Series(["SPOTIFY P1234", "Spotify P9876", "GIMNASIO"]))
+
+        assert keys[0] == keys[1]
+        assert keys[0] != keys[2]
+        assert names[keys[0]] == "SPOTIFY P"
+
+    def test_detects_monthly_subscription(self):
+        """Test: un cargo mensual de importe fijo es una suscripción mensual"""
+        records = [card_record(f"2024-{m:02d}-05", -12.99, f"NETFLIX.COM *{m}") for m in range(1, 7)]
+        records += [card_record(f"2024-{m:02d}-{d:02d}", -d * 3.0, "SUPERMERCADO") for m in range(1, 4) for d in (2, 9, 20)]
+
+        result = detect_recurring(prepare_movements(records))
+
+        assert len(result) == 1
+        assert result[0]["comercio"] == "NETFLIX COM"
+        assert result[0]["periodicidad"] == "mensual"
+        assert result[0]["ocurrencias"] == 6
+        # Intervalos de 31, 29, 31, 30 y 31 días: mediana 31 (la media sería 30.4)
+        assert result[0]["intervalo_mediano_dias"] == 31.0
+        assert result[0]["proximo_cargo"].startswith("2024-07")
+
+    def test_ignores_irregular_amounts(self):
+        """Test: importes muy variables no se consideran recurrentes"""
+        records = [card_record(f"2024-{m:02d}-05", -10.0 * m * m, "TIENDA") for m in range(1, 7)]
+
+        assert detect_recurring(prepare_movements(records)) == []
+
+
+class TestCategorizer:
+    """Tests para el motor de categorización"""
+
+    def test_keywords_match_whole_words_without_accents(self):
+        """Test: las palabras clave ignoran mayúsculas y acentos pero no casan dentro de otra palabra"""
+        categorizer = Categorizer([{"categoria": "RESTAURANTES", "keywords": ["bar"]}])
+
+        assert categorizer.categorize_text("Bar Pepe") == "RESTAURANTES"
+        assert categorizer.categorize_text("BARCELONA TIENDA") is None
+
+    def test_regex_rules(self):
+        """Test: las reglas con expresión regular se aplican al texto normalizado"""
+        categorizer = Categorizer([{"categoria": "IMPUESTOS", "regex": r"AEAT|MODELO \d{3}"}])
+
+        assert categorizer.categorize_text("Pago modelo 303") == "IMPUESTOS"
+
+    def test_first_rule_wins_on_same_position(self):
+        """Test: con coincidencias en la misma posición gana la regla anterior"""
+        categorizer = Categorizer([
+            {"categoria": "SUSCRIPCIONES", "keywords": ["AMAZON PRIME"]},
+            {"categoria": "COMPRAS ONLINE", "keywords": ["AMAZON"]},
+        ])
+
+        assert categorizer.categorize_text("AMAZON PRIME ES") == "SUSCRIPCIONES"
+        assert categorizer.categorize_text("AMAZON MKTPLACE") == "COMPRAS ONLINE"
+
+    def test_rule_priority_over_text_position(self):
+        """Test: gana la regla anterior aunque la de menor prioridad aparezca antes en el texto"""
+        categorizer = Categorizer()
+
+        assert categorizer.categorize_text("TRANSFERENCIA NOMINA ACME") == "NÓMINA"
+        assert categorizer.categorize_text("PAYPAL *NETFLIX") == "SUSCRIPCIONES"
+
+    def test_regex_backreference_behind_keyword_rules(self):
+        """Test: una referencia ``\\1`` apunta a los grupos de su propia expresión"""
+        categorizer = Categorizer([
+            {"categoria": "SUPERMERCADO", "keywords": ["MERCADONA"]},
+            {"categoria": "REPETIDO", "regex": r"(AB)\1"},
+        ])
+
+        assert categorizer.categorize_text("ABAB") == "REPETIDO"
+        assert categorizer.categorize_text("ABAC") is None
+
+    def test_regex_with_inline_flags(self):
+        """Test: una expresión con indicadores en línea (``(?i)``) es válida como cualquier otra"""
+        categorizer = Categorizer([
+            {"categoria": "SUPERMERCADO", "keywords": ["MERCADONA"]},
+            {"categoria": "SUSCRIPCIONES", "regex": r"(?i)netflix"},
+        ])
+
+        assert categorizer.categorize_text("Netflix.com") == "SUSCRIPCIONES"
+        assert categorizer.categorize_text("MERCADONA") == "SUPERMERCADO"
+
+    def test_regex_and_keyword_rules_keep_priority(self):
+        """Test: entre una regex y una palabra clave gana la regla anterior"""
+        categorizer = Categorizer([
+            {"categoria": "IMPUESTOS", "regex": r"MODELO \d{3}"},
+            {"categoria": "TRANSFERENCIAS", "keywords": ["TRANSFERENCIA"]},
+            {"categoria": "OTROS", "regex": r"PAGO"},
+        ])
+
+        assert categorizer.categorize_text("TRANSFERENCIA MODELO 303") == "IMPUESTOS"
+        assert categorizer.categorize_text("PAGO TRANSFERENCIA") == "TRANSFERENCIAS"
+        assert categorizer.categorize_text("PAGO RECIBO") == "OTROS"
+
+    def test_invalid_regex_raises(self):
+        """Test: una expresión regular inválida debe rechazarse al compilar"""
+        import re
+        with pytest.raises(re.error):
+            compile_rules([{"categoria": "X", "regex": "("}])
+
+    def test_apply_caches_distinct_descriptions(self):
+        """Test: cada descripción distinta se evalúa una sola vez"""
+        categorizer = Categorizer()
+        df = prepare_movements([card_record("2024-01-01", -10, "MERCADONA")] * 50 +
+                               [card_record("2024-01-02", -5, "KIOSCO")])
+        calls = []
+        original = categorizer.categorize_text
+        categorizer.categorize_text = lambda text: calls.append(text) or original(text)
+
+        categorizer.apply(df)
+
+        assert len(calls) == 2
+        assert (df["categoria"].iloc[:50] == "SUPERMERCADO").all()
+        # Sin coincidencia se conserva la categoría original (el tipo)
+        assert df["categoria"].iloc[50] == "COMPRA EN ESTABLECIMIENTO"
+
+
+class TestBalances:
+    """Tests para el saldo acumulado y el flujo de caja"""
+
+    def account_record(self, fecha, concepto, importe, saldo, source_file="excelFile_1.xls"):
+        return {"Fecha": fecha, "Concepto": concepto, "Importe": importe, "Saldo": saldo, "source_file": source_file}
+
+    def test_running_balance_and_daily_cashflow(self):
+        """Test: debe acumular importes y agrupar el flujo por día (archivo descendente)"""
+        records = [
+            self.account_record("2025-01-02", "NOMINA", 1000.0, 2900.0),
+            self.account_record("2025-01-01", "SUPERMERCADO", -50.0, 1900.0),
+            self.account_record("2025-01-01", "RECIBO LUZ", -50.0, 1950.0),
+        ]
+
+        result = compute_balances(prepare_movements(records))
+
+        assert result["saldo_inicial"] == 2000.0
+        assert result["saldo_final"] == 2900.0
+        assert result["saldo_calculado"] == 2900.0
+        assert result["inconsistencias"] == []
+        assert result["flujo_diario"][0] == {
+            "fecha": "2025-01-01", "ingresos": 0.0, "gastos": -100.0, "neto": -100.0,
+            "saldo_cierre": 1900.0, "saldo_calculado": 1900.0,
+        }
+
+    def test_reports_missing_movements_and_gaps(self):
+        """Test: debe detectar descuadres de saldo y periodos sin extracto"""
+        records = [
+            self.account_record("2025-01-01", "A", -10.0, 90.0, "excelFile_1.xls"),
+            self.account_record("2025-01-02", "B", -10.0, 80.0, "excelFile_1.xls"),
+            self.account_record("2025-02-01", "C", -10.0, 50.0, "excelFile_2.xlsx"),
+        ]
+
+        result = compute_balances(prepare_movements(records))
+
+        assert len(result["inconsistencias"]) == 1
+        assert result["inconsistencias"][0]["importe_no_explicado"] == -20.0
+        assert result["huecos"] == [{"cuenta": None, "desde": "2025-01-03", "hasta": "2025-01-31"}]
+
+    def test_overlapping_exports_are_merged_once(self):
+        """Test: los movimientos repetidos en extractos solapados cuentan una vez"""
+        primero = [self.account_record("2025-01-01", "A", -10.0, 90.0, "excelFile_1.xls"),
+                   self.account_record("2025-01-02", "B", -10.0, 80.0, "excelFile_1.xls")]
+        segundo = [self.account_record("2025-01-02", "B", -10.0, 80.0, "excelFile_2.xls"),
+                   self.account_record("2025-01-03", "C", 20.0, 100.0, "excelFile_2.xls")]
+
+        result = compute_balances(prepare_movements(primero + segundo))
+
+        assert result["movimientos"] == 3
+        assert result["inconsistencias"] == []
+
+    def test_balances_per_account(self):
+        """Test: dos cuentas intercaladas no se descuadran entre sí y el flujo suma ambas"""
+        records = [
+            {**self.account_record("2025-01-01", "A", -10.0, 90.0), "IBAN": "ES11 0000"},
+            {**self.account_record("2025-01-01", "X", -5.0, 495.0, "excelFile_2.xls"), "IBAN": "ES22 0000"},
+            {**self.account_record("2025-01-02", "B", -10.0, 80.0), "IBAN": "ES11 0000"},
+            {**self.account_record("2025-01-03", "Y", -5.0, 490.0, "excelFile_2.xls"), "IBAN": "ES22 0000"},
+        ]
+
+        result = compute_balances(prepare_movements(records))
+
+        assert result["inconsistencias"] == []
+        assert [(c["cuenta"], c["saldo_final"]) for c in result["cuentas"]] == [("ES110000", 80.0), ("ES220000", 490.0)]
+        assert [d["saldo_cierre"] for d in result["flujo_diario"]] == [585.0, 575.0, 570.0]
+        assert [d["fecha"] for d in result["flujo_por_cuenta"]["ES110000"]] == ["2025-01-01", "2025-01-02"]
+
+    def test_ignores_card_files(self):
+        """Test: los CSV de tarjetas no forman parte del saldo de cuenta"""
+        df = prepare_movements([card_record("2025-01-01", -10.0, "BAR")])
+
+        assert compute_balances(df)["movimientos"] == 0
+
+
+class TestStatePersistence:
+    """Tests para el estado guardado del servicio"""
+
+    def test_movements_round_trip(self):
+        """Test: los movimientos serializados conservan fechas, céntimos y textos"""
+        import json
+        df = prepare_movements([
+            card_record("2024-10-16T10:30:00.500", -45.8, "SUPERMERCADO XYZ"),
+            {"Fecha": "17/10/2024", "Concepto": "RECIBO LUZ", "Importe": None, "Saldo": "10,00"},
+        ])
+
+        restored = movements_from_dict(json.loads(json.dumps(movements_to_dict(df))))
+
+        pd.testing.assert_frame_equal(restored, df, check_dtype=False)
+        assert str(restored["importe"].dtype) == "Int64"
+        assert restored["fecha"].iloc[0] == pd.Timestamp("2024-10-16 10:30:00.500")
+
+    @pytest.fixture
+    def service(self, tmp_path, monkeypatch):
+        """Módulo main del servicio con el estado en un directorio temporal"""
+        import importlib.util
+        spec = importlib.util.spec_from_file_location("manipulation_main", service_path / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        monkeypatch.setattr(module, "STATE_FILE", tmp_path / "estado.json")
+        monkeypatch.setattr(module, "RULES_FILE", tmp_path / "reglas.json")
+        return module
+
+    def restart(self, module):
+        """Vaciar el estado en memoria y cargarlo de disco, como al reiniciar"""
+        for env in module.ENVIRONMENTS:
+            module.reset_environment(env)
+        module.load_state()
+
+    def put_rules(self, module, rules):
+        import asyncio
+        import jwt
+        token = jwt.encode({"sub": "test"}, module.JWT_SECRET_KEY, algorithm=module.JWT_ALGORITHM)
+        asyncio.run(module.put_category_rules(module.RulesRequest(rules=rules), authorization=f"Bearer {token}"))
+
+    def test_recategorization_after_restart(self, service):
+        """Test: al cambiar las reglas tras reiniciar, la previsión se rehace con todo el histórico"""
+        service.ingest_movements("pre", [card_record(f"2024-{m:02d}-05", -12.99, "NETFLIX.COM") for m in range(1, 7)])
+        service.save_state()
+
+        self.restart(service)
+        self.put_rules(service, [{"categoria": "STREAMING", "keywords": ["NETFLIX"]}])
+
+        assert service.PREVISIONES["pre"].monthly["STREAMING"] == {2024 * 12 + m: 1299 for m in range(6)}
+
+    def test_recurring_after_restart(self, service):
+        """Test: los pagos recurrentes se detectan sobre los movimientos restaurados"""
+        service.ingest_movements("pre", [card_record(f"2024-{m:02d}-05", -12.99, "NETFLIX.COM") for m in range(1, 7)])
+        service.save_state()
+
+        self.restart(service)
+
+        assert [r["comercio"] for r in detect_recurring(service.MOVIMIENTOS["pre"])] == ["NETFLIX COM"]
+
+    def test_balance_and_cashflow_after_restart(self, service):
+        """Test: saldo y flujo de caja por cuenta se calculan sobre los movimientos restaurados"""
+        import asyncio
+        import jwt
+        token = "Bearer " + jwt.encode({"sub": "test"}, service.JWT_SECRET_KEY, algorithm=service.JWT_ALGORITHM)
+        service.ingest_movements("pre", [
+            {"Fecha": "2025-01-02", "Concepto": "NOMINA", "Importe": 1000.0, "Saldo": 1500.0,
+             "IBAN": "ES11 0000", "source_file": "excelFile_1.xls"},
+        ])
+        service.save_state()
+
+        self.restart(service)
+        saldo = asyncio.run(service.get_balance(environment="pre", authorization=token))["data"]
+        flujo = asyncio.run(service.get_cashflow(environment="pre", desde=None, hasta=None,
+                                                 cuenta="es11 0000", authorization=token))["data"]
+
+        assert saldo["saldo_final"] == 1500.0
+        assert "flujo_por_cuenta" not in saldo
+        assert flujo["cashflow"][0]["ingresos"] == 1000.0
+        with pytest.raises(service.HTTPException):
+            asyncio.run(service.get_cashflow(environment="pre", desde=None, hasta=None,
+                                             cuenta="ES99", authorization=token))
+
+    def test_ingest_appends_only_the_new_batch(self, service):
+        """Test: cada lote se añade al archivo de movimientos y el estado no los incluye"""
+        service.ingest_movements("pre", [card_record("2024-01-05", -12.99, "NETFLIX.COM")])
+        service.save_state()
+        antes = service.movements_file("pre").read_text()
+        service.ingest_movements("pre", [card_record("2024-02-05", -12.99, "NETFLIX.COM")])
+        service.save_state()
+
+        self.restart(service)
+
+        assert service.movements_file("pre").read_text().startswith(antes)
+        assert len(service.movements_file("pre").read_text().splitlines()) == 2
+        assert "movements" not in json.loads(service.STATE_FILE.read_text())
+        assert service.MOVIMIENTOS["pre"]["importe"].tolist() == [-1299, -1299]
+
+    def test_state_with_embedded_movements_is_migrated(self, service):
+        """Test: un estado que guardaba los movimientos dentro del JSON se pasa al archivo de movimientos"""
+        df = prepare_movements([card_record("2024-01-05", -12.99, "NETFLIX.COM")])
+        service.STATE_FILE.write_text(json.dumps({"movements": {"pre": movements_to_dict(df)}}))
+
+        self.restart(service)
+        self.restart(service)
+
+        assert service.movements_file("pre").exists()
+        assert service.MOVIMIENTOS["pre"]["importe"].tolist() == [-1299]
+        assert "pre" not in service.SIN_HISTORICO
+
+    def test_state_without_movements_keeps_forecast(self, service):
+        """Test: un estado anterior sin movimientos no reconstruye la previsión con datos parciales"""
+        service.ingest_movements("pre", [card_record(f"2024-{m:02d}-05", -10.0, "BAR PEPE") for m in range(1, 5)])
+        service.save_state()
+        estado = json.loads(service.STATE_FILE.read_text())
+        del estado["incomplete"]
+        service.STATE_FILE.write_text(json.dumps(estado))
+        service.movements_file("pre").unlink()
+
+        self.restart(service)
+        service.ingest_movements("pre", [card_record("2024-05-05", -10.0, "BAR PEPE")])
+        self.put_rules(service, [{"categoria": "OCIO", "keywords": ["BAR"]}])
+
+        assert "pre" in service.SIN_HISTORICO
+        assert len(service.PREVISIONES["pre"].monthly["RESTAURANTES"]) == 5
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])